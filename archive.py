@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""帳冊歸檔：把已結束年度的 進貨/銷售 移到每年一份的歸檔（SQLite 資料庫或 Parquet），熱資料庫只留現行期間。
+
+歸檔後 庫存彙總、日/月彙總、月結存 不變（刪除原始紀錄後把歸檔部分加回），儀表板、趨勢與時點庫存照常；
+每個細項歸檔部分的合計與成本狀態（先進先出剩餘成本層、移動平均單價、最後進貨單價、結存數量）記在 期初結存 / 期初成本層，
+彙總的核對/重建與銷貨成本引擎都從這裡接續。查詢歷史紀錄時才 ATTACH 歸檔資料庫或讀取 Parquet。
+
+    python archive.py close 2023 [--format parquet]
+    python archive.py list
+"""
+import argparse
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import date, datetime
+
+import pandas as pd
+
+from backup import 自動快照
+from costing import _重播, 更新成本, 截止狀態
+from db import DB_PATH, 交易, 取得連線, 歸檔截止日, _彙總欄, _紀錄條件
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet 歸檔為選用格式
+    pq = None
+
+歸檔目錄 = os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), 'archive')
+
+# 歸檔檔案的欄位：原始紀錄（總價分 由生成欄位實體化）加上成本引擎的結果
+_欄位 = {
+    '進貨': {'紀錄ID': 'INTEGER PRIMARY KEY', '類別編號': 'INTEGER', '品項編號': 'INTEGER', '細項編號': 'INTEGER',
+             '數量': 'INTEGER', '單價分': 'INTEGER', '總價分': 'INTEGER', '日期': 'TEXT', '均價分': 'REAL'},
+    '銷售': {'紀錄ID': 'INTEGER PRIMARY KEY', '類別編號': 'INTEGER', '品項編號': 'INTEGER', '細項編號': 'INTEGER',
+             '數量': 'INTEGER', '單價分': 'INTEGER', '總價分': 'INTEGER', '日期': 'TEXT',
+             '先進先出分': 'INTEGER', '平均成本分': 'INTEGER'},
+}
+_成本表 = {'進貨': '進貨均價', '銷售': '銷售成本'}
+_原始欄 = ['紀錄ID', '類別編號', '品項編號', '細項編號', '數量', '單價分', '總價分', '日期']
+
+def _待歸檔(con, table: str, 截止: str) -> pd.DataFrame:
+    extra = [c for c in _欄位[table] if c not in _原始欄]
+    return pd.read_sql(f"""
+        SELECT {', '.join('R.' + c for c in _原始欄)}, {', '.join('K.' + c for c in extra)}
+        FROM {table} R LEFT JOIN {_成本表[table]} K ON K.紀錄ID=R.紀錄ID
+        WHERE R.日期 < ? AND R.細項編號 IS NOT NULL ORDER BY R.日期, R.紀錄ID
+    """, con, params=(截止,))
+
+def _寫入歸檔(年度: int, 格式: str, parts: dict) -> str:
+    """寫入（或併入）該年度的歸檔，以 紀錄ID 去重，重跑不會重複；回傳路徑"""
+    os.makedirs(歸檔目錄, exist_ok=True)
+    if 格式 == 'sqlite':
+        path = os.path.join(歸檔目錄, f'ledger_{年度}.db')
+        with closing(sqlite3.connect(path)) as a:
+            for table, df in parts.items():
+                a.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(f'{c} {t}' for c, t in _欄位[table].items())})")
+                a.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_日期 ON {table}(日期)")
+                a.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_細項_日期 ON {table}(細項編號, 日期)")
+                a.executemany(f"INSERT OR REPLACE INTO {table} ({', '.join(df.columns)}) VALUES ({','.join('?' * df.shape[1])})",
+                              df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+            a.commit()
+        return path
+    path = os.path.join(歸檔目錄, str(年度))
+    os.makedirs(path, exist_ok=True)
+    for table, df in parts.items():
+        f = os.path.join(path, f'{table}.parquet')
+        if os.path.exists(f):
+            df = pd.concat([pd.read_parquet(f), df], ignore_index=True).drop_duplicates('紀錄ID', keep='last')
+        df.sort_values(['日期', '紀錄ID']).to_parquet(f'{f}.tmp', index=False)
+        os.replace(f'{f}.tmp', f)
+    return path
+
+def _加回彙總(con, parts: dict):
+    """刪除原始紀錄時觸發器扣掉的數量金額加回 庫存彙總、日彙總、月彙總（月結存 由 月彙總 觸發器跟著加回）"""
+    for table, (qc, ac, nc) in _彙總欄.items():
+        df = parts[table]
+        if df.empty:
+            continue
+        g = df.assign(數量=df['數量'].fillna(0), 總價分=df['總價分'].fillna(0), 月份=df['日期'].str[:7])
+        for rt, kc in (('庫存彙總', None), ('日彙總', '日期'), ('月彙總', '月份')):
+            keys = ['細項編號'] + ([kc] if kc else [])
+            a = g.groupby(keys).agg(q=('數量', 'sum'), a=('總價分', 'sum'), n=('紀錄ID', 'size')).reset_index()
+            where = '細項編號=?' + (f' AND {kc}=?' if kc else '')
+            con.executemany(f"UPDATE {rt} SET {qc}={qc}+?, {ac}={ac}+?, {nc}={nc}+? WHERE {where}",
+                            [(int(r.q), int(r.a), int(r.n), *[int(x) if k == '細項編號' else x for k, x in zip(keys, r[:len(keys)])])
+                             for r in a[keys + ['q', 'a', 'n']].itertuples(index=False)])
+
+def _記錄期初(con, parts: dict, 狀態: dict, 補登: set):
+    """歸檔部分的合計累加進 期初結存，成本狀態（結存數量、均價、最後單價、剩餘成本層）改為截止日的值；
+    補登 為這次歸檔含有補登進已結帳期間紀錄的細項"""
+    tot = pd.DataFrame(index=pd.Index(sorted(狀態), name='細項編號'))
+    for table, (qc, ac, nc) in _彙總欄.items():
+        df = parts[table]
+        g = df.assign(數量=df['數量'].fillna(0), 總價分=df['總價分'].fillna(0)).groupby('細項編號')
+        tot[qc], tot[ac], tot[nc] = g['數量'].sum(), g['總價分'].sum(), g.size()
+    g = parts['銷售'].groupby('細項編號')
+    tot['先進先出分'], tot['平均成本分'] = g['先進先出分'].sum(), g['平均成本分'].sum()
+    tot = tot.fillna(0).astype('int64')
+    cols = list(tot.columns)
+    con.executemany(f"""
+        INSERT INTO 期初結存 (細項編號, {', '.join(cols)}, 期初數量, 期初均價分, 最後單價分, 補登)
+        VALUES ({','.join('?' * (len(cols) + 5))})
+        ON CONFLICT(細項編號) DO UPDATE SET {', '.join(f'{c}={c}+excluded.{c}' for c in cols)},
+            期初數量=excluded.期初數量, 期初均價分=excluded.期初均價分, 最後單價分=excluded.最後單價分,
+            補登=MAX(補登, excluded.補登)
+    """, [(int(sid), *map(int, r), int(狀態[sid][1]), 狀態[sid][2], 狀態[sid][3], int(sid in 補登))
+          for sid, r in zip(tot.index, tot.itertuples(index=False))])
+    con.executemany("DELETE FROM 期初成本層 WHERE 細項編號=?", [(int(sid),) for sid in 狀態])
+    con.executemany("INSERT INTO 期初成本層 (細項編號, 序, 數量, 單價分) VALUES (?,?,?,?)",
+                    [(int(sid), i, int(q), int(u)) for sid, (layers, *_) in 狀態.items() for i, (q, u) in enumerate(layers)])
+
+def 歸檔(年度: int, 格式: str = 'sqlite') -> dict:
+    """把 年度 年底（含）以前仍在熱資料庫的 進貨/銷售 移到各年度的歸檔，回傳 {年度: (進貨筆數, 銷售筆數)}"""
+    if 格式 not in ('sqlite', 'parquet'):
+        raise ValueError(f'不支援的歸檔格式：{格式}')
+    if 格式 == 'parquet' and pq is None:
+        raise RuntimeError('Parquet 歸檔需安裝 pyarrow')
+    截止 = f'{int(年度) + 1}-01-01'
+    if 截止 > date.today().strftime('%Y-01-01'):
+        raise ValueError(f'{年度} 年尚未結束，不能歸檔')
+    自動快照(f'歸檔{年度}')
+    with 交易() as con:
+        更新成本()   # 歸檔的銷售帶著算好的成本
+        parts = {t: _待歸檔(con, t, 截止) for t in _欄位}
+        if all(df.empty for df in parts.values()):
+            return {}
+        sids = set(parts['進貨']['細項編號']) | set(parts['銷售']['細項編號'])
+        prev = 歸檔截止日()
+        補登 = {int(sid) for df in parts.values() for sid in df.loc[df['日期'] < prev, '細項編號']}
+        狀態 = {int(sid): 截止狀態(con, int(sid), 截止) for sid in sids}
+
+        # 先寫歸檔再刪除：中途失敗時紀錄只會兩邊都有，重跑以 紀錄ID 去重
+        out, now = {}, datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        years = sorted(set(parts['進貨']['日期'].str[:4]) | set(parts['銷售']['日期'].str[:4]))
+        for y in years:
+            ys = {t: df[df['日期'].str[:4] == y] for t, df in parts.items()}
+            path = _寫入歸檔(int(y), 格式, ys)
+            con.execute("INSERT INTO 歸檔紀錄 (年度, 格式, 路徑, 進貨筆數, 銷售筆數, 截止日, 時間) VALUES (?,?,?,?,?,?,?)",
+                        (int(y), 格式, path, len(ys['進貨']), len(ys['銷售']), 截止, now))
+            out[int(y)] = (len(ys['進貨']), len(ys['銷售']))
+
+        for t in parts:
+            con.execute(f"DELETE FROM {t} WHERE 日期 < ? AND 細項編號 IS NOT NULL", (截止,))
+            con.execute(f"DELETE FROM {_成本表[t]} WHERE 日期 < ?", (截止,))
+        _加回彙總(con, parts)
+        _記錄期初(con, parts, 狀態, 補登)
+        # 刪除時觸發器標記的待算日期都在截止日前；之後的成本改由期初狀態接續重播
+        con.execute("UPDATE 成本待算 SET 起日=? WHERE 起日 < ?", (截止, 截止))
+    return out
+
+def _歸檔紀錄(table: str) -> pd.DataFrame:
+    """所有歸檔年度的 table 原始紀錄（含歸檔時的成本欄）"""
+    frames = []
+    for fmt, path in 取得連線().execute("SELECT DISTINCT 格式, 路徑 FROM 歸檔紀錄").fetchall():
+        if fmt == 'sqlite':
+            with closing(sqlite3.connect(path)) as a:
+                if a.execute("SELECT 1 FROM sqlite_master WHERE name=?", (table,)).fetchone():
+                    frames.append(pd.read_sql(f"SELECT * FROM {table}", a))
+        elif os.path.exists(os.path.join(path, f'{table}.parquet')):
+            frames.append(pd.read_parquet(os.path.join(path, f'{table}.parquet')))
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=list(_欄位[table]))
+    return pd.concat(frames, ignore_index=True).drop_duplicates('紀錄ID', keep='last')
+
+def 核對歸檔成本() -> pd.DataFrame:
+    """有期初結存的細項，把歸檔與現行的紀錄合起來從頭重播，與現行 銷售成本 比對，
+    回傳不一致的銷售（空表代表歸檔沒有改變銷貨成本）。
+    已歸檔的銷售成本隨檔案凍結，不在比對之列；補登進已結帳期間的細項由結帳狀態接續計價，也不比對"""
+    更新成本()
+    con = 取得連線()
+    sids = [r[0] for r in con.execute("""SELECT 細項編號 FROM 期初結存 P WHERE 補登=0
+        AND NOT EXISTS (SELECT 1 FROM 進貨 R WHERE R.細項編號=P.細項編號 AND R.日期 < ?)
+        AND NOT EXISTS (SELECT 1 FROM 銷售 R WHERE R.細項編號=P.細項編號 AND R.日期 < ?)""",
+        (歸檔截止日(), 歸檔截止日()))]
+    cols = ['紀錄ID', '細項編號', '日期', '先進先出分', '平均成本分', '缺貨']
+    if not sids:
+        return pd.DataFrame(columns=cols)
+    ids = pd.Index(sids)
+    old_b, old_s = _歸檔紀錄('進貨'), _歸檔紀錄('銷售')
+    buys = pd.concat([old_b[_原始欄], pd.read_sql("SELECT * FROM 進貨", con)[_原始欄]], ignore_index=True)
+    sells = pd.concat([old_s[_原始欄], pd.read_sql("SELECT * FROM 銷售", con)[_原始欄]], ignore_index=True)
+    # 與 costing._載入 相同的篩選與排序
+    buys = buys[buys['細項編號'].isin(ids) & buys['日期'].notna() & (buys['數量'] > 0)]
+    buys = buys.assign(單價分=buys['單價分'].fillna(0)).sort_values(['日期', '紀錄ID'])
+    sells = sells[sells['細項編號'].isin(ids)]
+    sells = sells.assign(數量=sells['數量'].fillna(0)).sort_values(['日期', '紀錄ID'])
+    bg, sg = dict(list(buys.groupby('細項編號'))), dict(list(sells.groupby('細項編號')))
+    rows = []
+    for sid in sids:
+        b, x = bg.get(sid, buys.iloc[:0]), sg.get(sid, sells.iloc[:0])
+        rows += _重播(sid, '', list(b[['紀錄ID', '日期', '數量', '單價分']].itertuples(index=False, name=None)),
+                      list(x[['紀錄ID', '日期', '數量']].itertuples(index=False, name=None)), 0, None)[0]
+    raw = pd.DataFrame(rows, columns=cols)
+    kept = pd.read_sql(f"""SELECT {', '.join(cols)} FROM 銷售成本
+        WHERE 細項編號 IN (SELECT value FROM json_each(?))""", con, params=(json.dumps(sids),))
+    raw = raw[~raw['紀錄ID'].isin(old_s['紀錄ID'])]
+    both = raw.merge(kept, on='紀錄ID', how='outer', suffixes=('_重播', '_現行'), indicator=True)
+    bad = both['_merge'] != 'both'
+    for c in cols[1:]:
+        bad |= both[f'{c}_重播'] != both[f'{c}_現行']
+    return both[bad].drop(columns='_merge').reset_index(drop=True)
+
+def 歸檔清單() -> pd.DataFrame:
+    return pd.read_sql("SELECT * FROM 歸檔紀錄 ORDER BY 年度, 編號", 取得連線())
+
+def 查詢歷史(table: str, 起, 迄, **條件) -> pd.DataFrame:
+    """起~迄（含）的紀錄，包含已歸檔年度：只 ATTACH（或讀取）期間內用到的年度，與熱資料庫的結果合併。
+    不可在交易中呼叫（SQLite 不允許交易中 ATTACH）"""
+    where, params = _紀錄條件(起, 迄, **條件)
+    cols = "紀錄ID, 類別編號, 品項編號, 細項編號, 數量, 單價分 / 100.0 AS 單價, 總價分 / 100.0 AS 總價, 日期"
+    con = 取得連線()
+    frames = [pd.read_sql(f"SELECT {cols}, '現行' AS 來源 FROM {table} WHERE {' AND '.join(where)}", con, params=params)]
+    files = con.execute("SELECT DISTINCT 年度, 格式, 路徑 FROM 歸檔紀錄 WHERE 年度 BETWEEN ? AND ? ORDER BY 年度",
+                        (int(str(起)[:4]), int(str(迄)[:4]))).fetchall()
+    for y, fmt, path in files:
+        if fmt == 'sqlite':
+            con.execute(f"ATTACH DATABASE ? AS 歸檔{y}", (path,))
+            try:
+                frames.append(pd.read_sql(f"SELECT {cols}, '{y}' AS 來源 FROM 歸檔{y}.{table} WHERE {' AND '.join(where)}",
+                                          con, params=params))
+            finally:
+                con.execute(f"DETACH DATABASE 歸檔{y}")
+        else:
+            filters = [('日期', '>=', str(起)), ('日期', '<=', str(迄))]
+            filters += [(k, '==', int(v)) for k, v in 條件.items() if v is not None]
+            df = pd.read_parquet(os.path.join(path, f'{table}.parquet'), filters=filters)
+            frames.append(df.assign(單價=df['單價分'] / 100.0, 總價=df['總價分'] / 100.0, 來源=str(y))[
+                ['紀錄ID', '類別編號', '品項編號', '細項編號', '數量', '單價', '總價', '日期', '來源']])
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=['紀錄ID', '類別編號', '品項編號', '細項編號', '數量', '單價', '總價', '日期', '來源'])
+    return pd.concat(frames, ignore_index=True).sort_values(['日期', '紀錄ID'], ignore_index=True)
+
+def main():
+    ap = argparse.ArgumentParser(description='帳冊歸檔')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    c = sub.add_parser('close', help='歸檔指定年度（含）以前的 進貨/銷售')
+    c.add_argument('年度', type=int)
+    c.add_argument('--format', default='sqlite', choices=['sqlite', 'parquet'])
+    sub.add_parser('list', help='列出已歸檔的年度')
+    args = ap.parse_args()
+
+    from db import 初始化資料庫
+    初始化資料庫()
+    if args.cmd == 'close':
+        out = 歸檔(args.年度, args.format)
+        for y, (nb, ns) in out.items():
+            print(f'{y}：進貨 {nb} 筆、銷售 {ns} 筆')
+        print(f'現行期間自 {歸檔截止日()} 起' if out else '沒有需要歸檔的紀錄')
+    else:
+        print(歸檔清單().to_string(index=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""線上備份與快照還原：應用程式照常服務時，以 SQLite 備份 API 分段複製資料庫。
+
+備份用獨立的連線先開一個讀取交易固定快照，再每步複製 每步頁數 頁、步與步之間暫停讓出 I/O。
+WAL 模式下讀取不阻擋寫入，前景寫入照常提交；快照固定後別的連線寫入也不會讓分段備份從頭來過。
+刪除所有紀錄、批次刪除、匯入與歸檔之前自動建立快照（只保留最近 自動保留份數 份）。
+還原時先把目前的資料庫另存快照，再以備份 API 一次寫回目前的資料庫。
+
+    python backup.py create [名稱]
+    python backup.py list
+    python backup.py restore <名稱>
+"""
+import argparse
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+import db
+from db import DB_PATH, 交易, 取得連線, 升級結構
+
+備份目錄 = os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), 'backups')
+每步頁數 = 256        # 預設 4KB 頁，每步約 1MB
+暫停秒 = 0.002        # 每步之間讓出，避免備份占滿磁碟頻寬
+自動保留份數 = 20
+_自動 = '-自動-'
+
+def _路徑(名稱: str) -> str:
+    return os.path.join(備份目錄, f'{名稱}.db')
+
+def 備份(名稱: str = None, 暫停: float = None) -> str:
+    """建立快照，回傳快照名稱（省略時以時間命名）；同名快照已存在時加上序號"""
+    if DB_PATH == ':memory:':
+        raise RuntimeError('記憶體資料庫無法備份')
+    名稱 = 名稱 or datetime.now().strftime('%Y%m%d-%H%M%S')
+    if not re.fullmatch(r'[^\\/:*?"<>|\s]+', 名稱):
+        raise ValueError(f'快照名稱不可含空白或 \\/:*?"<>|：{名稱}')
+    os.makedirs(備份目錄, exist_ok=True)
+    base, i = 名稱, 1
+    while os.path.exists(_路徑(名稱)):
+        i += 1
+        名稱 = f'{base}-{i}'
+    path = _路徑(名稱)
+    pause = 暫停秒 if 暫停 is None else 暫停
+    with closing(sqlite3.connect(DB_PATH, timeout=db.忙碌逾時秒)) as src, \
+         closing(sqlite3.connect(f'{path}.tmp')) as dst:
+        src.execute('BEGIN')
+        src.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()   # 固定讀取快照直到備份結束
+        src.backup(dst, pages=每步頁數, progress=(lambda *_: time.sleep(pause)) if pause else None)
+        src.rollback()
+    os.replace(f'{path}.tmp', path)
+    return 名稱
+
+def 快照清單() -> pd.DataFrame:
+    """所有快照，新的在前：名稱、時間、大小MB、自動"""
+    rows = []
+    if os.path.isdir(備份目錄):
+        for f in os.listdir(備份目錄):
+            if f.endswith('.db'):
+                st = os.stat(os.path.join(備份目錄, f))
+                rows.append((f[:-3], datetime.fromtimestamp(st.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+                             round(st.st_size / 2 ** 20, 2), _自動 in f, st.st_mtime_ns))
+    df = pd.DataFrame(rows, columns=['名稱', '時間', '大小MB', '自動', '_ns'])
+    return df.sort_values('_ns', ascending=False, ignore_index=True).drop(columns='_ns')
+
+def 自動快照(原因: str, 保留: str = None) -> str:
+    """破壞性操作前呼叫：建立 <時間>-自動-<原因> 快照（不暫停，盡快完成），超過 自動保留份數 的舊自動快照刪除
+    （保留 指定的快照除外）"""
+    if DB_PATH == ':memory:':
+        return None
+    名稱 = 備份(f"{datetime.now():%Y%m%d-%H%M%S}{_自動}{re.sub(r'[^0-9A-Za-z_一-龥-]+', '_', 原因)}", 暫停=0)
+    snaps = 快照清單()
+    for old in snaps[snaps['自動']]['名稱'].iloc[自動保留份數:]:
+        if old != 保留:
+            os.remove(_路徑(old))
+    return 名稱
+
+def 還原(名稱: str) -> str:
+    """以快照覆蓋目前的資料庫，回傳還原前自動建立的快照名稱；不可在交易中呼叫"""
+    path = _路徑(名稱)
+    if not os.path.exists(path):
+        raise ValueError(f'找不到快照：{名稱}')
+    before = 自動快照('還原前', 保留=名稱)
+    con = 取得連線()
+    old = dict(con.execute("SELECT 表名, 版本 FROM 資料版本").fetchall())
+    with closing(sqlite3.connect(path)) as snap:
+        snap.backup(con)   # 取得寫入鎖後整份寫回；其他連線下次讀取即看到還原後的內容
+    升級結構(con)   # 快照的結構版本較舊時補上後續遷移
+    # 版本號只增不減，各行程的查詢快取與匯出檔一律失效
+    with 交易() as c:
+        c.executemany("UPDATE 資料版本 SET 版本=MAX(版本, ?)+1 WHERE 表名=?", [(v, t) for t, v in old.items()])
+    db._查詢快取.clear()
+    db._欄位快取.clear()
+    db._新增語句快取.clear()
+    return before
+
+def main():
+    ap = argparse.ArgumentParser(description='線上備份與快照還原')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    c = sub.add_parser('create', help='建立快照（應用程式可照常執行）')
+    c.add_argument('名稱', nargs='?')
+    sub.add_parser('list', help='列出快照')
+    r = sub.add_parser('restore', help='以快照覆蓋目前的資料庫')
+    r.add_argument('名稱')
+    args = ap.parse_args()
+
+    from db import 初始化資料庫
+    初始化資料庫()
+    if args.cmd == 'create':
+        t = time.perf_counter()
+        name = 備份(args.名稱)
+        print(f'已建立快照 {name}（{time.perf_counter() - t:.2f} 秒）：{_路徑(name)}')
+    elif args.cmd == 'list':
+        print(快照清單().to_string(index=False))
+    else:
+        before = 還原(args.名稱)
+        print(f'已還原 {args.名稱}；還原前的資料存為快照 {before}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""效能基準測試（以 python -m benchmarks.<名稱> 執行）"""
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""備份進行中前景寫入的延遲：無備份、分段備份（預設每步頁數與暫停）、一次複製整份，各階段的寫入延遲分位數
+
+前景執行緒以固定間隔逐筆寫入 銷售（與手動記錄相同的單筆交易），另一執行緒同時執行備份。
+
+    python -m benchmarks.bench_backup --rows 200000
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--rows', type=int, default=200000, help='銷售筆數（進貨另產生一半）')
+    ap.add_argument('--interval', type=float, default=0.005, help='前景寫入間隔秒數')
+    ap.add_argument('--baseline', type=float, default=3.0, help='無備份階段的秒數')
+    ap.add_argument('--seed', type=int, default=42)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['INVENTORY_DB'] = os.path.join(tmp, 'bench.db')
+    import backup
+    import db
+    from benchmarks import datagen
+
+    db.初始化資料庫()
+    master = datagen.主檔(10, 500, 5000, seed=args.seed)
+    db.批次匯入主檔(master)
+    db.批次匯入進貨(datagen.紀錄(master, args.rows // 2, seed=args.seed))
+    db.批次匯入銷售(datagen.紀錄(master, args.rows, '銷售', seed=args.seed + 1))
+    ids = db.取得連線().execute("SELECT 類別編號, 品項編號, 細項編號 FROM 銷售 LIMIT 1").fetchone()
+    size = os.path.getsize(db.DB_PATH) / 2 ** 20
+
+    def 前景(stop: threading.Event, out: list):
+        while not stop.is_set():
+            t = time.perf_counter()
+            with db.交易() as con:
+                con.execute("INSERT INTO 銷售 (類別編號, 品項編號, 細項編號, 數量, 單價分, 日期) VALUES (?,?,?,1,100,'2024-12-31')", ids)
+            out.append(time.perf_counter() - t)
+            time.sleep(args.interval)
+
+    def 階段(name, fn):
+        stop, lat = threading.Event(), []
+        th = threading.Thread(target=前景, args=(stop, lat))
+        th.start()
+        t = time.perf_counter()
+        fn()
+        sec = time.perf_counter() - t
+        stop.set()
+        th.join()
+        ms = np.array(lat) * 1000
+        print(f'{name:<10}{sec:8.2f} 秒{len(ms):8d}'
+              + ''.join(f'{np.percentile(ms, p):9.2f}' for p in (50, 95, 99)) + f'{ms.max():9.2f}')
+
+    def 分段():
+        backup.備份()
+
+    def 一次():
+        step, backup.每步頁數 = backup.每步頁數, -1
+        try:
+            backup.備份(暫停=0)
+        finally:
+            backup.每步頁數 = step
+
+    print(f'資料庫 {size:.1f} MB；每步 {backup.每步頁數} 頁、暫停 {backup.暫停秒 * 1000:.0f} ms')
+    print(f"{'階段':<10}{'耗時':>8}  {'寫入筆數':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'最大 ms':>9}")
+    階段('無備份', lambda: time.sleep(args.baseline))
+    階段('分段備份', 分段)
+    階段('一次複製', 一次)
+
+if __name__ == '__main__':
+    main()
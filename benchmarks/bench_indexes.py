@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""索引前後查詢時間比較
+
+在暫存資料庫套用遷移至 v2（尚無任何索引與唯一限制），產生指定筆數的進貨紀錄，
+量測常用查詢；再升級到最新版本後重測。
+
+    python -m benchmarks.bench_indexes --rows 1000000 --output bench_indexes.json
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+import db
+
+查詢組 = {
+    '品項 依類別': ("SELECT 品項編號, 品項名稱 FROM 品項 WHERE 類別編號=?", lambda r: (r.randint(1, 50),)),
+    '細項 依品項': ("SELECT 細項編號, 細項名稱 FROM 細項 WHERE 品項編號=?", lambda r: (r.randint(1, 2000),)),
+    '進貨 日期區間（一個月）': (
+        "SELECT * FROM 進貨 WHERE 日期 BETWEEN ? AND ?",
+        lambda r: ('2023-03-01', '2023-03-31'),
+    ),
+    '進貨 單一細項歷史': (
+        "SELECT 日期, 數量, 總價 FROM 進貨 WHERE 細項編號=? ORDER BY 日期",
+        lambda r: (r.randint(1, 20000),),
+    ),
+    '編輯頁 JOIN + 日期區間': (
+        """SELECT P.紀錄ID, C.類別名稱, I.品項名稱, S.細項名稱, P.數量, P.單價, P.總價, P.日期
+           FROM 進貨 P
+           JOIN 類別 C ON P.類別編號=C.類別編號
+           JOIN 品項 I ON P.品項編號=I.品項編號
+           JOIN 細項 S ON P.細項編號=S.細項編號
+           WHERE P.日期 BETWEEN ? AND ?""",
+        lambda r: ('2023-03-01', '2023-03-07'),
+    ),
+}
+
+def 產生資料(con: sqlite3.Connection, rows: int, seed: int = 42):
+    rnd = random.Random(seed)
+    with con:
+        con.executemany("INSERT INTO 類別 (類別名稱) VALUES (?)", [(f'類別{i}',) for i in range(1, 51)])
+        con.executemany("INSERT INTO 品項 (類別編號, 品項名稱) VALUES (?,?)",
+                        [((i - 1) % 50 + 1, f'品項{i}') for i in range(1, 2001)])
+        con.executemany("INSERT INTO 細項 (品項編號, 細項名稱) VALUES (?,?)",
+                        [((i - 1) % 2000 + 1, f'細項{i}') for i in range(1, 20001)])
+        start = date(2021, 1, 1)
+        def gen():
+            for _ in range(rows):
+                sid = rnd.randint(1, 20000)
+                iid = (sid - 1) % 2000 + 1
+                q, p = rnd.randint(1, 10), rnd.randint(100, 5000)
+                yield ((iid - 1) % 50 + 1, iid, sid, q, p, q * p,
+                       (start + timedelta(days=rnd.randint(0, 4 * 365))).isoformat())
+        con.executemany(
+            "INSERT INTO 進貨 (類別編號, 品項編號, 細項編號, 數量, 單價, 總價, 日期) VALUES (?,?,?,?,?,?,?)",
+            gen())
+
+def 量測(con: sqlite3.Connection, repeat: int, seed: int = 7) -> dict:
+    out = {}
+    for name, (sql, params) in 查詢組.items():
+        rnd = random.Random(seed)
+        t = time.perf_counter()
+        for _ in range(repeat):
+            con.execute(sql, params(rnd)).fetchall()
+        out[name] = (time.perf_counter() - t) / repeat * 1000
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--rows', type=int, default=1_000_000)
+    ap.add_argument('--repeat', type=int, default=5)
+    ap.add_argument('--output', help='結果寫入 JSON 檔')
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        con = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+        db.升級結構(con, 2)
+        t = time.perf_counter()
+        產生資料(con, args.rows)
+        print(f'產生 {args.rows:,} 筆進貨：{time.perf_counter() - t:.1f}s')
+        before = 量測(con, args.repeat)
+        t = time.perf_counter()
+        db.升級結構(con)
+        print(f'套用遷移 v3-v{db.遷移步驟[-1][0]}：{time.perf_counter() - t:.1f}s')
+        after = 量測(con, args.repeat)
+        con.close()
+
+    print(f"{'查詢':<24}{'索引前(ms)':>12}{'索引後(ms)':>12}{'倍數':>8}")
+    for name in 查詢組:
+        print(f'{name:<24}{before[name]:>12.2f}{after[name]:>12.2f}{before[name] / max(after[name], 1e-9):>8.1f}')
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'rows': args.rows, 'repeat': args.repeat, '索引前_ms': before, '索引後_ms': after},
+                      f, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""多個生產者同時寫入 銷售 的吞吐量：經由 ingest 的單一寫入佇列，或各自直接呼叫 批次匯入銷售
+
+每個生產者（模擬 POS 終端）送出 --requests 次、每次 --rows 列。direct 模式下每個執行緒用自己的連線，
+彼此搶 SQLite 寫入鎖；queue 模式下批次都交給同一個寫入執行緒合併成大交易。
+
+    python -m benchmarks.bench_ingest --producers 20 --requests 50 --rows 20
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--producers', type=int, default=20)
+    ap.add_argument('--requests', type=int, default=50)
+    ap.add_argument('--rows', type=int, default=20)
+    ap.add_argument('--seed', type=int, default=42)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['INVENTORY_DB'] = os.path.join(tmp, 'bench.db')
+    import db
+    import ingest
+    from benchmarks import datagen
+
+    db.初始化資料庫()
+    master = datagen.主檔(10, 500, 5000, seed=args.seed)
+    db.批次匯入主檔(master)
+    total = args.producers * args.requests * args.rows
+    src = datagen.紀錄(master, total, '銷售', seed=args.seed)
+    rows = [{'類別': r.類別, '品項': r.品項, '細項': r.細項, '數量': int(r.賣出數量),
+             '單價': float(r.賣出單價), '日期': r.日期} for r in src.itertuples()]
+
+    def 批次(k, j):
+        start = (k * args.requests + j) * args.rows
+        return [dict(r, 編號=f'{k}-{j}-{x}') for x, r in enumerate(rows[start:start + args.rows])]
+
+    def direct(k):
+        for j in range(args.requests):
+            dfs = ingest.整理批次(批次(k, j), '銷售')
+            db.批次匯入銷售(dfs['銷售'].drop(columns='_列'))
+
+    def queued(k):
+        for j in range(args.requests):
+            ingest.寫入紀錄(批次(k, j), '銷售')
+
+    print(f'{args.producers} 個生產者 × {args.requests} 次 × {args.rows} 列 = {total} 列')
+    for name, fn in (('direct', direct), ('queue', queued)):
+        with db.交易() as con:
+            con.execute('DELETE FROM 銷售')
+            con.execute('DELETE FROM 匯入列指紋')
+        th = [threading.Thread(target=fn, args=(k,)) for k in range(args.producers)]
+        t = time.perf_counter()
+        for x in th:
+            x.start()
+        for x in th:
+            x.join()
+        sec = time.perf_counter() - t
+        n = db.取得連線().execute('SELECT COUNT(*) FROM 銷售').fetchone()[0]
+        print(f'{name:<8}{sec:8.2f} 秒{n / sec:10.0f} 列/秒（寫入 {n} 列）')
+
+if __name__ == '__main__':
+    main()
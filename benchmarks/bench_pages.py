@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""各頁冷啟動與熱 rerun 時間
+
+以 Streamlit AppTest 無頭執行 app.py。冷啟動在全新子行程中量第一次 run（含模組載入與資料庫初始化），
+熱 rerun 量同一 session 之後的重跑時間（取中位數）。
+
+    python -m benchmarks.bench_pages --rows 20000 --output bench_pages.json
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, 'app.py')
+
+def _選單頁面() -> list:
+    """app.py 選單的 頁面 dict 的鍵；只解析原始碼，不執行 Streamlit"""
+    with open(APP, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, 'id', None) == '頁面' for t in node.targets):
+            return list(ast.literal_eval(node.value))
+    raise RuntimeError('app.py 找不到 頁面 選單')
+
+頁面 = _選單頁面()
+
+def 建立資料(rows: int):
+    """在 INVENTORY_DB 指向的資料庫以批次匯入建立測試資料（benchmarks.datagen，固定 seed）"""
+    import db
+    from benchmarks import datagen
+    db.初始化資料庫()
+    master = datagen.主檔(10, 200, 1000)
+    db.批次匯入主檔(master)
+    db.批次匯入進貨(datagen.紀錄(master, rows, '進貨'))
+    db.批次匯入銷售(datagen.紀錄(master, rows // 2, '銷售'))
+
+def 量測頁面(page: str, reruns: int) -> dict:
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.session_state['menu'] = page
+    t = time.perf_counter()
+    at.run()
+    cold = time.perf_counter() - t
+    if at.exception:
+        raise RuntimeError(f'{page}: {at.exception[0].message}')
+    warm = []
+    for _ in range(reruns):
+        t = time.perf_counter()
+        at.run()
+        warm.append(time.perf_counter() - t)
+    return {'冷啟動_ms': cold * 1000, '熱rerun_ms': statistics.median(warm) * 1000}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--rows', type=int, default=20000)
+    ap.add_argument('--reruns', type=int, default=5)
+    ap.add_argument('--output', help='結果寫入 JSON 檔')
+    ap.add_argument('--worker', help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        print(json.dumps(量測頁面(args.worker, args.reruns), ensure_ascii=False))
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, INVENTORY_DB=os.path.join(tmp, 'bench.db'),
+                   PYTHONPATH=ROOT)
+        os.environ['INVENTORY_DB'] = env['INVENTORY_DB']
+        建立資料(args.rows)
+        for page in 頁面:
+            out = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_pages', '--worker', page, '--reruns', str(args.reruns)],
+                env=env, cwd=tmp, capture_output=True, text=True, check=True,
+            )
+            results[page] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    print(f"{'頁面':<10}{'冷啟動(ms)':>12}{'熱rerun(ms)':>12}")
+    for page, r in results.items():
+        print(f"{page:<10}{r['冷啟動_ms']:>12.1f}{r['熱rerun_ms']:>12.1f}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'rows': args.rows, 'reruns': args.reruns, '頁面': results}, f, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
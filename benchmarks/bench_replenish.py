@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""補貨指標的計算時間：全部細項一次重算（首次或跨日）、少量寫入後的增量重算、讀取補貨清單
+
+    python -m benchmarks.bench_replenish --skus 30000 --rows 500000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--skus', type=int, default=30000)
+    ap.add_argument('--rows', type=int, default=500000, help='銷售筆數（進貨另產生一半）')
+    ap.add_argument('--seed', type=int, default=42)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['INVENTORY_DB'] = os.path.join(tmp, 'bench.db')
+    import pandas as pd
+    import db
+    import replenish
+    from benchmarks import datagen
+
+    db.初始化資料庫()
+    master = datagen.主檔(20, max(args.skus // 10, 1), args.skus, seed=args.seed)
+    db.批次匯入主檔(master)
+    db.批次匯入進貨(datagen.紀錄(master, args.rows // 2, seed=args.seed))
+    db.批次匯入銷售(datagen.紀錄(master, args.rows, '銷售', seed=args.seed + 1))
+    today = db.取得連線().execute("SELECT MAX(日期) FROM 銷售").fetchone()[0]
+
+    def 計時(name, fn):
+        t = time.perf_counter()
+        out = fn()
+        print(f'{name:<16}{(time.perf_counter() - t) * 1000:10.1f} ms  {out}')
+
+    print(f'{len(master)} 個細項、{args.rows} 筆銷售，計算日 {today}')
+    計時('全部重算', lambda: f'{replenish.更新補貨(今日=today)} 個細項')
+    計時('無異動', lambda: f'{replenish.更新補貨(今日=today)} 個細項')
+    db.批次匯入銷售(datagen.紀錄(master, 200, '銷售', seed=args.seed + 2).assign(日期=today))
+    計時('寫入 200 筆後', lambda: f'{replenish.更新補貨(今日=today)} 個細項')
+    sql, params = replenish.補貨SQL()
+    計時('讀取補貨清單', lambda: f"{len(pd.read_sql(sql, db.取得連線(), params=params))} 列")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""匯入、儀表板彙總與日期篩選的規模測試
+
+每個規模在全新的暫存資料庫（獨立子行程）中，以 benchmarks.datagen 產生固定 seed 的資料，
+依序量測：批次匯入主檔、批次匯入進貨、批次匯入銷售（進貨筆數的一半）、儀表板彙總與篩選、
+日期區間查詢（首頁、計數、類別篩選、整年逐批讀取）。查詢類情境每次量測前清除查詢快取，
+取 --repeat 次的中位數。結果寫入 JSON，可與先前的結果比對。
+
+    python -m benchmarks.bench_suite --sizes 10k 100k 1M --output bench_suite.json
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def 筆數(text: str) -> int:
+    """'10k' / '1M' / '25000' → 整數"""
+    text = text.strip().lower().replace('_', '')
+    mult = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if mult > 1 else text) * mult)
+
+def _計時(fn, repeat: int = 1) -> float:
+    """回傳 repeat 次的中位數毫秒"""
+    out = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t) * 1000)
+    return statistics.median(out)
+
+def 執行情境(rows: int, args) -> dict:
+    """在目前 INVENTORY_DB 指向的空資料庫上跑所有情境"""
+    import db
+    from benchmarks import datagen
+
+    db.初始化資料庫()
+    master = datagen.主檔(args.categories, args.items, args.subitems, seed=args.seed)
+    buys = datagen.紀錄(master, rows, '進貨', seed=args.seed)
+    sells = datagen.紀錄(master, rows // 2, '銷售', seed=args.seed)
+    res = {}
+
+    def 匯入(name, fn, df):
+        ms = _計時(lambda: fn(df))
+        res[name] = {'ms': ms, '筆數': len(df), '每秒筆數': len(df) / ms * 1000 if ms else None}
+
+    匯入('批次匯入主檔', db.批次匯入主檔, master)
+    匯入('批次匯入進貨', db.批次匯入進貨, buys)
+    匯入('批次匯入銷售', db.批次匯入銷售, sells)
+
+    def 查詢(name, fn):
+        def run():
+            db._查詢快取.clear()
+            return fn()
+        out = fn()
+        res[name] = {'ms': _計時(run, args.repeat), '筆數': len(out) if hasattr(out, '__len__') else out}
+
+    cat = master['類別'].iloc[0]
+    cid = db.取得對映('類別')[cat]
+    y = buys['日期'].iloc[len(buys) // 2][:4]
+    查詢('儀表板 全部摘要', db.讀取庫存摘要)
+    查詢('儀表板 類別篩選', lambda: db.讀取庫存摘要(類別=cat))
+    查詢('儀表板 金額總計', lambda: db.金額總計()['支出分'])
+    查詢('日期篩選 一個月首頁', lambda: db.查詢紀錄('進貨', f'{y}-03-01', f'{y}-03-31', 筆數=100))
+    查詢('日期篩選 一年計數', lambda: db.計數紀錄('進貨', f'{y}-01-01', f'{y}-12-31'))
+    查詢('日期篩選 類別一年首頁', lambda: db.查詢紀錄('進貨', f'{y}-01-01', f'{y}-12-31', 筆數=100, 類別編號=cid))
+    查詢('日期篩選 一年逐批讀取', lambda: sum(len(b) for b in db.逐批讀取(
+        *db.紀錄SQL('進貨', f'{y}-01-01', f'{y}-12-31'))))
+    return res
+
+def 環境() -> dict:
+    import numpy
+    import pandas
+    return {
+        'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+        'pandas': pandas.__version__, 'numpy': numpy.__version__,
+        'platform': platform.platform(), 'cpu': platform.processor() or platform.machine(),
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--sizes', nargs='+', default=['10k', '100k', '1M'], help='進貨筆數，可用 k/M')
+    ap.add_argument('--categories', type=int, default=10)
+    ap.add_argument('--items', type=int, default=500)
+    ap.add_argument('--subitems', type=int, default=5000)
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--repeat', type=int, default=5)
+    ap.add_argument('--output', help='結果寫入 JSON 檔')
+    ap.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        print(json.dumps(執行情境(args.worker, args), ensure_ascii=False))
+        return
+
+    sizes = [筆數(s) for s in args.sizes]
+    results = {}
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, INVENTORY_DB=os.path.join(tmp, 'bench.db'), PYTHONPATH=ROOT)
+            cmd = [sys.executable, '-m', 'benchmarks.bench_suite', '--worker', str(rows),
+                   '--categories', str(args.categories), '--items', str(args.items),
+                   '--subitems', str(args.subitems), '--seed', str(args.seed), '--repeat', str(args.repeat)]
+            out = subprocess.run(cmd, env=env, cwd=tmp, capture_output=True, text=True)
+            if out.returncode:
+                sys.exit(f'{rows} 筆失敗：\n{out.stderr}')
+            results[str(rows)] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    names = list(next(iter(results.values())))
+    print(f"{'情境':<16}" + ''.join(f'{r:>12}' for r in results))
+    for name in names:
+        print(f'{name:<16}' + ''.join(f"{results[r][name]['ms']:>12.1f}" for r in results))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                '版本': 1, '環境': 環境(),
+                '參數': {'sizes': sizes, 'categories': args.categories, 'items': args.items,
+                         'subitems': args.subitems, 'seed': args.seed, 'repeat': args.repeat},
+                '結果': results,
+            }, f, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
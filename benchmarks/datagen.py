@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""首飾庫存的合成資料產生器（固定 seed 即產生完全相同的資料）
+
+主檔：類別 → 品項 → 細項，品項在類別間、細項在品項間的分布都偏斜（少數熱門、長尾冷門）。
+紀錄：進貨/銷售 集中在熱門細項（Zipf），橫跨數年並有年底與五月旺季；欄位與上傳檔相同，
+可直接交給 批次匯入主檔 / 批次匯入進貨 / 批次匯入銷售。
+"""
+import numpy as np
+import pandas as pd
+
+類別名 = ['戒指', '項鍊', '耳環', '手鍊', '手環', '胸針', '髮飾', '腳鍊', '袖扣', '墜飾']
+系列 = ['晨光', '潮汐', '森語', '星塵', '花信', '初雪', '月影', '山嵐', '雨巷', '微光']
+款式 = ['素面', '鑲鑽', '珍珠', '編織', '鏤空', '刻字', '雙層', '極簡', '復古', '幾何']
+材質 = ['925銀', '14K金', '18K金', '玫瑰金', '黃銅', '鈦鋼']
+規格 = ['#5', '#7', '#9', '#11', '#13', 'S', 'M', 'L', '40cm', '45cm']
+
+def _偏斜權重(n: int, s: float, rng: np.random.Generator) -> np.ndarray:
+    """Zipf 權重（第 k 名 ∝ 1/k^s），名次隨機指派"""
+    w = 1.0 / np.arange(1, n + 1) ** s
+    rng.shuffle(w)
+    return w / w.sum()
+
+def 主檔(類別數: int = 10, 品項數: int = 500, 細項數: int = 5000, seed: int = 42) -> pd.DataFrame:
+    """回傳 類別/品項/細項 三欄，每列一個細項"""
+    if not 類別數 <= 品項數 <= 細項數:
+        raise ValueError('需滿足 類別數 ≤ 品項數 ≤ 細項數')
+    rng = np.random.default_rng(seed)
+    cats = [類別名[i % len(類別名)] + (str(i // len(類別名) + 1) if i >= len(類別名) else '')
+            for i in range(類別數)]
+    # 每個類別至少一個品項、每個品項至少一個細項，其餘依偏斜權重分配
+    item_cat = np.concatenate([np.arange(類別數),
+                               rng.choice(類別數, 品項數 - 類別數, p=_偏斜權重(類別數, 1.0, rng))])
+    per_item = 1 + np.bincount(rng.choice(品項數, 細項數 - 品項數, p=_偏斜權重(品項數, 0.8, rng)),
+                               minlength=品項數)
+    sr, ks = rng.integers(len(系列), size=品項數), rng.integers(len(款式), size=品項數)
+    rows = []
+    for i in range(品項數):
+        cat = cats[item_cat[i]]
+        item = f'{系列[sr[i]]}{款式[ks[i]]}{cat}-{i + 1:04d}'
+        for j in range(per_item[i]):
+            sub = f'{材質[j % len(材質)]} {規格[(j // len(材質)) % len(規格)]}'
+            if j >= len(材質) * len(規格):
+                sub += f' 第{j // (len(材質) * len(規格)) + 1}款'
+            rows.append((cat, item, sub))
+    return pd.DataFrame(rows, columns=['類別', '品項', '細項'])
+
+def _成本(n: int, seed: int) -> np.ndarray:
+    # 每個細項的基準成本（元），進貨與銷售共用，與紀錄筆數無關
+    rng = np.random.default_rng(seed + 1000)
+    return np.maximum(np.round(rng.lognormal(6.5, 0.6, n), -1), 50)
+
+def _日期(rng: np.random.Generator, rows: int, 起: str, 年數: int) -> np.ndarray:
+    start = np.datetime64(起, 'D')
+    days = np.arange(年數 * 365)
+    month = (start + days).astype('datetime64[M]').astype(int) % 12 + 1
+    w = 1.0 + 0.8 * (month == 12) + 0.4 * (month == 11) + 0.3 * (month == 5)
+    picked = np.sort(rng.choice(days, rows, p=w / w.sum()))
+    return (start + picked).astype(str)
+
+def 紀錄(master: pd.DataFrame, rows: int, 類型: str = '進貨', 起: str = '2021-01-01', 年數: int = 4,
+       seed: int = 42) -> pd.DataFrame:
+    """回傳上傳檔格式的 進貨/銷售 紀錄（依日期排序）"""
+    if 類型 not in ('進貨', '銷售'):
+        raise ValueError(f'不支援的紀錄類型：{類型}')
+    rng = np.random.default_rng(seed + (1 if 類型 == '進貨' else 2))
+    n = len(master)
+    idx = rng.choice(n, rows, p=_偏斜權重(n, 1.1, np.random.default_rng(seed + 3)))
+    cost = _成本(n, seed)[idx]
+    if 類型 == '進貨':
+        qty = rng.integers(1, 21, rows)
+        price = np.round(cost * rng.uniform(0.95, 1.05, rows), 2)
+        qc, pc = '買入數量', '買入單價'
+    else:
+        qty = 1 + rng.poisson(0.4, rows)
+        price = np.round(cost * rng.uniform(2.2, 3.0, rows), -1)
+        qc, pc = '賣出數量', '賣出單價'
+    out = master.iloc[idx].reset_index(drop=True)
+    out[qc] = qty
+    out[pc] = price
+    out['日期'] = _日期(rng, rows, 起, 年數)
+    return out
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""銷貨成本：把 進貨 的成本層分配給每筆 銷售（先進先出、移動平均兩種方法），算出各細項的實際毛利。
+
+進貨/銷售 寫入時，觸發器只在 成本待算 記下細項與最早的異動日期；讀取毛利前呼叫 更新成本()，
+每個待算細項只從該日期起重播。結果存在 銷售成本（每筆銷售的成本）與 進貨均價（每筆進貨後的移動平均單價，
+供下次從中途接續）。同一天內先進貨後銷售，同日同類依 紀錄ID。賣超（累計銷售超過當日為止的累計進貨）時
+成本取自之後的進貨並標記 缺貨；之後有異動時從該細項最早的缺貨日起重播。
+"""
+import numpy as np
+import pandas as pd
+
+from db import 交易, 取得連線, 版本快取
+
+方法欄 = {'先進先出': '先進先出分', '移動平均': '平均成本分'}
+
+def _期初(con, 細項編號: int) -> tuple:
+    """歸檔時留下的成本狀態：(剩餘成本層 [(數量, 單價分)], 結存數量（可為負）, 移動平均單價分, 最後進貨單價分)"""
+    layers = con.execute("SELECT 數量, 單價分 FROM 期初成本層 WHERE 細項編號=? ORDER BY 序", (細項編號,)).fetchall()
+    row = con.execute("SELECT 期初數量, 期初均價分, 最後單價分 FROM 期初結存 WHERE 細項編號=?", (細項編號,)).fetchone()
+    return layers, *(row or (0, None, None))
+
+def _載入(con, 細項編號: int, 起: str) -> tuple:
+    """重播所需資料：全部進貨成本層、起 日起的銷售、起 日前的累計銷售量與最後移動平均單價、期初狀態"""
+    buys = con.execute("""SELECT 紀錄ID, 日期, 數量, COALESCE(單價分, 0) FROM 進貨
+        WHERE 細項編號=? AND 日期 IS NOT NULL AND 數量 > 0 ORDER BY 日期, 紀錄ID""", (細項編號,)).fetchall()
+    sells = con.execute("""SELECT 紀錄ID, 日期, COALESCE(數量, 0) FROM 銷售
+        WHERE 細項編號=? AND 日期>=? ORDER BY 日期, 紀錄ID""", (細項編號, 起)).fetchall()
+    sold = con.execute("SELECT COALESCE(SUM(數量), 0) FROM 銷售 WHERE 細項編號=? AND 日期<?",
+                       (細項編號, 起)).fetchone()[0]
+    row = con.execute("""SELECT 均價分 FROM 進貨均價 WHERE 細項編號=? AND 日期<?
+        ORDER BY 日期 DESC, 紀錄ID DESC LIMIT 1""", (細項編號, 起)).fetchone()
+    return buys, sells, sold, row[0] if row else None, _期初(con, 細項編號)
+
+def _重播(細項編號: int, 起: str, buys, sells, 前期銷售, 均價, 期初=((), 0, None, None)) -> tuple:
+    """回傳 (銷售成本列, 進貨均價列)，只含 起 日（含）之後的紀錄"""
+    layers, q0, a0, last = 期初
+    bq = np.array([b[2] for b in buys], dtype=float)
+    bu = np.array([b[3] for b in buys], dtype=float)
+    bd = np.array([b[1] for b in buys], dtype=str)
+    sq = np.array([s[2] for s in sells], dtype=float)
+    sd = np.array([s[1] for s in sells], dtype=str)
+
+    # 先進先出：第 x 件售出品的累計成本是進貨累計曲線上的內插值，每筆銷售的成本 = 曲線在前後位置的差；
+    # 期初成本層排在最前面，期初結存為負（賣超）時由之後的進貨先補足
+    lq = np.concatenate([[q for q, _ in layers], bq])
+    lu = np.concatenate([[u for _, u in layers], bu])
+    ld = np.concatenate([[''] * len(layers), bd]).astype(str)
+    cq = np.concatenate([[0.0], np.cumsum(lq)])
+    cc = np.concatenate([[0.0], np.cumsum(lq * lu)])
+    pos = max(-q0, 0) + 前期銷售 + np.concatenate([[0.0], np.cumsum(sq)])
+    curve = np.interp(pos, cq, cc)
+    last = lu[-1] if len(lu) else last   # 進貨全部歸檔且沒有剩餘成本層時取歸檔前最後一筆進貨
+    if last is not None:
+        curve += np.maximum(pos - cq[-1], 0) * last   # 超出全部進貨的部分以最後單價計
+    fifo = np.diff(curve)
+    short = pos[1:] > cq[np.searchsorted(ld, sd, side='right')]
+
+    # 移動平均：依序處理 起 日後的進貨與銷售；庫存為負時新進貨不與舊均價混合
+    on_hand = q0 + bq[bd < 起].sum() - 前期銷售
+    i = int(np.searchsorted(bd, 起))
+    avg_rows, avg = [], 均價 if 均價 is not None else a0
+    cost = np.empty(len(sells))
+    for j in range(len(sells) + 1):
+        d = sd[j] if j < len(sells) else None
+        while i < len(buys) and (d is None or bd[i] <= d):
+            base = max(on_hand, 0)
+            avg = bu[i] if avg is None else (base * avg + bq[i] * bu[i]) / (base + bq[i])
+            on_hand += bq[i]
+            avg_rows.append((buys[i][0], 細項編號, buys[i][1], float(avg)))
+            i += 1
+        if d is not None:
+            cost[j] = fifo[j] if avg is None else avg * sq[j]   # 尚無成本基礎時沿用先進先出
+            on_hand -= sq[j]
+
+    sale_rows = [(s[0], 細項編號, s[1], int(round(f)), int(round(a)), int(x))
+                 for s, f, a, x in zip(sells, fifo, cost, short)]
+    return sale_rows, avg_rows
+
+def _重算細項(con, 細項編號: int, 起: str):
+    """從 起 日起重播單一細項；需在交易內呼叫"""
+    first_short = con.execute("SELECT MIN(日期) FROM 銷售成本 WHERE 細項編號=? AND 缺貨=1",
+                              (細項編號,)).fetchone()[0]
+    if first_short is not None and first_short < 起:
+        起 = first_short
+    con.execute("DELETE FROM 銷售成本 WHERE 細項編號=? AND 日期>=?", (細項編號, 起))
+    con.execute("DELETE FROM 進貨均價 WHERE 細項編號=? AND 日期>=?", (細項編號, 起))
+    sale_rows, avg_rows = _重播(細項編號, 起, *_載入(con, 細項編號, 起))
+    # 紀錄改到別的細項時，舊細項的列可能還沒刪，以 REPLACE 覆蓋
+    con.executemany("INSERT OR REPLACE INTO 銷售成本 VALUES (?,?,?,?,?,?)", sale_rows)
+    con.executemany("INSERT OR REPLACE INTO 進貨均價 VALUES (?,?,?,?)", avg_rows)
+
+def 截止狀態(con, 細項編號: int, 截止: str) -> tuple:
+    """截止 日前（不含）的成本狀態，格式同 _期初；歸檔時寫入 期初成本層/期初結存"""
+    layers, q0, a0, last = _期初(con, 細項編號)
+    buys = con.execute("""SELECT 數量, COALESCE(單價分, 0) FROM 進貨
+        WHERE 細項編號=? AND 日期<? AND 數量 > 0 ORDER BY 日期, 紀錄ID""", (細項編號, 截止)).fetchall()
+    sold = con.execute("SELECT COALESCE(SUM(數量), 0) FROM 銷售 WHERE 細項編號=? AND 日期<?",
+                       (細項編號, 截止)).fetchone()[0]
+    row = con.execute("""SELECT 均價分 FROM 進貨均價 WHERE 細項編號=? AND 日期<?
+        ORDER BY 日期 DESC, 紀錄ID DESC LIMIT 1""", (細項編號, 截止)).fetchone()
+    used, remain = max(-q0, 0) + sold, []
+    for q, u in list(layers) + buys:
+        take = min(q, max(used, 0))
+        used -= take
+        if q > take:
+            remain.append((q - take, u))
+    return remain, q0 + sum(q for q, _ in buys) - sold, row[0] if row else a0, buys[-1][1] if buys else last
+
+def 更新成本(批量: int = 200) -> int:
+    """重播所有待算細項，回傳處理的細項數；沒有待算時只多一次查詢"""
+    if not 取得連線().execute("SELECT 1 FROM 成本待算 LIMIT 1").fetchone():
+        return 0
+    n = 0
+    while True:
+        with 交易() as con:
+            rows = con.execute("SELECT 細項編號, 起日 FROM 成本待算 LIMIT ?", (批量,)).fetchall()
+            for sid, 起 in rows:
+                _重算細項(con, sid, 起)
+            con.executemany("DELETE FROM 成本待算 WHERE 細項編號=?", [(r[0],) for r in rows])
+        n += len(rows)
+        if len(rows) < 批量:
+            return n
+
+def 重建成本() -> int:
+    """全部細項從頭重播"""
+    with 交易() as con:
+        con.execute("DELETE FROM 銷售成本")
+        con.execute("DELETE FROM 進貨均價")
+        con.execute("""INSERT OR REPLACE INTO 成本待算 (細項編號, 起日)
+            SELECT 細項編號, '' FROM 進貨 WHERE 細項編號 IS NOT NULL
+            UNION SELECT 細項編號, '' FROM 銷售 WHERE 細項編號 IS NOT NULL""")
+    return 更新成本()
+
+def 核對成本() -> pd.DataFrame:
+    """增量結果與從頭重播比對，回傳不一致的銷售（空表代表一致）"""
+    更新成本()
+    con = 取得連線()
+    cols = ['紀錄ID', '細項編號', '日期', '先進先出分', '平均成本分', '缺貨']
+    sids = [r[0] for r in con.execute(
+        "SELECT 細項編號 FROM 進貨 WHERE 細項編號 IS NOT NULL UNION SELECT 細項編號 FROM 銷售 WHERE 細項編號 IS NOT NULL")]
+    raw = pd.DataFrame([r for sid in sids for r in _重播(sid, '', *_載入(con, sid, ''))[0]], columns=cols)
+    kept = pd.read_sql(f"SELECT {', '.join(cols)} FROM 銷售成本", con)
+    both = raw.merge(kept, on='紀錄ID', how='outer', suffixes=('_重播', '_增量'), indicator=True)
+    bad = both['_merge'] != 'both'
+    for c in cols[1:]:
+        bad |= both[f'{c}_重播'] != both[f'{c}_增量']
+    return both[bad].drop(columns='_merge').reset_index(drop=True)
+
+def 毛利SQL(起=None, 迄=None, 方法: str = '先進先出', 類別編號=None) -> tuple:
+    """各細項期間內的 銷售數量/收入/銷貨成本/毛利（元）與毛利率（%）的 (sql, params)；
+    讀取前須先 更新成本()"""
+    col = 方法欄[方法]
+    where, params = [], []
+    for cond, val in (('K.日期 >= ?', 起), ('K.日期 <= ?', 迄)):
+        if val is not None:
+            where.append(cond)
+            params.append(str(val)[:10])
+    outer = ''
+    if 類別編號 is not None:
+        outer = 'WHERE I.類別編號=?'
+        params.append(int(類別編號))
+    sql = f"""
+        SELECT C.類別名稱 AS 類別, I.品項名稱 AS 品項, S.細項名稱 AS 細項,
+               T.銷售數量, T.收入分 / 100.0 AS 收入, T.成本分 / 100.0 AS 銷貨成本,
+               (T.收入分 - T.成本分) / 100.0 AS 毛利,
+               CASE WHEN T.收入分 <> 0 THEN ROUND(100.0 * (T.收入分 - T.成本分) / T.收入分, 1) END AS 毛利率
+        FROM (SELECT K.細項編號, SUM(R.數量) AS 銷售數量, SUM(R.總價分) AS 收入分, SUM(K.{col}) AS 成本分
+              FROM 銷售成本 K JOIN 銷售 R ON R.紀錄ID=K.紀錄ID
+              {('WHERE ' + ' AND '.join(where)) if where else ''}
+              GROUP BY K.細項編號) T
+        JOIN 細項 S ON T.細項編號=S.細項編號
+        JOIN 品項 I ON S.品項編號=I.品項編號
+        JOIN 類別 C ON I.類別編號=C.類別編號
+        {outer}
+        ORDER BY 毛利 DESC
+    """
+    return sql, params
+
+@版本快取('類別','品項','細項','進貨','銷售')
+def 讀取毛利(起=None, 迄=None, 方法: str = '先進先出', 類別編號=None) -> pd.DataFrame:
+    更新成本()
+    sql, params = 毛利SQL(起, 迄, 方法, 類別編號)
+    return pd.read_sql(sql, 取得連線(), params=params)
+
+@版本快取('進貨','銷售')
+def 銷貨成本總計() -> dict:
+    """全部銷售（含已歸檔）的 收入 與兩種方法的銷貨成本（整數分）"""
+    更新成本()
+    rev, fifo, avg = 取得連線().execute("""
+        SELECT COALESCE(SUM(R.總價分), 0), COALESCE(SUM(K.先進先出分), 0), COALESCE(SUM(K.平均成本分), 0)
+        FROM 銷售成本 K JOIN 銷售 R ON R.紀錄ID=K.紀錄ID""").fetchone()
+    # 已歸檔的銷售
+    a_rev, a_fifo, a_avg = 取得連線().execute("""
+        SELECT COALESCE(SUM(收入分), 0), COALESCE(SUM(先進先出分), 0), COALESCE(SUM(平均成本分), 0) FROM 期初結存
+    """).fetchone()
+    rev, fifo, avg = rev + a_rev, fifo + a_fifo, avg + a_avg
+    return {'收入分': rev, '先進先出分': fifo, '平均成本分': avg}
+
+if __name__ == '__main__':
+    import sys
+    from db import 初始化資料庫
+    初始化資料庫()
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ''
+    if cmd == 'rebuild':
+        print(f'已重播 {重建成本()} 個細項')
+    elif cmd == 'verify':
+        from archive import 核對歸檔成本
+        bad = 核對成本()
+        print('銷售成本 與從頭重播一致' if bad.empty else bad.to_string(index=False))
+        old = 核對歸檔成本()
+        print('歸檔前後銷貨成本一致' if old.empty else old.to_string(index=False))
+        sys.exit(1 if len(bad) or len(old) else 0)
+    else:
+        print('用法：python costing.py rebuild|verify')
+        sys.exit(2)
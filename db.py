@@ -0,0 +1,1359 @@
+# -*- coding: utf-8 -*-
+"""資料存取層：連線、資料表結構、欄位快取與共用讀寫函式"""
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+# --- 資料庫連線（每個執行緒一條連線，執行緒結束後回收給下一個執行緒） ---
+DB_PATH = os.environ.get('INVENTORY_DB', 'database.db')
+忙碌逾時秒 = 10
+
+# 由 DataFrame 取出的編號是 numpy 整數，sqlite3 預設無法綁定
+sqlite3.register_adapter(np.int64, int)
+sqlite3.register_adapter(np.int32, int)
+寫入重試次數 = 5
+
+_池鎖 = threading.Lock()
+_使用中: dict = {}   # 執行緒 ident -> (執行緒, 連線)
+_閒置: list = []
+連線類別 = sqlite3.Connection   # 效能量測開啟時換成計時的子類別（見 profiling.py）
+
+def _開啟連線() -> sqlite3.Connection:
+    con = sqlite3.connect(DB_PATH, timeout=忙碌逾時秒, check_same_thread=False, factory=連線類別)
+    con.execute("PRAGMA journal_mode=WAL")       # 讀取不被寫入阻擋
+    con.execute("PRAGMA synchronous=NORMAL")     # WAL 下僅 checkpoint 時 fsync
+    con.execute("PRAGMA cache_size=-20000")      # 約 20MB 頁快取
+    con.execute("PRAGMA mmap_size=268435456")    # 256MB 記憶體映射讀取
+    con.execute("PRAGMA temp_store=MEMORY")
+    return con
+
+def 取得連線() -> sqlite3.Connection:
+    """回傳目前執行緒專用的連線；Streamlit 每個 session/rerun 各自在不同執行緒"""
+    t = threading.current_thread()
+    got = _使用中.get(t.ident)
+    if got and got[0] is t:
+        return got[1]
+    with _池鎖:
+        if DB_PATH == ':memory:' and (_閒置 or _使用中):
+            # 記憶體資料庫每條連線各自獨立，只能共用同一條
+            return (_閒置 or [v[1] for v in _使用中.values()])[0]
+        for ident, (th, con) in list(_使用中.items()):
+            if not th.is_alive():
+                del _使用中[ident]
+                if type(con) is not 連線類別:
+                    con.close()
+                    continue
+                if con.in_transaction:
+                    con.rollback()
+                _閒置.append(con)
+        con = _閒置.pop() if _閒置 else _開啟連線()
+        _使用中[t.ident] = (t, con)
+    return con
+
+def 重設連線池():
+    """關閉閒置連線，之後開啟的連線改用目前的 連線類別；使用中的連線在其執行緒結束回收時才替換"""
+    if DB_PATH == ':memory:':
+        return
+    with _池鎖:
+        while _閒置:
+            _閒置.pop().close()
+
+@contextmanager
+def 交易():
+    """以 BEGIN IMMEDIATE 先取得寫入鎖（忙碌時退避重試），區塊結束 commit，例外則 rollback；
+    已在交易中時直接沿用外層交易"""
+    con = 取得連線()
+    if con.in_transaction:
+        yield con
+        return
+    for i in range(寫入重試次數):
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            break
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) or i == 寫入重試次數 - 1:
+                raise
+            time.sleep(0.05 * 2 ** i)
+    try:
+        yield con
+    except BaseException:
+        con.rollback()
+        raise
+    con.commit()
+
+def 執行(sql: str, params=()) -> int:
+    """在單一寫入交易中執行一條語句，回傳影響筆數"""
+    with 交易() as con:
+        return con.execute(sql, params).rowcount
+
+# --- 結構資訊（欄位快取） ---
+_欄位快取: dict = {}
+_新增語句快取: dict = {}
+
+def 欄位(table: str) -> list:
+    """以 PRAGMA table_info 取得欄位清單，同一資料表只查一次"""
+    if table not in _欄位快取:
+        _欄位快取[table] = [r[1] for r in 取得連線().execute(f"PRAGMA table_info({table})")]
+    return _欄位快取[table]
+
+# --- 結構遷移（schema_version 記錄已套用的版本，依序往上升級） ---
+版本化資料表 = ['類別','品項','細項','進貨','銷售']
+_彙總欄 = {'進貨': ('進貨數量','支出分','進貨筆數'), '銷售': ('銷售數量','收入分','銷售筆數')}
+
+# 金額以「分」（整數）存放，加總在 SQLite 內完成且沒有浮點誤差
+_原始彙總SQL = """
+SELECT 細項編號,
+       SUM(CASE WHEN 來源='進貨' THEN 數量 ELSE 0 END) AS 進貨數量,
+       SUM(CASE WHEN 來源='進貨' THEN 總價分 ELSE 0 END) AS 支出分,
+       SUM(來源='進貨') AS 進貨筆數,
+       SUM(CASE WHEN 來源='銷售' THEN 數量 ELSE 0 END) AS 銷售數量,
+       SUM(CASE WHEN 來源='銷售' THEN 總價分 ELSE 0 END) AS 收入分,
+       SUM(來源='銷售') AS 銷售筆數
+FROM (SELECT '進貨' AS 來源, 細項編號, COALESCE(數量,0) AS 數量, 總價分 FROM 進貨
+      UNION ALL
+      SELECT '銷售', 細項編號, COALESCE(數量,0), 總價分 FROM 銷售)
+GROUP BY 細項編號
+"""
+
+# 原始紀錄加上已歸檔部分（期初結存），等於 庫存彙總 應有的值
+_含期初彙總SQL = f"""
+SELECT 細項編號, SUM(進貨數量) AS 進貨數量, SUM(支出分) AS 支出分, SUM(進貨筆數) AS 進貨筆數,
+       SUM(銷售數量) AS 銷售數量, SUM(收入分) AS 收入分, SUM(銷售筆數) AS 銷售筆數
+FROM ({_原始彙總SQL}
+      UNION ALL
+      SELECT 細項編號, 進貨數量, 支出分, 進貨筆數, 銷售數量, 收入分, 銷售筆數 FROM 期初結存)
+GROUP BY 細項編號
+"""
+
+# 月結存 = 月彙總 的逐月累計
+_月結存SQL = """
+SELECT 細項編號, 月份, SUM(進貨數量) OVER w, SUM(支出分) OVER w, SUM(銷售數量) OVER w, SUM(收入分) OVER w
+FROM 月彙總 WINDOW w AS (PARTITION BY 細項編號 ORDER BY 月份)
+"""
+
+# v2 時的結構（REAL 金額），只供 v2 遷移使用
+_v2彙總欄 = {'進貨': ('進貨數量','支出','進貨筆數'), '銷售': ('銷售數量','收入','銷售筆數')}
+_v2原始彙總SQL = """
+SELECT 細項編號,
+       SUM(CASE WHEN 來源='進貨' THEN 數量 ELSE 0 END) AS 進貨數量,
+       SUM(CASE WHEN 來源='進貨' THEN 總價 ELSE 0 END) AS 支出,
+       SUM(來源='進貨') AS 進貨筆數,
+       SUM(CASE WHEN 來源='銷售' THEN 數量 ELSE 0 END) AS 銷售數量,
+       SUM(CASE WHEN 來源='銷售' THEN 總價 ELSE 0 END) AS 收入,
+       SUM(來源='銷售') AS 銷售筆數
+FROM (SELECT '進貨' AS 來源, 細項編號, COALESCE(數量,0) AS 數量, COALESCE(總價,0) AS 總價 FROM 進貨
+      UNION ALL
+      SELECT '銷售', 細項編號, COALESCE(數量,0), COALESCE(總價,0) FROM 銷售)
+GROUP BY 細項編號
+"""
+
+def _v1_基本資料表(db: sqlite3.Connection):
+    # 主檔：類別、品項、細項（含 系列、圖片 欄位）
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 類別 (
+        類別編號 INTEGER PRIMARY KEY AUTOINCREMENT,
+        類別名稱 TEXT UNIQUE
+    )
+    """)
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 品項 (
+        品項編號 INTEGER PRIMARY KEY AUTOINCREMENT,
+        類別編號 INTEGER,
+        品項名稱 TEXT,
+        系列 TEXT,
+        FOREIGN KEY(類別編號) REFERENCES 類別(類別編號)
+    )
+    """)
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 細項 (
+        細項編號 INTEGER PRIMARY KEY AUTOINCREMENT,
+        品項編號 INTEGER,
+        細項名稱 TEXT,
+        圖片 TEXT,
+        FOREIGN KEY(品項編號) REFERENCES 品項(品項編號)
+    )
+    """)
+    # 舊資料庫可能缺少「圖片」欄位
+    if '圖片' not in [r[1] for r in db.execute("PRAGMA table_info(細項)")]:
+        db.execute("ALTER TABLE 細項 ADD COLUMN 圖片 TEXT")
+    # 進貨 / 銷售 紀錄表
+    for tbl in ['進貨','銷售']:
+        db.execute(f"""
+        CREATE TABLE IF NOT EXISTS {tbl} (
+            紀錄ID INTEGER PRIMARY KEY AUTOINCREMENT,
+            類別編號 INTEGER,
+            品項編號 INTEGER,
+            細項編號 INTEGER,
+            數量 INTEGER,
+            單價 REAL,
+            總價 REAL,
+            日期 TEXT,
+            FOREIGN KEY(類別編號) REFERENCES 類別(類別編號),
+            FOREIGN KEY(品項編號) REFERENCES 品項(品項編號),
+            FOREIGN KEY(細項編號) REFERENCES 細項(細項編號)
+        )
+        """)
+
+def _v2_庫存彙總(db: sqlite3.Connection):
+    # 每個細項一列，由觸發器隨 進貨/銷售 寫入同步維護
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 庫存彙總 (
+        細項編號 INTEGER PRIMARY KEY,
+        進貨數量 INTEGER NOT NULL DEFAULT 0,
+        支出 REAL NOT NULL DEFAULT 0,
+        進貨筆數 INTEGER NOT NULL DEFAULT 0,
+        銷售數量 INTEGER NOT NULL DEFAULT 0,
+        收入 REAL NOT NULL DEFAULT 0,
+        銷售筆數 INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    for tbl, (qc, ac, nc) in _v2彙總欄.items():
+        db.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {tbl}_彙總_新增 AFTER INSERT ON {tbl} BEGIN
+            INSERT OR IGNORE INTO 庫存彙總 (細項編號) VALUES (NEW.細項編號);
+            UPDATE 庫存彙總 SET {qc}={qc}+COALESCE(NEW.數量,0), {ac}={ac}+COALESCE(NEW.總價,0), {nc}={nc}+1
+            WHERE 細項編號=NEW.細項編號;
+        END
+        """)
+        db.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {tbl}_彙總_刪除 AFTER DELETE ON {tbl} BEGIN
+            UPDATE 庫存彙總 SET {qc}={qc}-COALESCE(OLD.數量,0), {ac}={ac}-COALESCE(OLD.總價,0), {nc}={nc}-1
+            WHERE 細項編號=OLD.細項編號;
+        END
+        """)
+        db.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {tbl}_彙總_更新 AFTER UPDATE OF 細項編號, 數量, 總價 ON {tbl} BEGIN
+            UPDATE 庫存彙總 SET {qc}={qc}-COALESCE(OLD.數量,0), {ac}={ac}-COALESCE(OLD.總價,0), {nc}={nc}-1
+            WHERE 細項編號=OLD.細項編號;
+            INSERT OR IGNORE INTO 庫存彙總 (細項編號) VALUES (NEW.細項編號);
+            UPDATE 庫存彙總 SET {qc}={qc}+COALESCE(NEW.數量,0), {ac}={ac}+COALESCE(NEW.總價,0), {nc}={nc}+1
+            WHERE 細項編號=NEW.細項編號;
+        END
+        """)
+    db.execute("DELETE FROM 庫存彙總")
+    db.execute(f"INSERT INTO 庫存彙總 {_v2原始彙總SQL}")
+
+def _合併重複(db: sqlite3.Connection, table: str, key: str, parent: str, name: str, refs: list):
+    """同一上層下同名的主檔只保留最小編號，並把 refs 中的參照改指過去"""
+    db.execute("DROP TABLE IF EXISTS temp._對映")
+    db.execute(f"""
+    CREATE TEMP TABLE _對映 AS
+    SELECT 舊, 新 FROM (SELECT {key} AS 舊, MIN({key}) OVER (PARTITION BY {parent}, {name}) AS 新 FROM {table})
+    WHERE 舊 <> 新
+    """)
+    for ref in refs:
+        db.execute(f"""
+        UPDATE {ref} SET {key}=(SELECT 新 FROM _對映 WHERE 舊={ref}.{key})
+        WHERE {key} IN (SELECT 舊 FROM _對映)
+        """)
+    db.execute(f"DELETE FROM {table} WHERE {key} IN (SELECT 舊 FROM _對映)")
+    db.execute("DROP TABLE temp._對映")
+
+def _v3_主檔唯一(db: sqlite3.Connection):
+    # 舊版匯入每列都新增一筆品項/細項，先合併重複再建唯一索引
+    _合併重複(db, '品項', '品項編號', '類別編號', '品項名稱', ['細項','進貨','銷售'])
+    _合併重複(db, '細項', '細項編號', '品項編號', '細項名稱', ['進貨','銷售'])
+    db.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_品項_類別_名稱 ON 品項(類別編號, 品項名稱)")
+    db.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_細項_品項_名稱 ON 細項(品項編號, 細項名稱)")
+
+def _v4_日期格式(db: sqlite3.Connection):
+    # 日期 統一存成 YYYY-MM-DD，字串排序即時間排序，可直接走索引做區間查詢
+    for tbl in ['進貨','銷售']:
+        raw = [r[0] for r in db.execute(f"SELECT DISTINCT 日期 FROM {tbl} WHERE 日期 IS NOT NULL")]
+        iso = pd.to_datetime(pd.Series(raw, dtype='object'), errors='coerce', format='mixed').dt.strftime('%Y-%m-%d')
+        db.executemany(f"UPDATE {tbl} SET 日期=? WHERE 日期=?",
+                       [(n, o) for o, n in zip(raw, iso) if isinstance(n, str) and n != o])
+
+def _v5_紀錄索引(db: sqlite3.Connection):
+    for tbl in ['進貨','銷售']:
+        db.execute(f"CREATE INDEX IF NOT EXISTS ix_{tbl}_日期 ON {tbl}(日期)")
+        db.execute(f"CREATE INDEX IF NOT EXISTS ix_{tbl}_細項_日期 ON {tbl}(細項編號, 日期)")
+        db.execute(f"CREATE INDEX IF NOT EXISTS ix_{tbl}_類別 ON {tbl}(類別編號)")
+        db.execute(f"CREATE INDEX IF NOT EXISTS ix_{tbl}_品項 ON {tbl}(品項編號)")
+
+def _v6_資料版本(db: sqlite3.Connection):
+    # 每張表一個版本號，任何寫入都 +1；供匯出與查詢快取判斷資料是否變動
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 資料版本 (
+        表名 TEXT PRIMARY KEY,
+        版本 INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    for tbl in 版本化資料表:
+        db.execute("INSERT OR IGNORE INTO 資料版本 (表名) VALUES (?)", (tbl,))
+        for ev in ['INSERT','UPDATE','DELETE']:
+            db.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {tbl}_版本_{ev} AFTER {ev} ON {tbl} BEGIN
+                UPDATE 資料版本 SET 版本=版本+1 WHERE 表名='{tbl}';
+            END
+            """)
+
+def _v7_匯入工作(db: sqlite3.Connection):
+    # 背景匯入：工作進度（已處理 即續跑檢查點）與被略過的列
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 匯入工作 (
+        工作ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        類型 TEXT NOT NULL,
+        檔名 TEXT,
+        資料檔 TEXT,
+        狀態 TEXT NOT NULL DEFAULT '等待',
+        總筆數 INTEGER NOT NULL DEFAULT 0,
+        已處理 INTEGER NOT NULL DEFAULT 0,
+        匯入筆數 INTEGER NOT NULL DEFAULT 0,
+        略過筆數 INTEGER NOT NULL DEFAULT 0,
+        錯誤 TEXT,
+        建立時間 TEXT,
+        更新時間 TEXT
+    )
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS ix_匯入工作_狀態 ON 匯入工作(狀態)")
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 匯入略過 (
+        工作ID INTEGER,
+        列號 INTEGER,
+        原因 TEXT,
+        PRIMARY KEY (工作ID, 列號)
+    )
+    """)
+
+def _v8_匯入指紋(db: sqlite3.Connection):
+    # 已匯入檔案的內容雜湊與每列的自然鍵指紋，重複上傳不會重複入帳
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 匯入檔案 (
+        雜湊 TEXT PRIMARY KEY,
+        類型 TEXT,
+        檔名 TEXT,
+        筆數 INTEGER,
+        匯入時間 TEXT
+    )
+    """)
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 匯入列指紋 (
+        指紋 TEXT PRIMARY KEY,
+        類型 TEXT
+    ) WITHOUT ROWID
+    """)
+
+def _彙總觸發器(db: sqlite3.Connection):
+    # 金額以 總價分 累計（整數）
+    for tbl, (qc, ac, nc) in _彙總欄.items():
+        db.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {tbl}_彙總_新增 AFTER INSERT ON {tbl} BEGIN
+            INSERT OR IGNORE INTO 庫存彙總 (細項編號) VALUES (NEW.細項編號);
+            UPDATE 庫存彙總 SET {qc}={qc}+COALESCE(NEW.數量,0), {ac}={ac}+NEW.總價分, {nc}={nc}+1
+            WHERE 細項編號=NEW.細項編號;
+        END
+        """)
+        db.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {tbl}_彙總_刪除 AFTER DELETE ON {tbl} BEGIN
+            UPDATE 庫存彙總 SET {qc}={qc}-COALESCE(OLD.數量,0), {ac}={ac}-OLD.總價分, {nc}={nc}-1
+            WHERE 細項編號=OLD.細項編號;
+        END
+        """)
+        db.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {tbl}_彙總_更新 AFTER UPDATE OF 細項編號, 數量, 單價分 ON {tbl} BEGIN
+            UPDATE 庫存彙總 SET {qc}={qc}-COALESCE(OLD.數量,0), {ac}={ac}-OLD.總價分, {nc}={nc}-1
+            WHERE 細項編號=OLD.細項編號;
+            INSERT OR IGNORE INTO 庫存彙總 (細項編號) VALUES (NEW.細項編號);
+            UPDATE 庫存彙總 SET {qc}={qc}+COALESCE(NEW.數量,0), {ac}={ac}+NEW.總價分, {nc}={nc}+1
+            WHERE 細項編號=NEW.細項編號;
+        END
+        """)
+
+def _v9_金額整數(db: sqlite3.Connection):
+    # 單價改存整數「分」；總價分/總價 由資料庫依 數量×單價 計算（生成欄位），寫入端不再負責
+    for tbl in ['進貨','銷售']:
+        for ev in ['新增','刪除','更新']:
+            db.execute(f"DROP TRIGGER IF EXISTS {tbl}_彙總_{ev}")
+        db.execute(f"ALTER TABLE {tbl} ADD COLUMN 單價分 INTEGER NOT NULL DEFAULT 0")
+        # 回填：以 單價 為準；只有 總價 的舊列（舊版編輯頁）由 總價/數量 推回單價
+        db.execute(f"""
+        UPDATE {tbl} SET 單價分=CAST(ROUND(100 * COALESCE(單價,
+            CASE WHEN 數量 > 0 THEN 總價 * 1.0 / 數量 END, 0)) AS INTEGER)
+        """)
+        db.execute(f"ALTER TABLE {tbl} DROP COLUMN 總價")
+        db.execute(f"ALTER TABLE {tbl} DROP COLUMN 單價")
+        db.execute(f"ALTER TABLE {tbl} ADD COLUMN 總價分 INTEGER GENERATED ALWAYS AS (COALESCE(數量,0) * 單價分) VIRTUAL")
+        # 以「元」呈現的唯讀欄，既有查詢與匯出照舊可用
+        db.execute(f"ALTER TABLE {tbl} ADD COLUMN 單價 REAL GENERATED ALWAYS AS (單價分 / 100.0) VIRTUAL")
+        db.execute(f"ALTER TABLE {tbl} ADD COLUMN 總價 REAL GENERATED ALWAYS AS (總價分 / 100.0) VIRTUAL")
+    db.execute("DROP TABLE 庫存彙總")
+    db.execute("""
+    CREATE TABLE 庫存彙總 (
+        細項編號 INTEGER PRIMARY KEY,
+        進貨數量 INTEGER NOT NULL DEFAULT 0,
+        支出分 INTEGER NOT NULL DEFAULT 0,
+        進貨筆數 INTEGER NOT NULL DEFAULT 0,
+        銷售數量 INTEGER NOT NULL DEFAULT 0,
+        收入分 INTEGER NOT NULL DEFAULT 0,
+        銷售筆數 INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    _彙總觸發器(db)
+    db.execute(f"INSERT INTO 庫存彙總 {_原始彙總SQL}")
+
+def _v10_圖片(db: sqlite3.Connection):
+    # 圖片依內容雜湊存放（相同檔案只存一份），縮圖於上傳時產生；細項 以 圖片雜湊 參照
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 圖片 (
+        雜湊 TEXT PRIMARY KEY,
+        格式 TEXT,
+        寬 INTEGER,
+        高 INTEGER,
+        位元組 INTEGER,
+        路徑 TEXT NOT NULL,
+        建立時間 TEXT
+    )
+    """)
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 圖片縮圖 (
+        雜湊 TEXT NOT NULL,
+        尺寸 INTEGER NOT NULL,
+        寬 INTEGER,
+        高 INTEGER,
+        位元組 INTEGER,
+        路徑 TEXT NOT NULL,
+        PRIMARY KEY (雜湊, 尺寸)
+    ) WITHOUT ROWID
+    """)
+    if '圖片雜湊' not in [r[1] for r in db.execute("PRAGMA table_info(細項)")]:
+        db.execute("ALTER TABLE 細項 ADD COLUMN 圖片雜湊 TEXT")
+
+def _v11_效能紀錄(db: sqlite3.Connection):
+    # 效能量測（預設關閉）：超過門檻的 SQL 與各頁 render 耗時
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 慢查詢 (
+        編號 INTEGER PRIMARY KEY AUTOINCREMENT,
+        時間 TEXT,
+        頁面 TEXT,
+        語句 TEXT,
+        毫秒 REAL,
+        筆數 INTEGER
+    )
+    """)
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 頁面耗時 (
+        編號 INTEGER PRIMARY KEY AUTOINCREMENT,
+        時間 TEXT,
+        頁面 TEXT,
+        毫秒 REAL,
+        SQL毫秒 REAL,
+        SQL次數 INTEGER,
+        區段 TEXT
+    )
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS ix_頁面耗時_頁面 ON 頁面耗時(頁面)")
+
+# 趨勢彙總表：(表名, 期間欄, 由 日期 算出期間的運算式)
+_趨勢表 = [('日彙總', '日期', '{}.日期'), ('月彙總', '月份', 'substr({}.日期, 1, 7)')]
+
+def _期間彙總SQL(期間: str) -> str:
+    """原始紀錄依 (細項編號, 期間) 彙總；期間 為由 日期 欄算出的運算式"""
+    return f"""
+    SELECT 細項編號, {期間.format('R')} AS 期間,
+           SUM(CASE WHEN 來源='進貨' THEN 數量 ELSE 0 END), SUM(CASE WHEN 來源='進貨' THEN 總價分 ELSE 0 END),
+           SUM(來源='進貨'),
+           SUM(CASE WHEN 來源='銷售' THEN 數量 ELSE 0 END), SUM(CASE WHEN 來源='銷售' THEN 總價分 ELSE 0 END),
+           SUM(來源='銷售')
+    FROM (SELECT '進貨' AS 來源, 細項編號, 日期, COALESCE(數量,0) AS 數量, 總價分 FROM 進貨 WHERE 日期 IS NOT NULL
+          UNION ALL
+          SELECT '銷售', 細項編號, 日期, COALESCE(數量,0), 總價分 FROM 銷售 WHERE 日期 IS NOT NULL) R
+    GROUP BY 細項編號, 期間
+    """
+
+def _v12_趨勢彙總(db: sqlite3.Connection):
+    # 每個細項每日/每月一列，與 庫存彙總 一樣由觸發器隨寫入同步；趨勢圖只讀這兩張小表
+    for rt, kc, key in _趨勢表:
+        db.execute(f"""
+        CREATE TABLE IF NOT EXISTS {rt} (
+            細項編號 INTEGER NOT NULL,
+            {kc} TEXT NOT NULL,
+            進貨數量 INTEGER NOT NULL DEFAULT 0,
+            支出分 INTEGER NOT NULL DEFAULT 0,
+            進貨筆數 INTEGER NOT NULL DEFAULT 0,
+            銷售數量 INTEGER NOT NULL DEFAULT 0,
+            收入分 INTEGER NOT NULL DEFAULT 0,
+            銷售筆數 INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (細項編號, {kc})
+        ) WITHOUT ROWID
+        """)
+        db.execute(f"CREATE INDEX IF NOT EXISTS ix_{rt}_{kc} ON {rt}({kc})")
+        for tbl, (qc, ac, nc) in _彙總欄.items():
+            加入 = f"""
+                INSERT INTO {rt} (細項編號, {kc}, {qc}, {ac}, {nc})
+                SELECT NEW.細項編號, {key.format('NEW')}, COALESCE(NEW.數量,0), NEW.總價分, 1 WHERE NEW.日期 IS NOT NULL
+                ON CONFLICT(細項編號, {kc}) DO UPDATE SET
+                    {qc}={qc}+excluded.{qc}, {ac}={ac}+excluded.{ac}, {nc}={nc}+1;"""
+            扣除 = f"""
+                UPDATE {rt} SET {qc}={qc}-COALESCE(OLD.數量,0), {ac}={ac}-OLD.總價分, {nc}={nc}-1
+                WHERE 細項編號=OLD.細項編號 AND {kc}={key.format('OLD')};"""
+            db.execute(f"CREATE TRIGGER IF NOT EXISTS {tbl}_{rt}_新增 AFTER INSERT ON {tbl} BEGIN {加入} END")
+            db.execute(f"CREATE TRIGGER IF NOT EXISTS {tbl}_{rt}_刪除 AFTER DELETE ON {tbl} BEGIN {扣除} END")
+            db.execute(f"""CREATE TRIGGER IF NOT EXISTS {tbl}_{rt}_更新
+                AFTER UPDATE OF 細項編號, 數量, 單價分, 日期 ON {tbl} BEGIN {扣除} {加入} END""")
+        db.execute(f"DELETE FROM {rt}")
+        db.execute(f"INSERT INTO {rt} {_期間彙總SQL(key)}")
+
+_結存欄 = ['進貨數量', '支出分', '銷售數量', '收入分']
+
+def _v13_月結存(db: sqlite3.Connection):
+    # 每個細項在有異動的月份各一列，存「累計至該月底」的數量與金額；
+    # 由 月彙總 的觸發器維護：某月變動時只更新該細項此月之後的結存列
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 月結存 (
+        細項編號 INTEGER NOT NULL,
+        月份 TEXT NOT NULL,
+        進貨數量 INTEGER NOT NULL DEFAULT 0,
+        支出分 INTEGER NOT NULL DEFAULT 0,
+        銷售數量 INTEGER NOT NULL DEFAULT 0,
+        收入分 INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (細項編號, 月份)
+    ) WITHOUT ROWID
+    """)
+    加 = ', '.join(f"{c}={c}+NEW.{c}" for c in _結存欄)
+    差 = ', '.join(f"{c}={c}+NEW.{c}-OLD.{c}" for c in _結存欄)
+    減 = ', '.join(f"{c}={c}-OLD.{c}" for c in _結存欄)
+    db.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS 月彙總_結存_新增 AFTER INSERT ON 月彙總 BEGIN
+        INSERT OR IGNORE INTO 月結存 (細項編號, 月份, {', '.join(_結存欄)})
+        SELECT NEW.細項編號, NEW.月份, {', '.join(f'COALESCE(P.{c},0)' for c in _結存欄)}
+        FROM (SELECT 1) LEFT JOIN (SELECT * FROM 月結存 WHERE 細項編號=NEW.細項編號 AND 月份<NEW.月份
+                                   ORDER BY 月份 DESC LIMIT 1) P;
+        UPDATE 月結存 SET {加} WHERE 細項編號=NEW.細項編號 AND 月份>=NEW.月份;
+    END
+    """)
+    db.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS 月彙總_結存_更新 AFTER UPDATE ON 月彙總 BEGIN
+        UPDATE 月結存 SET {差} WHERE 細項編號=NEW.細項編號 AND 月份>=NEW.月份;
+    END
+    """)
+    db.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS 月彙總_結存_刪除 AFTER DELETE ON 月彙總 BEGIN
+        UPDATE 月結存 SET {減} WHERE 細項編號=OLD.細項編號 AND 月份>=OLD.月份;
+    END
+    """)
+    db.execute("DELETE FROM 月結存")
+    db.execute(f"""
+    INSERT INTO 月結存 SELECT 細項編號, 月份, {', '.join(f'SUM({c}) OVER w' for c in _結存欄)}
+    FROM 月彙總 WINDOW w AS (PARTITION BY 細項編號 ORDER BY 月份)
+    """)
+
+def _v14_銷貨成本(db: sqlite3.Connection):
+    # 銷貨成本引擎（costing.py）的結果表；觸發器只記下「哪個細項從哪天起要重算」，
+    # 重算本身在讀取毛利前才執行，寫入時不必逐筆重播成本層
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 成本待算 (
+        細項編號 INTEGER PRIMARY KEY,
+        起日 TEXT NOT NULL
+    )
+    """)
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 銷售成本 (
+        紀錄ID INTEGER PRIMARY KEY,
+        細項編號 INTEGER NOT NULL,
+        日期 TEXT NOT NULL,
+        先進先出分 INTEGER NOT NULL,
+        平均成本分 INTEGER NOT NULL,
+        缺貨 INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS ix_銷售成本_細項_日期 ON 銷售成本(細項編號, 日期)")
+    db.execute("CREATE INDEX IF NOT EXISTS ix_銷售成本_日期 ON 銷售成本(日期)")
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 進貨均價 (
+        紀錄ID INTEGER PRIMARY KEY,
+        細項編號 INTEGER NOT NULL,
+        日期 TEXT NOT NULL,
+        均價分 REAL NOT NULL
+    )
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS ix_進貨均價_細項_日期 ON 進貨均價(細項編號, 日期)")
+    標記 = """
+        INSERT INTO 成本待算 (細項編號, 起日) SELECT {0}.細項編號, COALESCE({0}.日期, '') WHERE {0}.細項編號 IS NOT NULL
+        ON CONFLICT(細項編號) DO UPDATE SET 起日=MIN(起日, excluded.起日);"""
+    # 銷售單價只影響收入，不必重算成本
+    for tbl, cols in (('進貨', '細項編號, 數量, 單價分, 日期'), ('銷售', '細項編號, 數量, 日期')):
+        db.execute(f"CREATE TRIGGER IF NOT EXISTS {tbl}_成本_新增 AFTER INSERT ON {tbl} BEGIN {標記.format('NEW')} END")
+        db.execute(f"CREATE TRIGGER IF NOT EXISTS {tbl}_成本_刪除 AFTER DELETE ON {tbl} BEGIN {標記.format('OLD')} END")
+        db.execute(f"""CREATE TRIGGER IF NOT EXISTS {tbl}_成本_更新
+            AFTER UPDATE OF {cols} ON {tbl} BEGIN {標記.format('OLD')} {標記.format('NEW')} END""")
+    # 既有資料全部待算（第一次讀取毛利時整批重播）
+    db.execute("""
+    INSERT OR REPLACE INTO 成本待算 (細項編號, 起日)
+    SELECT 細項編號, '' FROM 進貨 WHERE 細項編號 IS NOT NULL
+    UNION SELECT 細項編號, '' FROM 銷售 WHERE 細項編號 IS NOT NULL
+    """)
+
+# 目錄搜尋 每個細項一列（rowid = 細項編號），名稱欄以 trigram 建索引，可搜尋名稱中任意片段
+_目錄列SQL = """
+    SELECT S.細項編號, C.類別名稱, I.品項名稱, S.細項名稱, COALESCE(I.系列, ''), C.類別編號, I.品項編號
+    FROM 細項 S JOIN 品項 I ON S.品項編號=I.品項編號 JOIN 類別 C ON I.類別編號=C.類別編號
+"""
+
+def _v15_目錄搜尋(db: sqlite3.Connection):
+    # 選細項不必再逐層下拉：類別/品項/細項 名稱與系列的全文索引，由主檔觸發器同步
+    if '系列' not in [r[1] for r in db.execute("PRAGMA table_info(品項)")]:
+        db.execute("ALTER TABLE 品項 ADD COLUMN 系列 TEXT")
+    db.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS 目錄搜尋 USING fts5(
+        類別名稱, 品項名稱, 細項名稱, 系列, 類別編號 UNINDEXED, 品項編號 UNINDEXED,
+        tokenize='trigram'
+    )
+    """)
+    新增 = f"INSERT INTO 目錄搜尋 (rowid, 類別名稱, 品項名稱, 細項名稱, 系列, 類別編號, 品項編號) {_目錄列SQL}"
+    db.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS 細項_目錄_新增 AFTER INSERT ON 細項 BEGIN
+        {新增} WHERE S.細項編號=NEW.細項編號;
+    END
+    """)
+    db.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS 細項_目錄_更新 AFTER UPDATE OF 細項名稱, 品項編號 ON 細項 BEGIN
+        DELETE FROM 目錄搜尋 WHERE rowid=OLD.細項編號;
+        {新增} WHERE S.細項編號=NEW.細項編號;
+    END
+    """)
+    db.execute("""
+    CREATE TRIGGER IF NOT EXISTS 細項_目錄_刪除 AFTER DELETE ON 細項 BEGIN
+        DELETE FROM 目錄搜尋 WHERE rowid=OLD.細項編號;
+    END
+    """)
+    db.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS 品項_目錄_更新 AFTER UPDATE OF 品項名稱, 系列, 類別編號 ON 品項 BEGIN
+        DELETE FROM 目錄搜尋 WHERE rowid IN (SELECT 細項編號 FROM 細項 WHERE 品項編號=OLD.品項編號);
+        {新增} WHERE S.品項編號=NEW.品項編號;
+    END
+    """)
+    db.execute("""
+    CREATE TRIGGER IF NOT EXISTS 品項_目錄_刪除 AFTER DELETE ON 品項 BEGIN
+        DELETE FROM 目錄搜尋 WHERE 品項編號=OLD.品項編號;
+    END
+    """)
+    db.execute("""
+    CREATE TRIGGER IF NOT EXISTS 類別_目錄_更新 AFTER UPDATE OF 類別名稱 ON 類別 BEGIN
+        UPDATE 目錄搜尋 SET 類別名稱=NEW.類別名稱 WHERE 類別編號=OLD.類別編號;
+    END
+    """)
+    db.execute("""
+    CREATE TRIGGER IF NOT EXISTS 類別_目錄_刪除 AFTER DELETE ON 類別 BEGIN
+        DELETE FROM 目錄搜尋 WHERE 類別編號=OLD.類別編號;
+    END
+    """)
+    db.execute("DELETE FROM 目錄搜尋")
+    db.execute(新增)
+
+def _v16_歸檔(db: sqlite3.Connection):
+    # 已結束年度的 進貨/銷售 移到歸檔檔案（archive.py）；熱資料庫留下每個細項歸檔部分的合計與成本狀態
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 歸檔紀錄 (
+        編號 INTEGER PRIMARY KEY AUTOINCREMENT,
+        年度 INTEGER NOT NULL,
+        格式 TEXT NOT NULL,
+        路徑 TEXT NOT NULL,
+        進貨筆數 INTEGER NOT NULL,
+        銷售筆數 INTEGER NOT NULL,
+        截止日 TEXT NOT NULL,
+        時間 TEXT
+    )
+    """)
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 期初結存 (
+        細項編號 INTEGER PRIMARY KEY,
+        進貨數量 INTEGER NOT NULL DEFAULT 0,
+        支出分 INTEGER NOT NULL DEFAULT 0,
+        進貨筆數 INTEGER NOT NULL DEFAULT 0,
+        銷售數量 INTEGER NOT NULL DEFAULT 0,
+        收入分 INTEGER NOT NULL DEFAULT 0,
+        銷售筆數 INTEGER NOT NULL DEFAULT 0,
+        先進先出分 INTEGER NOT NULL DEFAULT 0,
+        平均成本分 INTEGER NOT NULL DEFAULT 0,
+        期初數量 INTEGER NOT NULL DEFAULT 0,
+        期初均價分 REAL
+    )
+    """)
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 期初成本層 (
+        細項編號 INTEGER NOT NULL,
+        序 INTEGER NOT NULL,
+        數量 INTEGER NOT NULL,
+        單價分 INTEGER NOT NULL,
+        PRIMARY KEY (細項編號, 序)
+    ) WITHOUT ROWID
+    """)
+
+def _v17_補貨(db: sqlite3.Connection):
+    # 補貨引擎（replenish.py）的結果表；庫存彙總 每次異動都記下細項，下次計算只重算這些細項
+    db.execute("CREATE TABLE IF NOT EXISTS 補貨待算 (細項編號 INTEGER PRIMARY KEY)")
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS 補貨指標 (
+        細項編號 INTEGER PRIMARY KEY,
+        計算日 TEXT NOT NULL,
+        庫存 INTEGER NOT NULL,
+        日均銷量 REAL NOT NULL,
+        銷量標準差 REAL NOT NULL
+    )
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS ix_補貨指標_計算日 ON 補貨指標(計算日)")
+    db.execute("INSERT OR IGNORE INTO 資料版本 (表名) VALUES ('補貨指標')")   # 每批重算 +1，供匯出快取判斷
+    for ev in ('INSERT', 'UPDATE'):
+        db.execute(f"""CREATE TRIGGER IF NOT EXISTS 庫存彙總_補貨_{ev} AFTER {ev} ON 庫存彙總 BEGIN
+            INSERT OR IGNORE INTO 補貨待算 (細項編號) VALUES (NEW.細項編號); END""")
+    db.execute("INSERT OR IGNORE INTO 補貨待算 (細項編號) SELECT 細項編號 FROM 庫存彙總")
+
+def _v18_工作雜湊(db: sqlite3.Connection):
+    # 背景匯入的檔案雜湊先記在工作上，完成後才寫入 匯入檔案；失敗的工作不會擋下重新上傳
+    if '雜湊' not in {r[1] for r in db.execute("PRAGMA table_info(匯入工作)")}:
+        db.execute("ALTER TABLE 匯入工作 ADD COLUMN 雜湊 TEXT")
+    db.execute("CREATE INDEX IF NOT EXISTS ix_匯入工作_雜湊 ON 匯入工作(雜湊)")
+
+def _v19_期初單價(db: sqlite3.Connection):
+    # 歸檔時記下截止日前最後一筆進貨的單價：進貨全部歸檔後，賣超部分的先進先出成本仍以此計價。
+    # 先前的歸檔只能從剩餘成本層補上（剩餘層的最後一層即最後一筆進貨）。
+    # 補登：歸檔過補登進已結帳期間的紀錄，這些細項的成本由結帳狀態接續，與從頭重播不同
+    cols = {r[1] for r in db.execute("PRAGMA table_info(期初結存)")}
+    if '最後單價分' not in cols:
+        db.execute("ALTER TABLE 期初結存 ADD COLUMN 最後單價分 INTEGER")
+    if '補登' not in cols:
+        db.execute("ALTER TABLE 期初結存 ADD COLUMN 補登 INTEGER NOT NULL DEFAULT 0")
+    db.execute("""UPDATE 期初結存 SET 最後單價分=(SELECT 單價分 FROM 期初成本層 L
+        WHERE L.細項編號=期初結存.細項編號 ORDER BY 序 DESC LIMIT 1) WHERE 最後單價分 IS NULL""")
+
+# (版本, 說明, 步驟)；只能往後追加，不可修改已發佈的步驟
+遷移步驟 = [
+    (1, '基本資料表', _v1_基本資料表),
+    (2, '庫存彙總與觸發器', _v2_庫存彙總),
+    (3, '品項/細項 同名唯一', _v3_主檔唯一),
+    (4, '日期統一為 YYYY-MM-DD', _v4_日期格式),
+    (5, '進貨/銷售 索引', _v5_紀錄索引),
+    (6, '資料版本計數', _v6_資料版本),
+    (7, '背景匯入工作', _v7_匯入工作),
+    (8, '匯入檔案與列指紋', _v8_匯入指紋),
+    (9, '金額改存整數分、總價由資料庫計算', _v9_金額整數),
+    (10, '圖片內容定址與縮圖', _v10_圖片),
+    (11, '慢查詢與頁面耗時紀錄', _v11_效能紀錄),
+    (12, '每日/每月趨勢彙總', _v12_趨勢彙總),
+    (13, '每月累計結存（時點庫存）', _v13_月結存),
+    (14, '銷貨成本（先進先出/移動平均）', _v14_銷貨成本),
+    (15, '主檔全文搜尋', _v15_目錄搜尋),
+    (16, '帳冊歸檔與期初結存', _v16_歸檔),
+    (17, '補貨指標', _v17_補貨),
+    (18, '背景匯入工作記錄檔案雜湊', _v18_工作雜湊),
+    (19, '期初結存記錄最後進貨單價', _v19_期初單價),
+]
+
+def 結構版本(db: sqlite3.Connection) -> int:
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        版本 INTEGER PRIMARY KEY,
+        說明 TEXT,
+        套用時間 TEXT
+    )
+    """)
+    return db.execute("SELECT COALESCE(MAX(版本), 0) FROM schema_version").fetchone()[0]
+
+def 升級結構(db: sqlite3.Connection, 目標: int = None) -> int:
+    """依序套用尚未執行的遷移步驟（每步一個交易），回傳升級後版本"""
+    ver = 結構版本(db)
+    for v, desc, step in 遷移步驟:
+        if v <= ver or (目標 is not None and v > 目標):
+            continue
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            step(db)
+            db.execute("INSERT INTO schema_version VALUES (?,?,?)",
+                       (v, desc, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        ver = v
+    # 結構可能已變更（ALTER TABLE 等），清除欄位與語句快取
+    _欄位快取.clear()
+    _新增語句快取.clear()
+    return ver
+
+def 初始化資料庫() -> int:
+    """套用尚未執行的結構遷移；應用程式啟動或 CLI 執行時呼叫一次"""
+    return 升級結構(取得連線())
+
+# --- 查詢快取（依資料版本失效） ---
+def 資料版本(tables) -> tuple:
+    """回傳各表目前的版本號（依傳入順序）"""
+    tables = list(tables)
+    ph = ",".join(["?"]*len(tables))
+    ver = dict(取得連線().execute(f"SELECT 表名, 版本 FROM 資料版本 WHERE 表名 IN ({ph})", tables).fetchall())
+    return tuple(ver.get(t, 0) for t in tables)
+
+_查詢快取: OrderedDict = OrderedDict()   # (函式, 參數) -> (tables, 資料版本, 結果)；最近用到的排在後面
+查詢快取上限 = 128   # 超過時丟掉最久沒用到的結果
+快取統計 = {'命中': 0, '未命中': 0}
+_快取鎖 = threading.Lock()
+
+def 版本快取(*tables):
+    """讀取函式的結果依 tables 的資料版本快取；任何一表寫入後自動重新查詢。
+    DataFrame / dict 結果回傳副本，呼叫端可自由修改。"""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+            ver = 資料版本(tables)
+            with _快取鎖:
+                hit = _查詢快取.get(key)
+                if hit is not None and hit[1] == ver:
+                    _查詢快取.move_to_end(key)
+                    快取統計['命中'] += 1
+                else:
+                    hit = None
+                    快取統計['未命中'] += 1
+                    # 這些表的版本已前進：依同一組表快取、版本不同的結果都不會再命中
+                    for k in [k for k, (t, v, _) in _查詢快取.items() if t == tables and v != ver]:
+                        del _查詢快取[k]
+            if hit is not None:
+                res = hit[2]
+            else:
+                res = fn(*args, **kwargs)
+                with _快取鎖:
+                    _查詢快取[key] = (tables, ver, res)
+                    _查詢快取.move_to_end(key)
+                    while len(_查詢快取) > 查詢快取上限:
+                        _查詢快取.popitem(last=False)
+            return res.copy() if isinstance(res, (pd.DataFrame, dict)) else res
+        return wrapper
+    return deco
+
+# --- 共用函式 ---
+def 查詢(table: str) -> pd.DataFrame:
+    return pd.read_sql(f"SELECT * FROM {table}", 取得連線())
+
+def _新增語句(table: str, cols: tuple) -> str:
+    key = (table, cols)
+    if key not in _新增語句快取:
+        unknown = [x for x in cols if x not in 欄位(table)]
+        if unknown:
+            raise ValueError(f"{table} 無此欄位：{', '.join(unknown)}")
+        ph = ",".join(["?"]*len(cols))
+        _新增語句快取[key] = f"INSERT INTO {table} ({','.join(cols)}) VALUES ({ph})"
+    return _新增語句快取[key]
+
+def 新增(table: str, cols: list, vals: list) -> int:
+    if len(cols) != len(vals):
+        raise ValueError(f"欄位數 {len(cols)} 與值數 {len(vals)} 不符")
+    with 交易() as con:
+        return con.execute(_新增語句(table, tuple(cols)), vals).lastrowid
+
+def 刪除(table: str, key_col: str, key_val):
+    執行(f"DELETE FROM {table} WHERE {key_col}=?", (key_val,))
+
+@版本快取('類別','品項','細項')
+def 取得對映(table: str) -> dict:
+    mapping = {
+        '類別': ('類別名稱','類別編號'),
+        '品項': ('品項名稱','品項編號'),
+        '細項': ('細項名稱','細項編號'),
+    }
+    nc, ic = mapping[table]
+    rows = 取得連線().execute(f"SELECT {nc},{ic} FROM {table}").fetchall()
+    return {r[0]: r[1] for r in rows}
+
+def 逐批讀取(sql: str, params=(), 批量: int = 5000):
+    """以單一游標 fetchmany 逐批產出 DataFrame；第一批必定產出（可能為空表，保留欄名）"""
+    cur = 取得連線().execute(sql, list(params))
+    cols = [d[0] for d in cur.description]
+    try:
+        rows = cur.fetchmany(批量)
+        yield pd.DataFrame(rows, columns=cols)
+        while len(rows) == 批量:
+            rows = cur.fetchmany(批量)
+            if rows:
+                yield pd.DataFrame(rows, columns=cols)
+    finally:
+        cur.close()
+
+@版本快取('品項')
+def 品項清單(類別編號: int) -> pd.DataFrame:
+    """類別下的品項（品項編號, 品項名稱, 系列）"""
+    系列 = '系列' if '系列' in 欄位('品項') else "'' AS 系列"
+    return pd.read_sql(f'SELECT 品項編號, 品項名稱, {系列} FROM 品項 WHERE 類別編號=?',
+                       取得連線(), params=(int(類別編號),))
+
+@版本快取('細項')
+def 細項清單(品項編號: int) -> pd.DataFrame:
+    """品項下的細項（細項編號, 細項名稱, 圖片, 圖片雜湊）"""
+    return pd.read_sql('SELECT 細項編號, 細項名稱, 圖片, 圖片雜湊 FROM 細項 WHERE 品項編號=?',
+                       取得連線(), params=(int(品項編號),))
+
+@版本快取('類別','品項','細項')
+def 搜尋細項(關鍵字: str, 筆數: int = 20) -> pd.DataFrame:
+    """以名稱片段搜尋細項，一次查出完整階層（細項編號, 類別/品項/細項名稱, 系列, 類別編號, 品項編號）。
+    多個關鍵字以空白分隔、需全部符合；三字以上走 trigram 索引依相關度排序，較短的片段以 LIKE 比對"""
+    terms = 關鍵字.split()
+    if not terms:
+        return pd.DataFrame(columns=['細項編號', '類別名稱', '品項名稱', '細項名稱', '系列', '類別編號', '品項編號'])
+    where, params = [], []
+    longs = [t for t in terms if len(t) >= 3]
+    if longs:
+        where.append("目錄搜尋 MATCH ?")
+        params.append(' AND '.join('"' + t.replace('"', '""') + '"' for t in longs))
+    for t in terms:
+        if len(t) < 3:
+            where.append("(類別名稱 || ' ' || 品項名稱 || ' ' || 細項名稱 || ' ' || 系列) LIKE ? ESCAPE '\\'")
+            params.append('%' + t.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+    order = 'rank' if longs else '類別名稱, 品項名稱, 細項名稱'
+    return pd.read_sql(f"""
+        SELECT rowid AS 細項編號, 類別名稱, 品項名稱, 細項名稱, 系列, 類別編號, 品項編號
+        FROM 目錄搜尋 WHERE {' AND '.join(where)} ORDER BY {order} LIMIT ?
+    """, 取得連線(), params=params + [int(筆數)])
+
+# --- 紀錄查詢（日期區間於 SQL 篩選，依 (日期, 紀錄ID) 做 keyset 分頁） ---
+_紀錄欄 = "紀錄ID, 類別編號, 品項編號, 細項編號, 數量, 單價, 總價, 日期"
+
+def _紀錄條件(起, 迄, 類別編號=None, 品項編號=None, 細項編號=None) -> tuple:
+    where, params = ["日期 BETWEEN ? AND ?"], [str(起), str(迄)]
+    for col, val in (('類別編號', 類別編號), ('品項編號', 品項編號), ('細項編號', 細項編號)):
+        if val is not None:
+            where.append(f"{col}=?")
+            params.append(int(val))
+    return where, params
+
+def 查詢紀錄(table: str, 起, 迄, 之後: tuple = None, 筆數: int = 100, **條件) -> pd.DataFrame:
+    """取 起~迄（含）之間的一頁紀錄；之後 為上一頁最後一列的 (日期, 紀錄ID)"""
+    where, params = _紀錄條件(起, 迄, **條件)
+    if 之後:
+        where.append("(日期, 紀錄ID) > (?, ?)")
+        params += [之後[0], int(之後[1])]
+    sql = f"SELECT {_紀錄欄} FROM {table} WHERE {' AND '.join(where)} ORDER BY 日期, 紀錄ID LIMIT ?"
+    return pd.read_sql(sql, 取得連線(), params=params + [筆數])
+
+def 計數紀錄(table: str, 起, 迄, **條件) -> int:
+    where, params = _紀錄條件(起, 迄, **條件)
+    return 取得連線().execute(f"SELECT COUNT(*) FROM {table} WHERE {' AND '.join(where)}", params).fetchone()[0]
+
+def 紀錄SQL(table: str, 起, 迄, **條件) -> tuple:
+    """匯出用：起~迄 全部紀錄的 (sql, params)，排序與分頁一致"""
+    where, params = _紀錄條件(起, 迄, **條件)
+    return f"SELECT {_紀錄欄} FROM {table} WHERE {' AND '.join(where)} ORDER BY 日期, 紀錄ID", params
+
+@版本快取('類別','品項','細項','進貨','銷售')
+def 明細頁(table: str, 起, 迄, 之後: tuple = None, 筆數: int = 50, **條件) -> pd.DataFrame:
+    """編輯/刪除 頁用：先以索引取出一頁紀錄，再只替這一頁補上 類別/品項/細項 名稱"""
+    where, params = _紀錄條件(起, 迄, **條件)
+    if 之後:
+        where.append("(日期, 紀錄ID) > (?, ?)")
+        params += [之後[0], int(之後[1])]
+    return pd.read_sql(f'''
+        SELECT P.紀錄ID, C.類別名稱, I.品項名稱, S.細項名稱, P.數量, P.單價, P.總價, P.日期
+        FROM (SELECT * FROM {table} WHERE {' AND '.join(where)} ORDER BY 日期, 紀錄ID LIMIT ?) P
+        LEFT JOIN 類別 C ON P.類別編號=C.類別編號
+        LEFT JOIN 品項 I ON P.品項編號=I.品項編號
+        LEFT JOIN 細項 S ON P.細項編號=S.細項編號
+        ORDER BY P.日期, P.紀錄ID
+    ''', 取得連線(), params=params + [筆數])
+
+def 取得紀錄(table: str, 紀錄ID: int):
+    """單筆紀錄（dict），不存在回傳 None"""
+    cur = 取得連線().execute(f"SELECT {_紀錄欄} FROM {table} WHERE 紀錄ID=?", (int(紀錄ID),))
+    row = cur.fetchone()
+    return dict(zip([d[0] for d in cur.description], row)) if row else None
+
+_可批次更新欄 = ('數量', '單價分', '日期')
+
+def _選取條件(ids, 篩選: dict) -> tuple:
+    """批次操作的 WHERE：給 ids 時以 紀錄ID 清單（json_each，單一參數不受變數上限限制），否則用篩選條件"""
+    if ids is not None:
+        return "紀錄ID IN (SELECT value FROM json_each(?))", [json.dumps([int(i) for i in ids])]
+    if not 篩選:
+        raise ValueError('批次操作需指定 紀錄ID 清單或篩選條件')
+    where, params = _紀錄條件(**篩選)
+    return ' AND '.join(where), params
+
+def 批次刪除紀錄(table: str, ids=None, **篩選) -> int:
+    """以單一 DELETE 刪除 ids 或符合篩選（起、迄、類別編號…）的紀錄，回傳刪除筆數"""
+    if table not in ('進貨', '銷售'):
+        raise ValueError(f'不支援的紀錄表：{table}')
+    where, params = _選取條件(ids, 篩選)
+    return 執行(f"DELETE FROM {table} WHERE {where}", params)
+
+def 批次更新紀錄(table: str, 設定: dict, ids=None, **篩選) -> int:
+    """以單一 UPDATE 將 設定（數量/單價分/日期）套用到 ids 或符合篩選的紀錄，回傳更新筆數"""
+    if table not in ('進貨', '銷售'):
+        raise ValueError(f'不支援的紀錄表：{table}')
+    bad = [c for c in 設定 if c not in _可批次更新欄]
+    if bad or not 設定:
+        raise ValueError(f"不可批次更新的欄位：{', '.join(bad) or '（未指定）'}")
+    where, params = _選取條件(ids, 篩選)
+    sets = ', '.join(f"{c}=?" for c in 設定)
+    return 執行(f"UPDATE {table} SET {sets} WHERE {where}", list(設定.values()) + params)
+
+# --- 庫存彙總 ---
+def 歸檔截止日() -> str:
+    """已歸檔到哪一天（不含）；沒有歸檔時為空字串"""
+    return 取得連線().execute("SELECT COALESCE(MAX(截止日), '') FROM 歸檔紀錄").fetchone()[0]
+
+def 重建庫存彙總():
+    """由 進貨/銷售 原始紀錄（加上 期初結存）整批重算 庫存彙總、日彙總/月彙總 與 月結存；
+    已歸檔期間的 日彙總/月彙總 沒有原始紀錄可重算，保留原值"""
+    cut = 歸檔截止日()
+    with 交易() as con:
+        con.execute("DELETE FROM 庫存彙總")
+        con.execute(f"INSERT INTO 庫存彙總 {_含期初彙總SQL}")
+        for rt, kc, key in _趨勢表:
+            n = 10 if kc == '日期' else 7
+            con.execute(f"DELETE FROM {rt} WHERE {kc} >= ?", (cut[:n],))
+            con.execute(f"INSERT INTO {rt} SELECT * FROM ({_期間彙總SQL(key)}) WHERE 期間 >= ?", (cut[:n],))
+        con.execute("DELETE FROM 月結存")
+        con.execute(f"INSERT INTO 月結存 {_月結存SQL}")
+
+def 核對庫存彙總() -> pd.DataFrame:
+    """比對 庫存彙總 與原始紀錄（含 期初結存），回傳不一致的細項（空表代表一致）"""
+    con = 取得連線()
+    raw = pd.read_sql(_含期初彙總SQL, con).set_index('細項編號')
+    kept = pd.read_sql("SELECT * FROM 庫存彙總", con).set_index('細項編號')
+    kept = kept[(kept['進貨筆數'] != 0) | (kept['銷售筆數'] != 0)]
+    both = raw.join(kept, how='outer', lsuffix='_原始', rsuffix='_彙總').fillna(0)
+    bad = pd.Series(False, index=both.index)
+    for col in raw.columns:
+        bad |= (both[f'{col}_原始'] - both[f'{col}_彙總']).abs() > 1e-6
+    return both[bad].reset_index()
+
+def 核對趨勢彙總() -> pd.DataFrame:
+    """比對 日彙總/月彙總 與原始紀錄、月結存 與 月彙總 的累計，回傳不一致的 (表, 細項編號, 期間)"""
+    con = 取得連線()
+    cut = 歸檔截止日()
+    cols = ['進貨數量', '支出分', '進貨筆數', '銷售數量', '收入分', '銷售筆數']
+    out = []
+    for rt, kc, key in _趨勢表:
+        # 已歸檔的期間沒有原始紀錄，只比對截止日之後
+        n = 10 if kc == '日期' else 7
+        raw = pd.DataFrame(con.execute(f"SELECT * FROM ({_期間彙總SQL(key)}) WHERE 期間 >= ?", (cut[:n],)).fetchall(),
+                           columns=['細項編號', '期間'] + cols)
+        kept = pd.read_sql(f"SELECT 細項編號, {kc} AS 期間, {', '.join(cols)} FROM {rt} "
+                           f"WHERE (進貨筆數 <> 0 OR 銷售筆數 <> 0) AND {kc} >= ?", con, params=(cut[:n],))
+        both = raw.merge(kept, on=['細項編號', '期間'], how='outer', suffixes=('_原始', '_彙總')).fillna(0)
+        bad = pd.Series(False, index=both.index)
+        for col in cols:
+            bad |= both[f'{col}_原始'] != both[f'{col}_彙總']
+        out.append(both[bad].assign(表=rt))
+    # 月結存 應等於 月彙總 的逐月累計
+    cum = pd.DataFrame(con.execute(_月結存SQL).fetchall(), columns=['細項編號', '期間'] + _結存欄)
+    kept = pd.read_sql(f"SELECT 細項編號, 月份 AS 期間, {', '.join(_結存欄)} FROM 月結存", con)
+    both = cum.merge(kept, on=['細項編號', '期間'], how='outer', suffixes=('_原始', '_彙總'))
+    # 只比對 月彙總 有的月份
+    both = both[both[f'{_結存欄[0]}_原始'].notna()].fillna(0)
+    bad = pd.Series(False, index=both.index)
+    for col in _結存欄:
+        bad |= both[f'{col}_原始'] != both[f'{col}_彙總']
+    out.append(both[bad].assign(表='月結存'))
+    return pd.concat(out, ignore_index=True)
+
+def 庫存摘要SQL(類別: str = None, 品項: str = None, 細項: str = None) -> tuple:
+    """儀表板摘要的 (sql, params)：以 庫存彙總 加主檔名稱，可依名稱篩選"""
+    where, params = ["(K.進貨筆數 > 0 OR K.銷售筆數 > 0)"], []
+    for col, val in (('C.類別名稱', 類別), ('I.品項名稱', 品項), ('S.細項名稱', 細項)):
+        if val is not None:
+            where.append(f"{col}=?")
+            params.append(val)
+    sql = f"""
+        SELECT C.類別名稱 AS 類別, I.品項名稱 AS 品項, S.細項名稱 AS 細項,
+               SUM(K.進貨數量) AS 進貨, SUM(K.支出分) / 100.0 AS 支出,
+               SUM(K.銷售數量) AS 銷售, SUM(K.收入分) / 100.0 AS 收入,
+               SUM(K.進貨數量) - SUM(K.銷售數量) AS 庫存
+        FROM 庫存彙總 K
+        JOIN 細項 S ON K.細項編號=S.細項編號
+        JOIN 品項 I ON S.品項編號=I.品項編號
+        JOIN 類別 C ON I.類別編號=C.類別編號
+        WHERE {' AND '.join(where)}
+        GROUP BY C.類別名稱, I.品項名稱, S.細項名稱
+        ORDER BY C.類別名稱, I.品項名稱, S.細項名稱
+    """
+    return sql, params
+
+@版本快取('類別','品項','細項','進貨','銷售')
+def 讀取庫存摘要(**篩選) -> pd.DataFrame:
+    sql, params = 庫存摘要SQL(**篩選)
+    return pd.read_sql(sql, 取得連線(), params=params)
+
+def 庫存時點SQL(日期, 類別: str = None, 品項: str = None, 細項: str = None) -> tuple:
+    """截至 日期（含）的各細項庫存 (sql, params)：每個細項取該月之前最近一筆 月結存，
+    再加上當月 1 日至 日期 的 日彙總，不掃描原始紀錄"""
+    d = str(日期)[:10]
+    where, params = ["(T.進貨數量 <> 0 OR T.銷售數量 <> 0)"], [d[:7], d[:7] + '-01', d]
+    for col, val in (('C.類別名稱', 類別), ('I.品項名稱', 品項), ('S.細項名稱', 細項)):
+        if val is not None:
+            where.append(f"{col}=?")
+            params.append(val)
+    sql = f"""
+        WITH 前期 AS (
+            SELECT M.細項編號, M.進貨數量, M.支出分, M.銷售數量, M.收入分
+            FROM 細項 K JOIN 月結存 M ON M.細項編號=K.細項編號
+             AND M.月份=(SELECT MAX(月份) FROM 月結存 WHERE 細項編號=K.細項編號 AND 月份<?)
+        ), 當月 AS (
+            SELECT 細項編號, SUM(進貨數量), SUM(支出分), SUM(銷售數量), SUM(收入分)
+            FROM 日彙總 WHERE 日期 BETWEEN ? AND ? GROUP BY 細項編號
+        ), T AS (
+            SELECT 細項編號, SUM(進貨數量) AS 進貨數量, SUM(支出分) AS 支出分,
+                   SUM(銷售數量) AS 銷售數量, SUM(收入分) AS 收入分
+            FROM (SELECT * FROM 前期 UNION ALL SELECT * FROM 當月) GROUP BY 細項編號
+        )
+        SELECT C.類別名稱 AS 類別, I.品項名稱 AS 品項, S.細項名稱 AS 細項,
+               T.進貨數量 AS 進貨, T.支出分 / 100.0 AS 支出, T.銷售數量 AS 銷售, T.收入分 / 100.0 AS 收入,
+               T.進貨數量 - T.銷售數量 AS 庫存,
+               CASE WHEN T.進貨數量 > 0 THEN ROUND(T.支出分 / 100.0 / T.進貨數量, 2) END AS 平均成本,
+               CASE WHEN T.進貨數量 > 0
+                    THEN ROUND((T.進貨數量 - T.銷售數量) * T.支出分 / 100.0 / T.進貨數量, 2) END AS 庫存成本
+        FROM T
+        JOIN 細項 S ON T.細項編號=S.細項編號
+        JOIN 品項 I ON S.品項編號=I.品項編號
+        JOIN 類別 C ON I.類別編號=C.類別編號
+        WHERE {' AND '.join(where)}
+        ORDER BY C.類別名稱, I.品項名稱, S.細項名稱
+    """
+    return sql, params
+
+@版本快取('類別','品項','細項','進貨','銷售')
+def 讀取庫存時點(日期, **篩選) -> pd.DataFrame:
+    sql, params = 庫存時點SQL(日期, **篩選)
+    return pd.read_sql(sql, 取得連線(), params=params)
+
+@版本快取('進貨','銷售')
+def 金額總計() -> dict:
+    """全部 支出/收入（整數分），直接由 庫存彙總 加總"""
+    exp, rev = 取得連線().execute(
+        "SELECT COALESCE(SUM(支出分),0), COALESCE(SUM(收入分),0) FROM 庫存彙總").fetchone()
+    return {'支出分': exp, '收入分': rev}
+
+# --- 趨勢（讀 日彙總/月彙總，不掃原始紀錄） ---
+_趨勢粒度 = {'日': ('日彙總', '日期', 10), '月': ('月彙總', '月份', 7)}
+
+def _期間條件(kc: str, n: int, 起, 迄, 類別編號) -> tuple:
+    where, params, join = [], [], ''
+    if 起 is not None:
+        where.append(f"R.{kc} >= ?")
+        params.append(str(起)[:n])
+    if 迄 is not None:
+        where.append(f"R.{kc} <= ?")
+        params.append(str(迄)[:n])
+    if 類別編號 is not None:
+        join = "JOIN 細項 S ON R.細項編號=S.細項編號 JOIN 品項 I ON S.品項編號=I.品項編號"
+        where.append("I.類別編號=?")
+        params.append(int(類別編號))
+    return join, (' WHERE ' + ' AND '.join(where)) if where else '', params
+
+@版本快取('品項','細項','進貨','銷售')
+def 趨勢(粒度: str = '月', 起=None, 迄=None, 類別編號=None) -> pd.DataFrame:
+    """各期（日或月）的 進貨數量/支出/銷售數量/收入（元）"""
+    rt, kc, n = _趨勢粒度[粒度]
+    join, where, params = _期間條件(kc, n, 起, 迄, 類別編號)
+    return pd.read_sql(f"""
+        SELECT R.{kc} AS 期間, SUM(R.進貨數量) AS 進貨數量, SUM(R.支出分) / 100.0 AS 支出,
+               SUM(R.銷售數量) AS 銷售數量, SUM(R.收入分) / 100.0 AS 收入
+        FROM {rt} R {join}{where}
+        GROUP BY R.{kc} ORDER BY R.{kc}
+    """, 取得連線(), params=params)
+
+@版本快取('類別','品項','細項','進貨','銷售')
+def 暢銷排行(起, 迄, 筆數: int = 10, 依: str = '收入') -> pd.DataFrame:
+    """期間內銷售最好的細項；依 '收入' 或 '數量' 排序"""
+    order = {'收入': 'SUM(R.收入分)', '數量': 'SUM(R.銷售數量)'}[依]
+    return pd.read_sql(f"""
+        SELECT C.類別名稱 AS 類別, I.品項名稱 AS 品項, S.細項名稱 AS 細項,
+               T.銷售數量, T.收入分 / 100.0 AS 收入
+        FROM (SELECT R.細項編號, SUM(R.銷售數量) AS 銷售數量, SUM(R.收入分) AS 收入分
+              FROM 日彙總 R WHERE R.日期 BETWEEN ? AND ? AND R.銷售筆數 > 0
+              GROUP BY R.細項編號 ORDER BY {order} DESC LIMIT ?) T
+        JOIN 細項 S ON T.細項編號=S.細項編號
+        JOIN 品項 I ON S.品項編號=I.品項編號
+        JOIN 類別 C ON I.類別編號=C.類別編號
+        ORDER BY {'T.收入分' if 依 == '收入' else 'T.銷售數量'} DESC
+    """, 取得連線(), params=(str(起), str(迄), int(筆數)))
+
+@版本快取('品項','細項','進貨','銷售')
+def 季節性(類別編號=None) -> pd.DataFrame:
+    """各月份（1~12 月）每年平均的 銷售數量 與 收入"""
+    join, where, params = _期間條件('月份', 7, None, None, 類別編號)
+    return pd.read_sql(f"""
+        SELECT CAST(substr(R.月份, 6, 2) AS INTEGER) AS 月,
+               1.0 * SUM(R.銷售數量) / COUNT(DISTINCT substr(R.月份, 1, 4)) AS 平均銷售數量,
+               SUM(R.收入分) / 100.0 / COUNT(DISTINCT substr(R.月份, 1, 4)) AS 平均收入
+        FROM 月彙總 R {join}{where}
+        GROUP BY 月 ORDER BY 月
+    """, 取得連線(), params=params)
+
+def 元轉分(x) -> int:
+    """金額（元）→ 整數分，四捨五入"""
+    return int(round(float(x) * 100))
+
+# --- 批次匯入（整批集合式處理） ---
+def _整理匯入(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.rename(columns=str.strip)
+    for col in ['類別','品項','細項']:
+        if col not in df.columns: df[col] = None
+        s = df[col].astype('string').str.strip()
+        df[col] = s.mask(s == '')
+    return df
+
+def _補主檔(con: sqlite3.Connection, table: str, 上層欄: str, 名稱欄: str, keys: list) -> dict:
+    """只查本批用到的 (上層編號, 名稱)（走唯一索引，不讀整張主檔），缺少的新增；回傳 {(上層編號, 名稱): 編號}"""
+    if not keys:
+        return {}
+    sql = f"""SELECT T.{上層欄}, T.{名稱欄}, T.{table}編號 FROM json_each(?) J
+              JOIN {table} T ON T.{上層欄}=json_extract(J.value, '$[0]') AND T.{名稱欄}=json_extract(J.value, '$[1]')"""
+    arg = json.dumps(keys, ensure_ascii=False)
+    found = {(k, n): i for k, n, i in con.execute(sql, (arg,))}
+    miss = [k for k in keys if k not in found]
+    if miss:
+        con.executemany(f'INSERT INTO {table} ({上層欄}, {名稱欄}) VALUES (?,?)', miss)
+        found = {(k, n): i for k, n, i in con.execute(sql, (arg,))}
+    return found
+
+def _解析主檔(con: sqlite3.Connection, df: pd.DataFrame) -> pd.DataFrame:
+    """一次解析整批 類別/品項/細項：只新增缺少的主檔，並補上 類別編號/品項編號/細項編號 欄位。
+    需在交易內呼叫，由呼叫端 commit。"""
+    cats = df['類別'].dropna().unique().tolist()
+    con.executemany('INSERT OR IGNORE INTO 類別 (類別名稱) VALUES (?)', [(x,) for x in cats])
+    cmap = dict(con.execute('SELECT 類別名稱, 類別編號 FROM 類別').fetchall())
+    df['類別編號'] = df['類別'].map(cmap)
+
+    keys = df.loc[df['類別編號'].notna() & df['品項'].notna(), ['類別編號','品項']].drop_duplicates()
+    imap = _補主檔(con, '品項', '類別編號', '品項名稱', [(int(k), n) for k, n in keys.itertuples(index=False)])
+    df['品項編號'] = [imap.get((k, n)) for k, n in zip(df['類別編號'], df['品項'])]
+
+    keys = df.loc[df['品項編號'].notna() & df['細項'].notna(), ['品項編號','細項']].drop_duplicates()
+    smap = _補主檔(con, '細項', '品項編號', '細項名稱', [(int(k), n) for k, n in keys.itertuples(index=False)])
+    df['細項編號'] = [smap.get((k, n)) for k, n in zip(df['品項編號'], df['細項'])]
+    return df
+
+# 批次匯入主檔
+def 批次匯入主檔(df: pd.DataFrame):
+    df = _整理匯入(df)
+    with 交易() as con:
+        _解析主檔(con, df)
+
+# 上傳檔中 數量/單價 的欄名
+_匯入欄 = {'進貨': ('買入數量','買入單價'), '銷售': ('賣出數量','賣出單價')}
+
+def _正規化紀錄(table: str, df: pd.DataFrame) -> pd.DataFrame:
+    """整理上傳的 進貨/銷售：名稱去空白、數量/單價轉數值、日期轉 YYYY-MM-DD（無法解析為 NaN）"""
+    qty_col, price_col = _匯入欄[table]
+    df = _整理匯入(df).reset_index(drop=True)
+    raw_d = df['日期'] if '日期' in df else pd.Series(None, index=df.index, dtype='object')
+    parsed = pd.to_datetime(raw_d, errors='coerce', format='mixed')   # 同一批可混用 2024/1/2 與 2024-01-02
+    out = pd.DataFrame({
+        '類別': df['類別'], '品項': df['品項'], '細項': df['細項'],
+        '數量': pd.to_numeric(df[qty_col], errors='coerce').fillna(0) if qty_col in df else 0,
+        '單價': pd.to_numeric(df[price_col], errors='coerce').fillna(0) if price_col in df else 0.0,
+        '日期': parsed.dt.strftime('%Y-%m-%d'),
+        '日期錯誤': raw_d.notna() & (raw_d.astype('string').str.strip() != '') & parsed.isna(),
+    })
+    if '_指紋' in df:
+        out['_指紋'] = df['_指紋']
+    return out
+
+def 列指紋(table: str, df: pd.DataFrame, 計數: dict = None) -> pd.Series:
+    """每列的自然鍵雜湊：類型、類別/品項/細項、數量、單價、日期，再加上相同內容在檔案內第幾次出現，
+    所以同一天賣出兩件相同商品仍是兩列；重傳同一檔案或重疊的檔案則得到相同指紋。
+    分批讀檔時傳入同一個 計數 dict，出現次數會跨批累計"""
+    n = _正規化紀錄(table, df)
+    key = (table + '|' + n['類別'].fillna('').astype(str) + '|' + n['品項'].fillna('').astype(str)
+           + '|' + n['細項'].fillna('').astype(str) + '|' + n['數量'].astype(int).astype(str)
+           + '|' + n['單價'].astype(float).round(4).astype(str) + '|' + n['日期'].fillna('').astype(str))
+    occ = key.groupby(key).cumcount()
+    if 計數 is not None:
+        occ = occ + key.map(計數).fillna(0).astype(int)
+        for k, c in key.value_counts().items():
+            計數[k] = 計數.get(k, 0) + int(c)
+    key = key + '#' + occ.astype(str)
+    return pd.Series([hashlib.sha1(k.encode('utf-8')).hexdigest() for k in key], index=df.index)
+
+def 檔案已匯入(雜湊: str) -> bool:
+    """已匯入完成，或已有同一檔案的背景工作在等待/執行中"""
+    return 取得連線().execute("""
+        SELECT 1 FROM 匯入檔案 WHERE 雜湊=?
+        UNION ALL SELECT 1 FROM 匯入工作 WHERE 雜湊=? AND 狀態 IN ('等待','執行中')
+    """, (雜湊, 雜湊)).fetchone() is not None
+
+def 記錄匯入檔案(雜湊: str, table: str, 檔名: str, 筆數: int):
+    執行("INSERT OR IGNORE INTO 匯入檔案 VALUES (?,?,?,?,?)",
+         (雜湊, table, 檔名, int(筆數), datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+def 清除匯入紀錄(table: str):
+    """刪除全部 進貨/銷售 時一併清除指紋，讓同一檔案可以重新匯入"""
+    with 交易() as con:
+        con.execute("DELETE FROM 匯入列指紋 WHERE 類型=?", (table,))
+        con.execute("DELETE FROM 匯入檔案 WHERE 類型=?", (table,))
+
+def _批次匯入紀錄(table: str, df: pd.DataFrame, 計數: dict = None, 起始列: int = 0) -> pd.DataFrame:
+    """整批匯入 進貨/銷售：一次解析主檔、單一交易 executemany 寫入，回傳逐列 匯入/略過 報告。
+    指紋已存在的列（先前匯入過）略過；df 可帶預先算好的 _指紋 欄。
+    分批匯入同一檔案時傳入共用的 計數（見 列指紋）與本批第一列在檔案中的位置 起始列。"""
+    qty_col = _匯入欄[table][0]
+    n = _正規化紀錄(table, df)
+    fp = n['_指紋'] if '_指紋' in n else 列指紋(table, df, 計數).reset_index(drop=True)
+
+    reason = pd.Series('', index=n.index, dtype='object')
+    reason[n['日期錯誤']] = '日期格式錯誤'
+    reason[n['數量'] <= 0] = f'{qty_col}需大於 0'
+    reason[n['細項'].isna()] = '缺少細項'
+    reason[n['品項'].isna()] = '缺少品項'
+    reason[n['類別'].isna()] = '缺少類別'
+
+    with 交易() as con:
+        # 以主鍵逐筆查找已存在的指紋（暫存表 JOIN，不掃描整張指紋表）
+        con.execute("CREATE TEMP TABLE IF NOT EXISTS _本批指紋 (指紋 TEXT PRIMARY KEY) WITHOUT ROWID")
+        con.execute("DELETE FROM _本批指紋")
+        con.executemany("INSERT OR IGNORE INTO _本批指紋 VALUES (?)", ((x,) for x in fp.tolist()))
+        seen = {r[0] for r in con.execute(
+            "SELECT B.指紋 FROM _本批指紋 B JOIN 匯入列指紋 F ON F.指紋=B.指紋")}
+        reason[(reason == '') & fp.isin(seen)] = '已匯入過'
+        ok = reason == ''
+        if ok.any():
+            res = _解析主檔(con, n[ok].copy())
+            today = datetime.now().strftime('%Y-%m-%d')
+            rows = zip(res['類別編號'].astype(int).tolist(), res['品項編號'].astype(int).tolist(),
+                       res['細項編號'].astype(int).tolist(), res['數量'].astype(int).tolist(),
+                       (res['單價'] * 100).round().astype('int64').tolist(), res['日期'].fillna(today).tolist())
+            con.executemany(
+                f'INSERT INTO {table} (類別編號, 品項編號, 細項編號, 數量, 單價分, 日期) VALUES (?,?,?,?,?,?)',
+                rows
+            )
+            con.executemany("INSERT INTO 匯入列指紋 (指紋, 類型) VALUES (?,?)",
+                            ((x, table) for x in fp[ok].tolist()))
+
+    return pd.DataFrame({
+        '列號': n.index + 1 + 起始列,
+        '類別': n['類別'], '品項': n['品項'], '細項': n['細項'],
+        '狀態': ok.map({True: '匯入', False: '略過'}),
+        '原因': reason,
+    })
+
+# 批次匯入進貨
+def 批次匯入進貨(df: pd.DataFrame, **kw) -> pd.DataFrame:
+    return _批次匯入紀錄('進貨', df, **kw)
+
+# 批次匯入銷售
+def 批次匯入銷售(df: pd.DataFrame, **kw) -> pd.DataFrame:
+    return _批次匯入紀錄('銷售', df, **kw)
+
+if __name__ == '__main__':
+    import sys
+    初始化資料庫()
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ''
+    if cmd == 'rebuild':
+        重建庫存彙總()
+        print('庫存彙總、日彙總、月彙總 已重建')
+    elif cmd == 'verify':
+        bad = 核對庫存彙總()
+        print('庫存彙總 與原始紀錄一致' if bad.empty else bad.to_string(index=False))
+        bad_t = 核對趨勢彙總()
+        print('日彙總/月彙總 與原始紀錄一致' if bad_t.empty else bad_t.to_string(index=False))
+        sys.exit(1 if len(bad) or len(bad_t) else 0)
+    else:
+        print('用法：python db.py rebuild|verify')
+        sys.exit(2)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""匯出：按需以游標逐批寫入暫存檔（CSV / gzip CSV / Parquet），並依 (查詢, 資料版本) 重複使用"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+from db import 逐批讀取, 資料版本
+from profiling import 區段
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet 為選用格式
+    pa = pq = None
+
+匯出目錄 = os.path.join(tempfile.gettempdir(), 'inventory_exports')
+
+# 格式名稱: (副檔名, MIME)
+格式 = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV (gzip)': ('csv.gz', 'application/gzip'),
+}
+if pq is not None:
+    格式['Parquet'] = ('parquet', 'application/vnd.apache.parquet')
+
+_最新: dict = {}
+
+def _寫入(path: str, fmt: str, sql: str, params, 批量: int):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        if fmt == 'Parquet':
+            writer = None
+            try:
+                for df in 逐批讀取(sql, params, 批量):
+                    t = pa.Table.from_pandas(df, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp, t.schema)
+                    writer.write_table(t.cast(writer.schema))
+            finally:
+                if writer is not None:
+                    writer.close()
+        else:
+            opener = gzip.open if fmt == 'CSV (gzip)' else open
+            # utf-8-sig：Excel 開啟中文不亂碼
+            with opener(tmp, 'wt', encoding='utf-8-sig', newline='') as f:
+                for i, df in enumerate(逐批讀取(sql, params, 批量)):
+                    df.to_csv(f, header=(i == 0), index=False)
+    except BaseException:
+        if os.path.exists(tmp):   # 寫到一半失敗的暫存檔不留在匯出目錄
+            os.remove(tmp)
+        raise
+    os.replace(tmp, path)
+
+def 匯出檔(sql: str, params, tables: list, fmt: str = 'CSV', 批量: int = 5000) -> str:
+    """回傳匯出檔路徑；查詢相同且 tables 的資料版本未變時，直接沿用上次產生的檔案"""
+    if fmt not in 格式:
+        raise ValueError(f'不支援的匯出格式：{fmt}')
+    ver = 資料版本(tables)
+    base = hashlib.sha1(json.dumps([sql, list(params), fmt], ensure_ascii=False, default=str)
+                        .encode('utf-8')).hexdigest()[:16]
+    path = os.path.join(匯出目錄, f"{base}_{'-'.join(map(str, ver))}.{格式[fmt][0]}")
+    if not os.path.exists(path):
+        os.makedirs(匯出目錄, exist_ok=True)
+        with 區段(f'匯出 {fmt}'):
+            _寫入(path, fmt, sql, params, 批量)
+        old = _最新.get(base)
+        if old and old != path and os.path.exists(old):
+            os.remove(old)
+    _最新[base] = path
+    return path
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""細項圖片：原圖依內容雜湊存放（重複上傳只存一份），上傳時產生數種尺寸的縮圖，
+尺寸等中繼資料記錄在 圖片 / 圖片縮圖 表；頁面只讀取小縮圖，不必每次讀原圖"""
+import hashlib
+import io
+import os
+import uuid
+from datetime import datetime
+
+from db import DB_PATH, 交易, 取得連線
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # 縮圖為選用功能；未安裝 Pillow 時直接顯示原圖
+    Image = ImageOps = None
+
+圖片目錄 = os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), 'images')
+縮圖尺寸 = (64, 128, 256)   # 長邊像素
+
+# 檔頭特徵 → 格式（副檔名）
+_檔頭 = [(b'\x89PNG\r\n\x1a\n', 'png'), (b'\xff\xd8\xff', 'jpg'), (b'GIF87a', 'gif'), (b'GIF89a', 'gif')]
+
+def 圖片格式(data: bytes):
+    """依檔頭判斷圖片格式，無法辨識回傳 None"""
+    for sig, fmt in _檔頭:
+        if data.startswith(sig):
+            return fmt
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+def _寫檔(path: str, data: bytes):
+    # 先寫暫存檔再改名，中斷時不會留下半個檔案
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def _產生縮圖(雜湊: str, data: bytes) -> tuple:
+    """回傳 ((寬, 高), [(尺寸, 寬, 高, 位元組, 路徑), ...])；未安裝 Pillow 時為 ((None, None), [])"""
+    if Image is None:
+        return (None, None), []
+    with Image.open(io.BytesIO(data)) as im:
+        im = ImageOps.exif_transpose(im)
+        size = im.size
+        alpha = im.mode in ('RGBA', 'LA') or (im.mode == 'P' and 'transparency' in im.info)
+        im = im.convert('RGBA' if alpha else 'RGB')
+        fmt, ext = ('PNG', 'png') if alpha else ('JPEG', 'jpg')
+        out = []
+        for s in 縮圖尺寸:
+            t = im.copy()
+            t.thumbnail((s, s))
+            buf = io.BytesIO()
+            t.save(buf, fmt, **({'quality': 85, 'optimize': True} if fmt == 'JPEG' else {'optimize': True}))
+            path = os.path.join(圖片目錄, '縮圖', 雜湊[:2], f'{雜湊}_{s}.{ext}')
+            _寫檔(path, buf.getvalue())
+            out.append((s, t.width, t.height, len(buf.getvalue()), path))
+    return size, out
+
+def 儲存圖片(data: bytes) -> str:
+    """存入原圖與縮圖並登記中繼資料，回傳內容雜湊；相同內容已存在時直接回傳"""
+    fmt = 圖片格式(data)
+    if fmt is None:
+        raise ValueError('無法辨識的圖片格式（支援 PNG、JPEG、GIF、WebP）')
+    雜湊 = hashlib.sha256(data).hexdigest()
+    if 取得連線().execute("SELECT 1 FROM 圖片 WHERE 雜湊=?", (雜湊,)).fetchone():
+        return 雜湊
+    path = os.path.join(圖片目錄, '原圖', 雜湊[:2], f'{雜湊}.{fmt}')
+    _寫檔(path, data)
+    (w, h), thumbs = _產生縮圖(雜湊, data)
+    with 交易() as con:
+        con.execute("INSERT OR IGNORE INTO 圖片 VALUES (?,?,?,?,?,?,?)",
+                    (雜湊, fmt, w, h, len(data), path, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        con.executemany("INSERT OR REPLACE INTO 圖片縮圖 VALUES (?,?,?,?,?,?)",
+                        [(雜湊, *t) for t in thumbs])
+    return 雜湊
+
+def 設定細項圖片(細項編號: int, data: bytes) -> str:
+    雜湊 = 儲存圖片(data)
+    with 交易() as con:
+        path = con.execute("SELECT 路徑 FROM 圖片 WHERE 雜湊=?", (雜湊,)).fetchone()[0]
+        con.execute("UPDATE 細項 SET 圖片雜湊=?, 圖片=? WHERE 細項編號=?", (雜湊, path, int(細項編號)))
+    return 雜湊
+
+def 縮圖對映(雜湊清單, 尺寸: int = 128) -> dict:
+    """一次查出多張圖片的顯示路徑：取不小於 尺寸 的最小縮圖，沒有縮圖時用原圖"""
+    hs = sorted({h for h in 雜湊清單 if isinstance(h, str)})
+    if not hs:
+        return {}
+    ph = ','.join('?' * len(hs))
+    rows = 取得連線().execute(f"""
+        SELECT P.雜湊,
+               COALESCE((SELECT T.路徑 FROM 圖片縮圖 T WHERE T.雜湊=P.雜湊 AND T.尺寸>=? ORDER BY T.尺寸 LIMIT 1),
+                        (SELECT T.路徑 FROM 圖片縮圖 T WHERE T.雜湊=P.雜湊 ORDER BY T.尺寸 DESC LIMIT 1),
+                        P.路徑)
+        FROM 圖片 P WHERE P.雜湊 IN ({ph})
+    """, [int(尺寸)] + hs).fetchall()
+    return dict(rows)
+
+def 顯示路徑(雜湊, 舊路徑=None, 尺寸: int = 128):
+    """單張圖片的顯示路徑；尚未轉入圖片庫的舊資料沿用 細項.圖片 路徑"""
+    p = 縮圖對映([雜湊], 尺寸).get(雜湊)
+    if p and os.path.exists(p):
+        return p
+    return 舊路徑 if isinstance(舊路徑, str) and os.path.exists(舊路徑) else None
+
+def 轉入舊圖片() -> int:
+    """把舊版存在 細項.圖片（images/sub_*.png）的檔案轉入圖片庫，回傳轉入筆數"""
+    rows = 取得連線().execute(
+        "SELECT 細項編號, 圖片 FROM 細項 WHERE 圖片 IS NOT NULL AND 圖片雜湊 IS NULL").fetchall()
+    n = 0
+    for sid, path in rows:
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            if 圖片格式(data):
+                設定細項圖片(sid, data)
+                n += 1
+    return n
+
+def 清理未使用圖片() -> int:
+    """刪除沒有任何細項參照的圖片與其縮圖檔，回傳刪除張數"""
+    con = 取得連線()
+    hs = [r[0] for r in con.execute(
+        "SELECT 雜湊 FROM 圖片 WHERE 雜湊 NOT IN (SELECT 圖片雜湊 FROM 細項 WHERE 圖片雜湊 IS NOT NULL)")]
+    for h in hs:
+        files = [r[0] for r in con.execute(
+            "SELECT 路徑 FROM 圖片縮圖 WHERE 雜湊=? UNION ALL SELECT 路徑 FROM 圖片 WHERE 雜湊=?", (h, h))]
+        with 交易() as c:
+            c.execute("DELETE FROM 圖片縮圖 WHERE 雜湊=?", (h,))
+            c.execute("DELETE FROM 圖片 WHERE 雜湊=?", (h,))
+        for p in files:
+            if os.path.exists(p):
+                os.remove(p)
+    return len(hs)
+
+if __name__ == '__main__':
+    import sys
+    from db import 初始化資料庫
+    初始化資料庫()
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ''
+    if cmd == 'migrate':
+        print(f'已轉入 {轉入舊圖片()} 張舊圖片')
+    elif cmd == 'gc':
+        print(f'已刪除 {清理未使用圖片()} 張未使用的圖片')
+    else:
+        print('用法：python images.py migrate|gc')
+        sys.exit(2)
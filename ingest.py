@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""無介面的 進貨/銷售 寫入服務：CLI 與本機 HTTP 端點，接受 JSON 陣列或 NDJSON 的批次紀錄。
+
+所有來源（POS 終端、供應商夜間同步、CLI）都把批次放進同一個佇列，由唯一的寫入執行緒取出；
+佇列中累積的批次依類型合併，在一個交易內以 批次匯入進貨/銷售 寫入（與上傳檔相同的主檔解析與欄位檢查），
+生產者彼此不搶 SQLite 的寫入鎖，小批次也能合併成大交易。
+
+每列欄位：類別、品項、細項、數量、單價、日期（省略為今天），可另帶 類型（進貨/銷售）與 編號。
+列帶 編號（如 POS 單號-明細序），或整批帶 批次編號（HTTP 標頭 Idempotency-Key）時，重送不會重複寫入。
+
+    python ingest.py load 銷售 sales.ndjson
+    python ingest.py serve --port 8765
+    curl -X POST 'http://127.0.0.1:8765/ingest?類型=銷售' -H 'Idempotency-Key: pos1-0001' --data-binary @sales.ndjson
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import queue
+import sys
+import threading
+import uuid
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from db import 交易, 批次匯入進貨, 批次匯入銷售, _匯入欄
+
+合併上限 = 20000   # 一個交易最多合併的列數
+佇列上限 = 1000    # 佇列中最多的批次數；滿了生產者等待（背壓）
+_匯入函式 = {'進貨': 批次匯入進貨, '銷售': 批次匯入銷售}
+_佇列: queue.Queue = queue.Queue(maxsize=佇列上限)
+_鎖 = threading.Lock()
+_寫入緒 = None
+
+def 解析(body) -> list:
+    """JSON 陣列、單一物件、{"紀錄": [...]} 或 NDJSON（每行一筆）→ list of dict"""
+    text = body.decode('utf-8-sig') if isinstance(body, bytes) else body
+    if not text.strip():
+        return []
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return _紀錄清單(data)
+
+def _紀錄清單(data) -> list:
+    if isinstance(data, dict):
+        data = data.get('紀錄', [data])
+    if not isinstance(data, list) or not all(isinstance(r, dict) for r in data):
+        raise ValueError('內容須為物件陣列或每行一個物件的 NDJSON')
+    return data
+
+def _指紋(table: str, 編號) -> str:
+    return hashlib.sha1(f'api|{table}|{編號}'.encode('utf-8')).hexdigest()
+
+class 列錯誤(ValueError):
+    """整理批次 遇到無法寫入的列；列 為該列在請求中的列號（從 1 起算）"""
+    def __init__(self, 列: int, 訊息: str):
+        super().__init__(f'第 {列} 列{訊息}')
+        self.列 = 列
+
+def 整理批次(rows: list, 類型: str = None, 批次編號: str = None, 起始列: int = 0) -> dict:
+    """依類型分成 {table: DataFrame}，欄名與上傳檔相同並帶 _指紋、_列（在請求中的列號）。
+    沒有 編號 也沒有 批次編號 的列一律寫入（不去重）"""
+    parts = {t: [] for t in _匯入欄}
+    for i, r in enumerate(rows, start=起始列 + 1):
+        table = r.get('類型', 類型)
+        if table not in _匯入欄:
+            raise 列錯誤(i, '的類型需為 進貨 或 銷售')
+        qty_col, price_col = _匯入欄[table]
+        key = r.get('編號') or (f'{批次編號}#{i}' if 批次編號 else uuid.uuid4().hex)
+        parts[table].append({
+            '類別': r.get('類別'), '品項': r.get('品項'), '細項': r.get('細項'),
+            qty_col: r.get('數量', r.get(qty_col)), price_col: r.get('單價', r.get(price_col)),
+            '日期': r.get('日期'), '_指紋': _指紋(table, key), '_列': i,
+        })
+    return {t: pd.DataFrame(v) for t, v in parts.items() if v}
+
+def _寫入(group: list) -> list:
+    """同類型的批次合併成一次 批次匯入；回傳與 group 對應的逐列報告（列號, 狀態, 原因）"""
+    out = [None] * len(group)
+    for table in _匯入欄:
+        idx = [i for i, g in enumerate(group) if g[0] == table]
+        if not idx:
+            continue
+        df = pd.concat([group[i][1] for i in idx], ignore_index=True)
+        dup = df['_指紋'].duplicated()   # 佇列中重送的同一批次，只寫第一份
+        rep = pd.DataFrame({'列號': df['_列'], '狀態': '略過', '原因': '同批重複的編號'})
+        if (~dup).any():
+            r = _匯入函式[table](df[~dup].drop(columns='_列').reset_index(drop=True))
+            rep.loc[~dup, ['狀態', '原因']] = r[['狀態', '原因']].to_numpy()
+        pos = 0
+        for i in idx:
+            n = len(group[i][1])
+            out[i] = rep.iloc[pos:pos + n].reset_index(drop=True)
+            pos += n
+    return out
+
+def _寫入迴圈():
+    while True:
+        group = [_佇列.get()]
+        n = len(group[0][1])
+        while n < 合併上限:
+            try:
+                group.append(_佇列.get_nowait())
+            except queue.Empty:
+                break
+            n += len(group[-1][1])
+        try:
+            with 交易():
+                results = _寫入(group)
+        except Exception:
+            # 合併的交易失敗時逐批重試，只讓出錯的批次失敗
+            results = []
+            for item in group:
+                try:
+                    with 交易():
+                        results.append(_寫入([item])[0])
+                except Exception as e:
+                    results.append(e)
+        for (_, _, fut), res in zip(group, results):
+            if isinstance(res, Exception):
+                fut.set_exception(res)
+            else:
+                fut.set_result(res)
+
+def 送出(table: str, df: pd.DataFrame) -> Future:
+    """把一批（整理批次 的結果）排入寫入佇列，回傳完成時得到逐列報告的 Future"""
+    global _寫入緒
+    with _鎖:
+        if _寫入緒 is None or not _寫入緒.is_alive():
+            _寫入緒 = threading.Thread(target=_寫入迴圈, name='寫入佇列', daemon=True)
+            _寫入緒.start()
+    fut = Future()
+    _佇列.put((table, df, fut))
+    return fut
+
+def 摘要(reports: list) -> dict:
+    rep = pd.concat(reports, ignore_index=True) if reports else pd.DataFrame(columns=['列號', '狀態', '原因'])
+    bad = rep[rep['狀態'] == '略過'].sort_values('列號')
+    return {'匯入': int((rep['狀態'] == '匯入').sum()), '略過': len(bad),
+            '明細': [{'列號': int(n), '原因': r} for n, r in zip(bad['列號'], bad['原因'])]}
+
+def 寫入紀錄(rows: list, 類型: str = None, 批次編號: str = None, 逾時: float = None) -> dict:
+    """排入一批紀錄並等待寫入完成，回傳 {'匯入', '略過', '明細'}"""
+    futs = [送出(t, df) for t, df in 整理批次(rows, 類型, 批次編號).items()]
+    return 摘要([f.result(逾時) for f in futs])
+
+# --- HTTP 端點 ---
+class 處理器(BaseHTTPRequestHandler):
+    def _回應(self, code: int, obj):
+        body = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path == '/health':
+            self._回應(200, {'狀態': 'ok', '佇列批次': _佇列.qsize()})
+        else:
+            self._回應(404, {'錯誤': '找不到路徑'})
+
+    def do_POST(self):
+        url = urlparse(self.path.encode('latin-1').decode('utf-8', 'replace'))   # curl 等送出未編碼的 UTF-8 網址
+        if url.path != '/ingest':
+            return self._回應(404, {'錯誤': '找不到路徑'})
+        q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            rows = 解析(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            res = 寫入紀錄(rows, q.get('類型'), self.headers.get('Idempotency-Key'))
+        except (ValueError, KeyError) as e:
+            return self._回應(400, {'錯誤': str(e)})
+        except Exception as e:
+            return self._回應(500, {'錯誤': str(e)})
+        self._回應(200, res)
+
+    def log_message(self, fmt, *args):
+        pass   # 高頻寫入時不逐筆印存取紀錄
+
+def 啟動服務(host: str = '127.0.0.1', port: int = 8765) -> ThreadingHTTPServer:
+    """回傳尚未開始 serve_forever 的伺服器（每個連線一個執行緒，寫入都經過同一佇列）"""
+    server = ThreadingHTTPServer((host, port), 處理器)
+    server.daemon_threads = True
+    return server
+
+# --- CLI ---
+class 讀檔錯誤(ValueError):
+    pass
+
+def _逐批讀檔(f, 批量: int, 名稱: str = '-'):
+    """NDJSON 逐行讀取、每 批量 列產出 (列, 各列行號)；整份是一個 JSON 陣列或物件（可跨多行排版）時
+    整份讀入後切批，行號為 None。內容無法解析時先產出錯誤行之前的列，再拋出 讀檔錯誤，訊息帶 檔名:行號"""
+    lines = iter(f)
+    head = []
+    for line in lines:   # 略過開頭空行，找出第一行內容
+        head.append(line)
+        if line.strip():
+            break
+    first = head[-1].strip() if head else ''
+    if not first:
+        return
+    try:
+        whole = first.startswith('[') or not isinstance(json.loads(first), dict)
+    except json.JSONDecodeError:
+        whole = first.startswith('{')   # 排版過的單一物件，第一行只有 {
+    if whole:
+        text = ''.join(head) + ''.join(lines)
+        try:
+            rows = _紀錄清單(json.loads(text))
+        except json.JSONDecodeError as e:
+            raise 讀檔錯誤(f'{名稱}:{e.lineno}: JSON 格式錯誤：{e.msg}') from None
+        except ValueError as e:
+            raise 讀檔錯誤(f'{名稱}: {e}') from None
+        for i in range(0, len(rows), 批量):
+            yield rows[i:i + 批量], None
+        return
+    buf, nums, err = [], [], None
+    for n, line in enumerate(itertools.chain(head, lines), start=1):
+        if not line.strip():
+            continue
+        try:
+            r = json.loads(line)
+        except json.JSONDecodeError as e:
+            err = 讀檔錯誤(f'{名稱}:{n}: JSON 格式錯誤：{e.msg}')
+            break
+        if not isinstance(r, dict):
+            err = 讀檔錯誤(f'{名稱}:{n}: 每行須為一個 JSON 物件')
+            break
+        buf.append(r)
+        nums.append(n)
+        if len(buf) >= 批量:
+            yield buf, nums
+            buf, nums = [], []
+    if buf:
+        yield buf, nums
+    if err:
+        raise err
+
+def main():
+    ap = argparse.ArgumentParser(description='進貨/銷售 批次寫入（CLI 與本機 HTTP 端點）')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('load', help='讀取 JSON/NDJSON 檔寫入')
+    p.add_argument('類型', choices=list(_匯入欄), help='列未帶 類型 時使用')
+    p.add_argument('檔案', help='檔案路徑，- 為標準輸入')
+    p.add_argument('--batch', type=int, default=5000, help='每批列數')
+    p.add_argument('--key', help='批次編號：沒有 編號 的列以 批次編號#列號 去重，重跑同一檔案不會重複寫入')
+    s = sub.add_parser('serve', help='啟動本機 HTTP 端點（POST /ingest、GET /health）')
+    s.add_argument('--host', default='127.0.0.1')
+    s.add_argument('--port', type=int, default=8765)
+    args = ap.parse_args()
+
+    from db import 初始化資料庫
+    初始化資料庫()
+    if args.cmd == 'serve':
+        server = 啟動服務(args.host, args.port)
+        print(f'寫入端點：http://{args.host}:{args.port}/ingest')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+        return
+
+    f = sys.stdin if args.檔案 == '-' else open(args.檔案, encoding='utf-8-sig')
+    name = '<stdin>' if args.檔案 == '-' else args.檔案
+    futs, pos, err = [], 0, None
+
+    def 送批(rows, start):
+        return [送出(t, df) for t, df in 整理批次(rows, args.類型, args.key, start).items()]
+
+    with f:
+        try:
+            for rows, nums in _逐批讀檔(f, args.batch, name):
+                try:
+                    futs += 送批(rows, pos)
+                except 列錯誤 as e:
+                    k = e.列 - pos - 1
+                    futs += 送批(rows[:k], pos) if k else []
+                    raise 讀檔錯誤(f'{name}:{nums[k]}: {e}' if nums else f'{name}: {e}') from None
+                pos += len(rows)
+        except 讀檔錯誤 as e:
+            err = e   # 錯誤之前的列照常寫完；帶 --key 或 編號 時修正後重跑不會重複
+    res = 摘要([x.result() for x in futs])
+    print(f"匯入 {res['匯入']} 筆，略過 {res['略過']} 筆")
+    for d in res['明細'][:20]:
+        print(f"  第 {d['列號']} 列：{d['原因']}")
+    if err:
+        print(f'讀取中止：{err}', file=sys.stderr)
+        sys.exit(2)
+    sys.exit(1 if res['略過'] else 0)
+
+if __name__ == '__main__':
+    main()
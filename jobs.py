@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""背景匯入工作：上傳的原始檔先存檔並登記於 匯入工作 表，由單一背景執行緒逐段讀檔寫入。
+每段與其進度在同一個交易內提交，行程中斷後可從最後的檢查點續跑。"""
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from backup import 自動快照
+from db import DB_PATH, 交易, 執行, 取得連線, 批次匯入進貨, 批次匯入銷售, 列指紋, 記錄匯入檔案
+from reader import 估計筆數, 讀取分批
+
+工作目錄 = os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), 'import_jobs')
+分段筆數 = 5000
+
+_匯入函式 = {'進貨': 批次匯入進貨, '銷售': 批次匯入銷售}
+_鎖 = threading.Lock()
+_執行緒池 = None
+
+def _現在() -> str:
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def _池() -> ThreadPoolExecutor:
+    # 單一背景寫入執行緒：工作依序執行，不與彼此爭搶寫入鎖
+    global _執行緒池
+    with _鎖:
+        if _執行緒池 is None:
+            _執行緒池 = ThreadPoolExecutor(max_workers=1, thread_name_prefix='匯入工作')
+    return _執行緒池
+
+def 提交匯入(table: str, data: bytes, 檔名: str = '', 雜湊: str = None) -> int:
+    """登記一個背景匯入工作並排入執行，回傳工作ID；給了檔案 雜湊 時工作完成才記為已匯入。
+    只保存上傳的原始內容，執行時才分批讀取，不會把整份檔案解析進記憶體"""
+    if table not in _匯入函式:
+        raise ValueError(f'不支援的匯入類型：{table}')
+    os.makedirs(工作目錄, exist_ok=True)
+    path = os.path.join(工作目錄, f'{uuid.uuid4().hex}.dat')
+    with open(path, 'wb') as f:
+        f.write(data)
+    total = 估計筆數(data)
+    with 交易() as con:
+        jid = con.execute(
+            'INSERT INTO 匯入工作 (類型, 檔名, 資料檔, 總筆數, 雜湊, 建立時間, 更新時間) VALUES (?,?,?,?,?,?,?)',
+            (table, 檔名, path, total, 雜湊, _現在(), _現在())
+        ).lastrowid
+    _池().submit(_執行, jid)
+    return jid
+
+def _執行(jid: int):
+    table, path, done, 檔名, 雜湊 = 取得連線().execute(
+        'SELECT 類型, 資料檔, 已處理, 檔名, 雜湊 FROM 匯入工作 WHERE 工作ID=?', (jid,)
+    ).fetchone()
+    try:
+        if not done:
+            自動快照(f'匯入{table}')   # 續跑的工作在第一次執行時已建立過
+        執行('UPDATE 匯入工作 SET 狀態=?, 更新時間=? WHERE 工作ID=?', ('執行中', _現在(), jid))
+        計數 = {}   # 指紋的出現次數跨段累計，與一次讀完整份檔案的結果相同
+        pos = 0
+        for chunk in 讀取分批(path, 分段筆數):
+            if pos < done:
+                # 檢查點之前的列已寫入：只推進指紋計數
+                skip = min(done - pos, len(chunk))
+                列指紋(table, chunk.iloc[:skip], 計數)
+                chunk, pos = chunk.iloc[skip:], pos + skip
+                if chunk.empty:
+                    continue
+            with 交易() as con:
+                rep = _匯入函式[table](chunk, 計數=計數, 起始列=pos)
+                bad = rep[rep['狀態'] == '略過']
+                con.executemany(
+                    'INSERT OR REPLACE INTO 匯入略過 (工作ID, 列號, 原因) VALUES (?,?,?)',
+                    [(jid, int(n), r) for n, r in zip(bad['列號'], bad['原因'])]
+                )
+                con.execute(
+                    '''UPDATE 匯入工作 SET 已處理=?, 匯入筆數=匯入筆數+?, 略過筆數=略過筆數+?,
+                       總筆數=MAX(總筆數, ?), 更新時間=? WHERE 工作ID=?''',
+                    (pos + len(chunk), len(rep) - len(bad), len(bad), pos + len(chunk), _現在(), jid)
+                )
+            pos += len(chunk)
+        # 總筆數原為估計值，完成時以實際讀到的列數為準；全部寫入後才把檔案記為已匯入
+        with 交易() as con:
+            con.execute('UPDATE 匯入工作 SET 狀態=?, 總筆數=已處理, 資料檔=NULL, 更新時間=? WHERE 工作ID=?',
+                        ('完成', _現在(), jid))
+            if 雜湊:
+                記錄匯入檔案(雜湊, table, 檔名, pos)
+        os.remove(path)
+    except Exception as e:
+        執行('UPDATE 匯入工作 SET 狀態=?, 錯誤=?, 更新時間=? WHERE 工作ID=?', ('失敗', str(e), _現在(), jid))
+
+def 恢復工作() -> int:
+    """將尚未完成（等待/執行中）的工作重新排入，從檢查點續跑；回傳排入件數"""
+    ids = [r[0] for r in 取得連線().execute(
+        "SELECT 工作ID FROM 匯入工作 WHERE 狀態 IN ('等待','執行中') ORDER BY 工作ID")]
+    for jid in ids:
+        _池().submit(_執行, jid)
+    return len(ids)
+
+def 工作清單(table: str = None, 筆數: int = 10) -> pd.DataFrame:
+    sql = 'SELECT * FROM 匯入工作'
+    params = []
+    if table:
+        sql += ' WHERE 類型=?'
+        params.append(table)
+    return pd.read_sql(sql + ' ORDER BY 工作ID DESC LIMIT ?', 取得連線(), params=params + [筆數])
+
+def 略過明細(jid: int) -> pd.DataFrame:
+    return pd.read_sql('SELECT 列號, 原因 FROM 匯入略過 WHERE 工作ID=? ORDER BY 列號',
+                       取得連線(), params=(jid,))
+
+def 執行中數量() -> int:
+    return 取得連線().execute(
+        "SELECT COUNT(*) FROM 匯入工作 WHERE 狀態 IN ('等待','執行中')").fetchone()[0]
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""效能量測：各頁 render 耗時、每個 SQL 陳述式的耗時與筆數、超過門檻的慢查詢紀錄。
+
+預設關閉，關閉時連線是原生的 sqlite3.Connection、頁面不包計時，完全沒有額外負擔。
+以環境變數 INVENTORY_PROFILE=1 啟動或在「效能」頁開啟；開啟後新取得的連線改用計時的
+連線/游標子類別（Python 的 sqlite3 沒有 profile 回呼，改在 execute 與 fetch 兩端量時間）。
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+import sqlite3
+
+import pandas as pd
+
+import db
+
+慢查詢門檻毫秒 = float(os.environ.get('INVENTORY_SLOW_MS', 50))
+_啟用 = False
+_鎖 = threading.Lock()
+_本地 = threading.local()
+最近語句 = deque(maxlen=2000)   # 每筆為 [時間, 頁面, 語句, 秒, 筆數]，fetch 時原地累加
+_待檢查 = deque(maxlen=10000)   # 尚未比對門檻的語句（頁面結束時寫入）
+
+def _現在() -> str:
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def _累計(秒: float, 新語句: bool = False):
+    st = getattr(_本地, '頁', None)
+    if st is not None:
+        st['SQL秒'] += 秒
+        st['SQL次數'] += 新語句
+
+class 計時游標(sqlite3.Cursor):
+    _量測 = None
+
+    def _開始(self, sql: str, 秒: float):
+        if getattr(_本地, '寫入中', False):   # 不量測寫入量測紀錄本身
+            return
+        m = [_現在(), getattr(_本地, '頁面', None), sql, 秒, max(self.rowcount, 0)]
+        self._量測 = m
+        _累計(秒, 新語句=True)
+        with _鎖:
+            最近語句.append(m)
+            _待檢查.append(m)
+
+    def _fetch(self, fn, *args):
+        t = time.perf_counter()
+        rows = fn(*args)
+        sec = time.perf_counter() - t
+        m = self._量測
+        if m is not None:
+            m[3] += sec
+            m[4] += len(rows) if isinstance(rows, list) else rows is not None
+        _累計(sec)
+        return rows
+
+    def execute(self, sql, params=()):
+        t = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self._開始(sql, time.perf_counter() - t)
+
+    def executemany(self, sql, seq):
+        t = time.perf_counter()
+        try:
+            return super().executemany(sql, seq)
+        finally:
+            self._開始(sql, time.perf_counter() - t)
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+    def __next__(self):
+        row = self._fetch(super().fetchone)
+        if row is None:
+            raise StopIteration
+        return row
+
+class 計時連線(sqlite3.Connection):
+    def cursor(self, factory=計時游標):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
+
+def 已啟用() -> bool:
+    return _啟用
+
+def 設定啟用(on: bool):
+    """切換量測；目前執行緒的連線在下次 rerun 才替換"""
+    global _啟用
+    _啟用 = bool(on)
+    db.連線類別 = 計時連線 if _啟用 else sqlite3.Connection
+    db.重設連線池()
+
+def 寫入紀錄(頁面: dict = None):
+    """把超過門檻的語句寫入 慢查詢、頁面耗時寫入 頁面耗時；在頁面 render 結束時呼叫"""
+    with _鎖:
+        pending = list(_待檢查)
+        _待檢查.clear()
+    slow = [(m[0], m[1], m[2], m[3] * 1000, m[4]) for m in pending if m[3] * 1000 >= 慢查詢門檻毫秒]
+    if not slow and 頁面 is None:
+        return
+    _本地.寫入中 = True
+    try:
+        with db.交易() as con:
+            con.executemany("INSERT INTO 慢查詢 (時間, 頁面, 語句, 毫秒, 筆數) VALUES (?,?,?,?,?)", slow)
+            if 頁面 is not None:
+                con.execute("INSERT INTO 頁面耗時 (時間, 頁面, 毫秒, SQL毫秒, SQL次數, 區段) VALUES (?,?,?,?,?,?)",
+                            (頁面['時間'], 頁面['頁面'], 頁面['毫秒'], 頁面['SQL秒'] * 1000, 頁面['SQL次數'],
+                             json.dumps(頁面['區段'], ensure_ascii=False)))
+    except sqlite3.OperationalError:
+        pass   # 量測紀錄寫不進去（如資料庫忙碌）不影響頁面
+    finally:
+        _本地.寫入中 = False
+
+@contextmanager
+def _頁面計時(name: str):
+    st = {'時間': _現在(), '頁面': name, 'SQL秒': 0.0, 'SQL次數': 0, '區段': {}}
+    _本地.頁, _本地.頁面 = st, name
+    t = time.perf_counter()
+    try:
+        yield st
+    finally:
+        st['毫秒'] = (time.perf_counter() - t) * 1000
+        _本地.頁 = _本地.頁面 = None
+        寫入紀錄(st)
+
+def 頁面計時(name: str):
+    """包住整個頁面 render；關閉時回傳空的 context manager"""
+    return _頁面計時(name) if _啟用 else nullcontext()
+
+@contextmanager
+def _區段(name: str):
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        st = getattr(_本地, '頁', None)
+        if st is not None:
+            st['區段'][name] = st['區段'].get(name, 0.0) + (time.perf_counter() - t) * 1000
+
+def 區段(name: str):
+    """頁面內的具名區段（如產生匯出檔），耗時記在該頁紀錄的 區段 欄"""
+    return _區段(name) if _啟用 else nullcontext()
+
+def 慢查詢排行(筆數: int = 20):
+    """依語句彙總的慢查詢：次數、平均/最大/合計毫秒"""
+    return pd.read_sql('''
+        SELECT 語句, COUNT(*) AS 次數, AVG(毫秒) AS 平均毫秒, MAX(毫秒) AS 最大毫秒,
+               SUM(毫秒) AS 合計毫秒, MAX(筆數) AS 最多筆數, GROUP_CONCAT(DISTINCT 頁面) AS 頁面
+        FROM 慢查詢 GROUP BY 語句 ORDER BY 合計毫秒 DESC LIMIT ?
+    ''', db.取得連線(), params=(筆數,))
+
+def 頁面統計():
+    """各頁 render 次數與耗時（平均、最大、SQL 佔比）"""
+    return pd.read_sql('''
+        SELECT 頁面, COUNT(*) AS 次數, AVG(毫秒) AS 平均毫秒, MAX(毫秒) AS 最大毫秒,
+               AVG(SQL毫秒) AS 平均SQL毫秒, AVG(SQL次數) AS 平均SQL次數,
+               ROUND(100.0 * SUM(SQL毫秒) / MAX(SUM(毫秒), 1e-9), 1) AS SQL佔比
+        FROM 頁面耗時 GROUP BY 頁面 ORDER BY 平均毫秒 DESC
+    ''', db.取得連線())
+
+def 清除紀錄():
+    with db.交易() as con:
+        con.execute("DELETE FROM 慢查詢")
+        con.execute("DELETE FROM 頁面耗時")
+    with _鎖:
+        最近語句.clear()
+        _待檢查.clear()
+
+if os.environ.get('INVENTORY_PROFILE', '') not in ('', '0'):
+    設定啟用(True)
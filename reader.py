@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""上傳檔讀取：依檔頭判斷格式、預先宣告欄位型別，並分批產出 DataFrame，
+記憶體用量取決於批量而非檔案大小"""
+import io
+import os
+
+import pandas as pd
+
+# 檔頭特徵
+_XLSX = b'PK\x03\x04'                       # Office Open XML（zip）
+_XLS = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'  # OLE2（舊版 Excel）
+
+_名稱欄 = ['類別', '品項', '細項']
+_數量欄 = ['買入數量', '賣出數量']
+_單價欄 = ['買入單價', '賣出單價']
+預設批量 = 50000
+
+def _開啟(src):
+    """bytes / 路徑 / 檔案物件 → 可重複讀取的二進位串流"""
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        return io.BytesIO(src)
+    if isinstance(src, (str, os.PathLike)):
+        return open(src, 'rb')
+    src.seek(0)
+    return src
+
+def 偵測格式(src) -> str:
+    """回傳 'xlsx' / 'xls' / 'csv'"""
+    f = _開啟(src)
+    try:
+        head = f.read(8)
+    finally:
+        if f is not src:
+            f.close()
+        else:
+            src.seek(0)
+    if head.startswith(_XLSX):
+        return 'xlsx'
+    if head.startswith(_XLS):
+        return 'xls'
+    return 'csv'
+
+def _套用型別(df: pd.DataFrame) -> pd.DataFrame:
+    """欄名去空白；名稱欄轉 category、數量轉整數（有小數則保留浮點）、單價轉浮點、日期轉日期"""
+    df.columns = [str(c).strip() for c in df.columns]
+    for col in df.columns:
+        if col in _名稱欄:
+            df[col] = df[col].astype('category')
+        elif col in _數量欄:
+            s = pd.to_numeric(df[col], errors='coerce')
+            df[col] = s.astype('Int64') if (s.dropna() % 1 == 0).all() else s
+        elif col in _單價欄:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+        elif col == '日期' and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            parsed = pd.to_datetime(df[col], errors='coerce', format='mixed')
+            # 無法解析的保留原值，交由匯入端回報「日期格式錯誤」
+            bad = parsed.isna() & df[col].notna()
+            df[col] = parsed.astype(object).where(~bad, df[col]) if bad.any() else parsed
+    return df
+
+def _讀CSV(src, 批量: int):
+    f = _開啟(src)
+    try:
+        header = pd.read_csv(f, nrows=0, encoding='utf-8-sig').columns
+        f.seek(0)
+        dtype = {}
+        for c in header:
+            k = str(c).strip()
+            if k in _名稱欄:
+                dtype[c] = 'category'
+            elif k in _數量欄:
+                dtype[c] = 'Int64'
+            elif k in _單價欄:
+                dtype[c] = 'float64'
+        done = 0
+        try:
+            for chunk in pd.read_csv(f, dtype=dtype, chunksize=批量, engine='c', encoding='utf-8-sig'):
+                done += len(chunk)
+                yield _套用型別(chunk)
+        except (ValueError, TypeError):
+            # 數量/單價欄有非數字內容：改以文字讀入再逐批轉換，已產出的列略過
+            f.seek(0)
+            names_only = {c: t for c, t in dtype.items() if t == 'category'}
+            for chunk in pd.read_csv(f, dtype=names_only, chunksize=批量, engine='c',
+                                     encoding='utf-8-sig', skiprows=range(1, done + 1)):
+                yield _套用型別(chunk)
+    finally:
+        if f is not src:
+            f.close()
+
+def _讀XLSX(src, 批量: int):
+    import openpyxl
+    f = _開啟(src)
+    wb = openpyxl.load_workbook(f, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = ['' if h is None else str(h) for h in header]
+        buf = []
+        for r in rows:
+            if any(v is not None for v in r):
+                buf.append(r[:len(header)])
+            if len(buf) == 批量:
+                yield _套用型別(pd.DataFrame(buf, columns=header))
+                buf = []
+        if buf:
+            yield _套用型別(pd.DataFrame(buf, columns=header))
+    finally:
+        wb.close()
+        if f is not src:
+            f.close()
+
+def 讀取分批(src, 批量: int = 預設批量):
+    """依格式逐批產出已套用型別的 DataFrame；舊版 .xls 無法串流，讀入後再分批"""
+    fmt = 偵測格式(src)
+    if fmt == 'csv':
+        yield from _讀CSV(src, 批量)
+    elif fmt == 'xlsx':
+        yield from _讀XLSX(src, 批量)
+    else:
+        df = pd.read_excel(_開啟(src))
+        for i in range(0, len(df), 批量):
+            yield _套用型別(df.iloc[i:i + 批量].copy())
+
+def 讀取全部(src) -> pd.DataFrame:
+    """小檔（主檔匯入）一次讀完"""
+    chunks = list(讀取分批(src))
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+def 估計筆數(src) -> int:
+    """不解析內容估計資料列數（CSV 數換行、xlsx 讀工作表維度），用於進度與是否改用背景匯入"""
+    fmt = 偵測格式(src)
+    f = _開啟(src)
+    try:
+        if fmt == 'csv':
+            n, last = 0, b'\n'
+            for block in iter(lambda: f.read(1 << 20), b''):
+                n += block.count(b'\n')
+                last = block[-1:]
+            return max(n - (last == b'\n'), 0)
+        if fmt == 'xlsx':
+            import openpyxl
+            wb = openpyxl.load_workbook(f, read_only=True)
+            try:
+                return max((wb.worksheets[0].max_row or 1) - 1, 0)
+            finally:
+                wb.close()
+        return len(pd.read_excel(f))
+    finally:
+        if f is not src:
+            f.close()
+        else:
+            src.seek(0)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""補貨建議：各細項的銷售速度、可售天數與再訂購點。
+
+銷售速度取最近 視窗天數 天的 日彙總（新細項從第一筆異動起算），每批細項一次 SQL 加總、numpy 算出
+日均銷量與標準差，存在 補貨指標。庫存彙總 異動時觸發器在 補貨待算 記下細項，之後只重算這些細項；
+跨日時視窗移動，所有細項重算一次。前置天數、服務係數、目標天數只在讀取時套用：
+
+    再訂購點 = 日均銷量 × 前置天數 + 服務係數 × 銷量標準差 × √前置天數
+    庫存 ≤ 再訂購點 時建議訂購量 = 再訂購點 + 日均銷量 × 目標天數 − 庫存
+
+    python replenish.py refresh
+"""
+import json
+import math
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from db import 交易, 取得連線
+
+視窗天數 = 90
+批量 = 5000
+頁面預算秒 = 2.0   # 儀表板每次 render 最多花在重算的時間
+服務水準 = {'90%': 1.28, '95%': 1.65, '98%': 2.05, '99%': 2.33}   # 常態分布的單尾係數
+
+def _計算批次(con, sids: list, 今日: str) -> int:
+    ids = json.dumps(sids)
+    起 = (date.fromisoformat(今日) - timedelta(days=視窗天數 - 1)).isoformat()
+    base = pd.read_sql("""
+        SELECT S.細項編號, S.進貨數量 - S.銷售數量 AS 庫存,
+               (SELECT MIN(日期) FROM 日彙總 D WHERE D.細項編號=S.細項編號) AS 首日
+        FROM 庫存彙總 S WHERE S.細項編號 IN (SELECT value FROM json_each(?))
+    """, con, params=(ids,))
+    sold = pd.read_sql("""
+        SELECT 細項編號, SUM(銷售數量) AS 量, SUM(銷售數量 * 銷售數量) AS 平方 FROM 日彙總
+        WHERE 細項編號 IN (SELECT value FROM json_each(?)) AND 日期 BETWEEN ? AND ? GROUP BY 細項編號
+    """, con, params=(ids, 起, 今日))
+    df = base.merge(sold, on='細項編號', how='left').fillna({'量': 0, '平方': 0})
+    # 視窗內未出現的日子銷量為 0；視窗開始後才有第一筆異動的細項只除以實際天數
+    first = pd.to_datetime(df['首日'], errors='coerce')
+    days = (pd.Timestamp(今日) - first).dt.days.add(1).clip(1, 視窗天數).fillna(視窗天數).to_numpy()
+    mean = df['量'].to_numpy(float) / days
+    std = np.sqrt(np.maximum(df['平方'].to_numpy(float) / days - mean ** 2, 0))
+    con.execute("DELETE FROM 補貨指標 WHERE 細項編號 IN (SELECT value FROM json_each(?))", (ids,))
+    con.executemany("INSERT INTO 補貨指標 (細項編號, 計算日, 庫存, 日均銷量, 銷量標準差) VALUES (?,?,?,?,?)",
+                    zip(df['細項編號'].tolist(), [今日] * len(df), df['庫存'].tolist(), mean.tolist(), std.tolist()))
+    con.execute("DELETE FROM 補貨待算 WHERE 細項編號 IN (SELECT value FROM json_each(?))", (ids,))
+    con.execute("UPDATE 資料版本 SET 版本=版本+1 WHERE 表名='補貨指標'")
+    return len(sids)
+
+def 更新補貨(預算秒: float = None, 今日=None) -> int:
+    """重算待算細項（跨日時為全部），回傳處理的細項數；給 預算秒 時超過即停，其餘留待下次"""
+    今日 = str(今日 or date.today())
+    con = 取得連線()
+    stale = (con.execute("SELECT MIN(計算日) FROM 補貨指標").fetchone()[0] or 今日) < 今日
+    if not stale and not con.execute("SELECT 1 FROM 補貨待算 LIMIT 1").fetchone():
+        return 0
+    if stale:
+        with 交易() as con:
+            con.execute("INSERT OR IGNORE INTO 補貨待算 (細項編號) SELECT 細項編號 FROM 補貨指標 WHERE 計算日 < ?", (今日,))
+    t, n = time.perf_counter(), 0
+    while True:
+        with 交易() as con:
+            sids = [r[0] for r in con.execute("SELECT 細項編號 FROM 補貨待算 LIMIT ?", (批量,))]
+            n += _計算批次(con, sids, 今日) if sids else 0
+        if len(sids) < 批量 or (預算秒 is not None and time.perf_counter() - t >= 預算秒):
+            return n
+
+def 待算數() -> int:
+    return 取得連線().execute("SELECT COUNT(*) FROM 補貨待算").fetchone()[0]
+
+def 重建補貨() -> int:
+    with 交易() as con:
+        con.execute("DELETE FROM 補貨指標")
+        con.execute("INSERT OR IGNORE INTO 補貨待算 (細項編號) SELECT 細項編號 FROM 庫存彙總")
+    return 更新補貨()
+
+def 補貨SQL(前置天數: float = 14, 服務係數: float = 1.65, 目標天數: float = 30,
+           類別編號=None, 只列需補貨: bool = True) -> tuple:
+    """各細項的 庫存、日均銷量、可售天數、再訂購點、建議訂購量（無條件進位）(sql, params)，
+    依可售天數由少到多；讀取前須先 更新補貨()"""
+    where, params = [], [目標天數, 前置天數, 服務係數 * math.sqrt(前置天數)]
+    if 類別編號 is not None:
+        where.append('I.類別編號=?')
+        params.append(int(類別編號))
+    if 只列需補貨:
+        where.append('T.日均銷量 > 0 AND T.庫存 <= T.再訂購點')
+    sql = f"""
+        SELECT C.類別名稱 AS 類別, I.品項名稱 AS 品項, S.細項名稱 AS 細項, T.庫存,
+               ROUND(T.日均銷量, 2) AS 日均銷量,
+               CASE WHEN T.日均銷量 > 0 THEN ROUND(MAX(T.庫存, 0) / T.日均銷量, 1) END AS 可售天數,
+               ROUND(T.再訂購點, 1) AS 再訂購點,
+               CASE WHEN T.日均銷量 > 0 AND T.庫存 <= T.再訂購點
+                    THEN CAST(T.上限 - T.庫存 AS INTEGER) + (T.上限 - T.庫存 > CAST(T.上限 - T.庫存 AS INTEGER)) END AS 建議訂購量,
+               CASE WHEN T.日均銷量 = 0 THEN '無銷售' WHEN T.庫存 <= 0 THEN '缺貨'
+                    WHEN T.庫存 <= T.再訂購點 THEN '需補貨' ELSE '正常' END AS 狀態
+        FROM (SELECT 細項編號, 庫存, 日均銷量, 再訂購點, 再訂購點 + 日均銷量 * ? AS 上限
+              FROM (SELECT *, 日均銷量 * ? + 銷量標準差 * ? AS 再訂購點 FROM 補貨指標)) T
+        JOIN 細項 S ON T.細項編號=S.細項編號
+        JOIN 品項 I ON S.品項編號=I.品項編號
+        JOIN 類別 C ON I.類別編號=C.類別編號
+        {('WHERE ' + ' AND '.join(where)) if where else ''}
+        ORDER BY 可售天數 IS NULL, 可售天數, 建議訂購量 DESC
+    """
+    return sql, params
+
+def 讀取補貨(前置天數: float = 14, 服務係數: float = 1.65, 目標天數: float = 30,
+           類別編號=None, 只列需補貨: bool = True, 預算秒: float = None) -> pd.DataFrame:
+    更新補貨(預算秒)
+    sql, params = 補貨SQL(前置天數, 服務係數, 目標天數, 類別編號, 只列需補貨)
+    return pd.read_sql(sql, 取得連線(), params=params)
+
+if __name__ == '__main__':
+    import sys
+    from db import 初始化資料庫
+    初始化資料庫()
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ''
+    if cmd == 'refresh':
+        t = time.perf_counter()
+        n = 更新補貨()
+        print(f'已重算 {n} 個細項（{time.perf_counter() - t:.2f} 秒）')
+    elif cmd == 'rebuild':
+        print(f'已重算 {重建補貨()} 個細項')
+    else:
+        print('用法：python replenish.py refresh|rebuild')
+        sys.exit(2)
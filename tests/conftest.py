@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""每個測試一份全新的暫存資料庫；歸檔、快照、背景匯入、圖片與匯出目錄也都放在同一個暫存目錄"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('INVENTORY_DB', os.path.join(tempfile.mkdtemp(), 'test.db'))
+
+import pandas as pd
+import pytest
+
+import archive
+import backup
+import db
+import export
+import images
+import jobs
+from benchmarks import datagen
+
+def _關閉連線():
+    with db._池鎖:
+        for _, con in db._使用中.values():
+            con.close()
+        for con in db._閒置:
+            con.close()
+        db._使用中.clear()
+        db._閒置.clear()
+    db._查詢快取.clear()
+    db._欄位快取.clear()
+    db._新增語句快取.clear()
+
+@pytest.fixture
+def 資料庫路徑(tmp_path, monkeypatch):
+    """指向暫存目錄、尚未建立結構的資料庫路徑"""
+    path = str(tmp_path / 'test.db')
+    monkeypatch.setattr(db, 'DB_PATH', path)
+    monkeypatch.setattr(backup, 'DB_PATH', path)
+    monkeypatch.setattr(backup, '備份目錄', str(tmp_path / 'backups'))
+    monkeypatch.setattr(archive, '歸檔目錄', str(tmp_path / 'archive'))
+    monkeypatch.setattr(jobs, '工作目錄', str(tmp_path / 'import_jobs'))
+    monkeypatch.setattr(images, '圖片目錄', str(tmp_path / 'images'))
+    monkeypatch.setattr(export, '匯出目錄', str(tmp_path / 'exports'))
+    monkeypatch.setattr(export, '_最新', {})
+    _關閉連線()
+    yield path
+    _關閉連線()
+
+@pytest.fixture
+def 資料庫(資料庫路徑):
+    db.初始化資料庫()
+    return 資料庫路徑
+
+@pytest.fixture
+def 主檔(資料庫) -> pd.DataFrame:
+    master = datagen.主檔(4, 30, 120, seed=7)
+    db.批次匯入主檔(master)
+    return master
+
+@pytest.fixture
+def 紀錄(主檔) -> pd.DataFrame:
+    """主檔加上 2000 筆進貨、1500 筆銷售"""
+    db.批次匯入進貨(datagen.紀錄(主檔, 2000, seed=1))
+    db.批次匯入銷售(datagen.紀錄(主檔, 1500, '銷售', seed=2))
+    return 主檔
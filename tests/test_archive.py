@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""歸檔前後：彙總、時點庫存與銷貨成本不變，核對函式都回傳空表"""
+import pandas as pd
+import pytest
+
+import archive
+import costing
+import db
+from benchmarks import datagen
+
+格式 = ['sqlite', pytest.param('parquet', marks=pytest.mark.skipif(archive.pq is None, reason='需安裝 pyarrow'))]
+
+def _紀錄(rows: list, 類型: str = '進貨') -> pd.DataFrame:
+    """[(細項, 數量, 單價, 日期)] → 類別 A / 品項 a 下的上傳資料"""
+    p = '買入' if 類型 == '進貨' else '賣出'
+    return pd.DataFrame([{'類別': 'A', '品項': 'a', '細項': s, f'{p}數量': q, f'{p}單價': u, '日期': d}
+                         for s, q, u, d in rows])
+
+def _銷售成本(起: str = '') -> list:
+    return db.取得連線().execute("SELECT * FROM 銷售成本 WHERE 日期>=? ORDER BY 紀錄ID", (起,)).fetchall()
+
+def _核對():
+    assert db.核對庫存彙總().empty
+    assert db.核對趨勢彙總().empty
+    assert costing.核對成本().empty
+    assert archive.核對歸檔成本().empty
+
+@pytest.mark.parametrize('fmt', 格式)
+def test_進貨全部歸檔後賣超成本不變(資料庫, fmt):
+    # x 的進貨在 2021 年全部賣完，2022 年的銷售都是賣超，以最後一筆進貨單價計價
+    db.批次匯入主檔(pd.DataFrame({'類別': ['A', 'A'], '品項': ['a', 'a'], '細項': ['x', 'y']}))
+    db.批次匯入進貨(_紀錄([('x', 5, 10, '2021-03-01'), ('x', 3, 12.5, '2021-06-01'), ('y', 2, 7, '2021-01-01')]))
+    db.批次匯入銷售(_紀錄([('x', 8, 30, '2021-07-01'), ('x', 6, 30, '2022-02-01'),
+                        ('x', 2, 30, '2022-03-01'), ('y', 1, 9, '2022-01-05')], '銷售'))
+    總計, 現行 = costing.銷貨成本總計(), _銷售成本('2022-01-01')
+    assert [r[3] for r in 現行 if r[1] == 1] == [7500, 2500]
+
+    archive.歸檔(2021, fmt)
+    assert costing.銷貨成本總計() == 總計
+    assert _銷售成本() == 現行
+    costing.重建成本()   # 從期初狀態重播
+    assert costing.銷貨成本總計() == 總計
+    assert _銷售成本() == 現行
+    db.批次匯入銷售(_紀錄([('x', 1, 30, '2022-04-01')], '銷售'))   # 從最早的缺貨日起重播
+    assert _銷售成本()[:len(現行)] == 現行
+    _核對()
+
+@pytest.mark.parametrize('fmt', 格式)
+def test_歸檔後彙總與成本不變(主檔, fmt):
+    db.批次匯入進貨(datagen.紀錄(主檔, 3000, seed=1))
+    db.批次匯入銷售(datagen.紀錄(主檔, 2500, '銷售', seed=2))
+    con = db.取得連線()
+    before = (db.讀取庫存摘要(), db.讀取庫存時點('2023-06-30'), costing.銷貨成本總計(), db.金額總計(),
+              con.execute("SELECT * FROM 月彙總 ORDER BY 1, 2").fetchall(), _銷售成本('2023-01-01'))
+
+    out = archive.歸檔(2022, fmt)
+    assert set(out) == {2021, 2022}
+    assert db.歸檔截止日() == '2023-01-01'
+    assert con.execute("SELECT MIN(日期) FROM 銷售").fetchone()[0] >= '2023-01-01'
+
+    def 比對():
+        after = (db.讀取庫存摘要(), db.讀取庫存時點('2023-06-30'), costing.銷貨成本總計(), db.金額總計(),
+                 con.execute("SELECT * FROM 月彙總 ORDER BY 1, 2").fetchall(), _銷售成本('2023-01-01'))
+        pd.testing.assert_frame_equal(after[0], before[0])
+        pd.testing.assert_frame_equal(after[1], before[1])
+        assert after[2:] == before[2:]
+    比對()
+    _核對()
+    db.重建庫存彙總()
+    costing.重建成本()
+    比對()
+    _核對()
+
+def test_歸檔成本核對能發現差異(資料庫):
+    db.批次匯入主檔(pd.DataFrame({'類別': ['A'], '品項': ['a'], '細項': ['x']}))
+    db.批次匯入進貨(_紀錄([('x', 5, 10, '2021-03-01')]))
+    db.批次匯入銷售(_紀錄([('x', 5, 30, '2021-07-01'), ('x', 2, 30, '2022-02-01')], '銷售'))
+    archive.歸檔(2021)
+    assert archive.核對歸檔成本().empty
+    db.執行("UPDATE 銷售成本 SET 先進先出分=0")
+    bad = archive.核對歸檔成本()
+    assert bad['紀錄ID'].tolist() == [2]
+    assert bad['先進先出分_重播'].tolist() == [2000]
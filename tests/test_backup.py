@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""線上備份與還原：寫入持續進行時建立的快照是一致的時間點，還原後彙總與成本仍一致"""
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import pytest
+
+import backup
+import costing
+import db
+from benchmarks import datagen
+
+def _筆數() -> int:
+    return db.取得連線().execute("SELECT COUNT(*) FROM 銷售").fetchone()[0]
+
+def _核對():
+    assert db.核對庫存彙總().empty
+    assert db.核對趨勢彙總().empty
+    assert costing.核對成本().empty
+
+class _持續寫入(threading.Thread):
+    def __init__(self, 主檔):
+        super().__init__(daemon=True)
+        self.主檔, self.停止, self.錯誤, self.批數 = 主檔, threading.Event(), [], 0
+
+    def run(self):
+        try:
+            while not self.停止.is_set():
+                db.批次匯入銷售(datagen.紀錄(self.主檔, 20, '銷售', seed=100 + self.批數))
+                self.批數 += 1
+        except Exception as e:
+            self.錯誤.append(e)
+
+    def 等待(self, 批數: int):
+        end = time.time() + 30
+        while self.批數 <= 批數 and not self.錯誤:
+            assert time.time() < end, '寫入逾時'
+            time.sleep(0.01)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.停止.set()
+        self.join(30)
+        assert not self.錯誤
+
+def test_寫入中備份與還原(紀錄, monkeypatch):
+    monkeypatch.setattr(backup, '每步頁數', 8)   # 分成許多步，寫入穿插其間
+    before = _筆數()
+    with _持續寫入(紀錄) as w:
+        w.等待(0)
+        name = backup.備份('寫入中', 暫停=0.001)
+        w.等待(w.批數)   # 快照之後還有寫入
+        assert backup.快照清單()['名稱'].tolist() == [name]
+    with closing(sqlite3.connect(backup._路徑(name))) as snap:
+        assert snap.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+        n = snap.execute("SELECT COUNT(*) FROM 銷售").fetchone()[0]
+    after = _筆數()
+    assert before < n < after
+
+    v = db.資料版本(['銷售'])
+    prev = backup.還原(name)
+    assert _筆數() == n and db.資料版本(['銷售']) > v   # 版本只增不減，快取一律失效
+    _核對()
+    # 還原前自動建立的快照保有還原前的全部資料；寫入持續時也能還原
+    with _持續寫入(紀錄):
+        backup.還原(prev)
+    assert _筆數() >= after
+    _核對()
+
+def test_找不到快照(資料庫):
+    with pytest.raises(ValueError):
+        backup.還原('不存在')
+    with pytest.raises(ValueError):
+        backup.備份('含 空白')
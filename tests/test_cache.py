@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""版本快取：資料未變時命中，寫入後重新查詢並丟掉舊版本，筆數不超過上限"""
+import db
+
+@db.版本快取('類別')
+def _類別數(前綴: str) -> int:
+    _類別數.呼叫 += 1
+    return db.取得連線().execute("SELECT COUNT(*) FROM 類別 WHERE 類別名稱 LIKE ?", (前綴 + '%',)).fetchone()[0]
+_類別數.呼叫 = 0
+
+def test_寫入後失效並丟掉舊版本(資料庫):
+    db.新增('類別', ['類別名稱'], ['甲'])
+    n = _類別數.呼叫
+    assert _類別數('甲') == 1 and _類別數('乙') == 0
+    assert _類別數('甲') == 1 and _類別數.呼叫 == n + 2
+    db.新增('類別', ['類別名稱'], ['甲二'])
+    assert _類別數('甲') == 2 and _類別數.呼叫 == n + 3
+    # 舊版本的 '乙' 已在重新查詢 '甲' 時丟掉
+    assert [k[1] for k in db._查詢快取 if k[0] == '_類別數'] == [('甲',)]
+
+def test_筆數上限(資料庫, monkeypatch):
+    monkeypatch.setattr(db, '查詢快取上限', 5)
+    for i in range(20):
+        _類別數(str(i))
+    assert len(db._查詢快取) == 5
+    assert [k[1] for k in db._查詢快取] == [(str(i),) for i in range(15, 20)]
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""逐批匯出：各格式的內容與一次查詢相同，資料未變時沿用同一個檔案"""
+import os
+
+import pandas as pd
+import pytest
+
+import db
+import export
+from benchmarks import datagen
+
+@pytest.fixture
+def 查詢(主檔):
+    db.批次匯入銷售(datagen.紀錄(主檔, 1200, '銷售', seed=5))
+    return db.紀錄SQL('銷售', '2022-01-01', '2023-12-31')
+
+def _讀回(path: str, fmt: str) -> pd.DataFrame:
+    if fmt == 'Parquet':
+        return pd.read_parquet(path)
+    return pd.read_csv(path, encoding='utf-8-sig', compression='gzip' if fmt == 'CSV (gzip)' else None)
+
+@pytest.mark.parametrize('fmt', list(export.格式))
+def test_逐批匯出內容完整(查詢, fmt):
+    sql, params = 查詢
+    path = export.匯出檔(sql, params, ['銷售'], fmt, 批量=100)   # 多批：表頭只寫一次
+    want = pd.read_sql(sql, db.取得連線(), params=params)
+    assert len(want) > 100
+    pd.testing.assert_frame_equal(_讀回(path, fmt), want, check_dtype=False)
+
+def test_資料未變沿用檔案(查詢):
+    sql, params = 查詢
+    path = export.匯出檔(sql, params, ['銷售'])
+    mtime = os.stat(path).st_mtime_ns
+    assert export.匯出檔(sql, params, ['銷售']) == path
+    assert os.stat(path).st_mtime_ns == mtime
+    rid = db.取得連線().execute(sql + ' LIMIT 1', params).fetchone()[0]
+    db.批次更新紀錄('銷售', {'數量': 99}, [rid])
+    new = export.匯出檔(sql, params, ['銷售'])
+    assert new != path and not os.path.exists(path)
+    assert _讀回(new, 'CSV').set_index('紀錄ID').loc[rid, '數量'] == 99
+
+@pytest.mark.parametrize('fmt', list(export.格式))
+def test_寫入失敗不留暫存檔(查詢, fmt, monkeypatch):
+    def 中途失敗(sql, params, 批量):
+        yield pd.read_sql(sql + ' LIMIT 10', db.取得連線(), params=params)
+        raise RuntimeError('讀取中斷')
+    monkeypatch.setattr(export, '逐批讀取', 中途失敗)
+    sql, params = 查詢
+    with pytest.raises(RuntimeError):
+        export.匯出檔(sql, params, ['銷售'], fmt)
+    assert os.listdir(export.匯出目錄) == []
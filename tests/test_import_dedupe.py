@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""重複匯入：同一檔案以內容雜湊略過，重疊的檔案以列指紋（含出現次數）只匯入新的列"""
+import pandas as pd
+
+import db
+from benchmarks import datagen
+
+def _筆數(table: str = '銷售') -> int:
+    return db.取得連線().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+def test_重傳與重疊檔案(主檔):
+    df = datagen.紀錄(主檔, 300, '銷售', seed=21)
+    assert (db.批次匯入銷售(df)['狀態'] == '匯入').all()
+    rep = db.批次匯入銷售(df)
+    assert (rep['原因'] == '已匯入過').all() and _筆數() == 300
+    # 新檔案包含舊檔案的全部列再多 50 列：只匯入多出的部分
+    more = pd.concat([df, datagen.紀錄(主檔, 50, '銷售', seed=22)], ignore_index=True)
+    rep = db.批次匯入銷售(more)
+    assert (rep['狀態'] == '匯入').sum() == 50 and _筆數() == 350
+    assert db.核對庫存彙總().empty
+
+def test_相同內容的列依出現次數區分(主檔):
+    row = {'類別': 主檔['類別'][0], '品項': 主檔['品項'][0], '細項': 主檔['細項'][0],
+           '賣出數量': 1, '賣出單價': 100, '日期': '2023-05-01'}
+    assert (db.批次匯入銷售(pd.DataFrame([row] * 2))['狀態'] == '匯入').all()
+    # 同一天賣出第三件：前兩列已匯入過，第三列是新的
+    rep = db.批次匯入銷售(pd.DataFrame([row] * 3))
+    assert rep['狀態'].tolist() == ['略過', '略過', '匯入'] and _筆數() == 3
+
+def test_分批匯入與一次匯入相同(主檔):
+    df = datagen.紀錄(主檔, 400, seed=23)
+    df = pd.concat([df, df.iloc[:40]], ignore_index=True)   # 檔案內的重複列跨批出現
+    計數, pos = {}, 0
+    for i in range(0, len(df), 100):
+        rep = db.批次匯入進貨(df.iloc[i:i + 100].reset_index(drop=True), 計數=計數, 起始列=pos)
+        assert rep['列號'].tolist() == list(range(pos + 1, pos + len(rep) + 1))
+        pos += len(rep)
+    assert _筆數('進貨') == 440
+    # 整份檔案再匯入一次：每一列的指紋都已存在
+    assert (db.批次匯入進貨(df)['原因'] == '已匯入過').all() and _筆數('進貨') == 440
+
+def test_檔案雜湊(主檔):
+    assert not db.檔案已匯入('abc')
+    db.記錄匯入檔案('abc', '進貨', 'a.csv', 10)
+    assert db.檔案已匯入('abc')
+    # 清除全部紀錄時一併清除雜湊與指紋，同一檔案可重新匯入
+    df = datagen.紀錄(主檔, 20, seed=24)
+    db.批次匯入進貨(df)
+    db.清除匯入紀錄('進貨')
+    assert not db.檔案已匯入('abc')
+    assert (db.批次匯入進貨(df)['狀態'] == '匯入').all()
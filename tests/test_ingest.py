@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""寫入服務：編號/批次編號 去重、合併交易失敗時逐批重試、混合日期格式、CLI 遇到無效類型的列"""
+import json
+import sys
+import threading
+
+import pytest
+
+import db
+import ingest
+
+def _列(主檔, i: int, **kw) -> dict:
+    m = 主檔.iloc[i % len(主檔)]
+    return {'類別': m['類別'], '品項': m['品項'], '細項': m['細項'], '數量': 1, '單價': 10, '日期': '2023-05-01', **kw}
+
+def _筆數() -> int:
+    return db.取得連線().execute("SELECT COUNT(*) FROM 銷售").fetchone()[0]
+
+def test_依編號去重(主檔):
+    rows = [_列(主檔, i, 編號=f'POS1-{i}') for i in range(5)]
+    assert ingest.寫入紀錄(rows, '銷售')['匯入'] == 5
+    res = ingest.寫入紀錄(rows + [_列(主檔, 9, 編號='POS1-9'), _列(主檔, 9, 編號='POS1-9')], '銷售')
+    assert (res['匯入'], res['略過']) == (1, 6)
+    assert [d['原因'] for d in res['明細']] == ['已匯入過'] * 5 + ['同批重複的編號']
+    # 沒有 編號 的列以 批次編號#列號 去重；兩者都沒有則一律寫入
+    plain = [_列(主檔, i) for i in range(3)]
+    assert ingest.寫入紀錄(plain, '銷售', 'pos1-0001')['匯入'] == 3
+    assert ingest.寫入紀錄(plain, '銷售', 'pos1-0001')['略過'] == 3
+    assert ingest.寫入紀錄(plain, '銷售')['匯入'] == 3
+    assert _筆數() == 12
+
+def test_混合日期格式(主檔):
+    rows = [_列(主檔, 0, 日期='2023/1/5'), _列(主檔, 1, 日期='2023-02-01 10:30:00'), _列(主檔, 2, 日期='2023-03-04')]
+    assert ingest.寫入紀錄(rows, '銷售')['匯入'] == 3
+    got = [r[0] for r in db.取得連線().execute("SELECT 日期 FROM 銷售 ORDER BY 紀錄ID")]
+    assert got == ['2023-01-05', '2023-02-01', '2023-03-04']
+
+def test_合併失敗時逐批重試(主檔, monkeypatch):
+    orig = ingest._匯入函式['銷售']
+    開始, 放行 = threading.Event(), threading.Event()
+    def 匯入(df, **kw):
+        if (df['細項'] == '等待').any():
+            開始.set()
+            assert 放行.wait(10)
+        if (df['細項'] == '壞').any():
+            raise RuntimeError('寫入失敗')
+        return orig(df, **kw)
+    monkeypatch.setitem(ingest._匯入函式, '銷售', 匯入)
+    # 第一批佔住寫入執行緒，接下來兩批在佇列中合併成同一個交易
+    first = ingest.送出('銷售', ingest.整理批次([_列(主檔, 0, 細項='等待')], '銷售')['銷售'])
+    assert 開始.wait(10)
+    good = ingest.送出('銷售', ingest.整理批次([_列(主檔, i) for i in range(4)], '銷售')['銷售'])
+    bad = ingest.送出('銷售', ingest.整理批次([_列(主檔, 5, 細項='壞')], '銷售')['銷售'])
+    放行.set()
+    first.result(10)
+    assert (good.result(10)['狀態'] == '匯入').all()
+    with pytest.raises(RuntimeError):
+        bad.result(10)
+    assert _筆數() == 5
+
+def test_CLI無效類型(主檔, tmp_path, monkeypatch, capsys):
+    path = tmp_path / 'bad.ndjson'
+    lines = [_列(主檔, 0), _列(主檔, 1), {**_列(主檔, 2), '類型': '退貨'}, _列(主檔, 3)]
+    path.write_text('\n'.join(json.dumps(r, ensure_ascii=False) for r in lines[:2]) + '\n\n'
+                    + '\n'.join(json.dumps(r, ensure_ascii=False) for r in lines[2:]) + '\n', encoding='utf-8')
+    monkeypatch.setattr(sys, 'argv', ['ingest.py', 'load', '銷售', str(path), '--batch', '10'])
+    with pytest.raises(SystemExit) as e:
+        ingest.main()
+    assert e.value.code == 2
+    assert f'{path}:4: 第 3 列的類型需為 進貨 或 銷售' in capsys.readouterr().err
+    assert _筆數() == 2   # 錯誤之前的列照常寫入
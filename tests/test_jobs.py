@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""背景匯入工作：中途失敗後從檢查點續跑，已寫入的段落不重做，結果與一次匯入相同"""
+import time
+
+import pytest
+
+import db
+import jobs
+from benchmarks import datagen
+
+def _等待完成(timeout: float = 30):
+    end = time.time() + timeout
+    while jobs.執行中數量():
+        assert time.time() < end, '背景工作逾時'
+        time.sleep(0.05)
+
+def test_中斷後從檢查點續跑(主檔, monkeypatch):
+    monkeypatch.setattr(jobs, '分段筆數', 500)
+    df = datagen.紀錄(主檔, 1800, seed=11)
+    orig = jobs._匯入函式['進貨']
+    起始, 失敗 = [], []
+    def 第二段失敗(chunk, **kw):
+        起始.append(kw['起始列'])
+        if len(起始) == 2 and not 失敗:
+            失敗.append(kw['起始列'])
+            raise RuntimeError('模擬中斷')
+        return orig(chunk, **kw)
+    monkeypatch.setitem(jobs._匯入函式, '進貨', 第二段失敗)
+    jid = jobs.提交匯入('進貨', df.to_csv(index=False).encode('utf-8'), 'x.csv', 'h1')
+    _等待完成()
+    job = jobs.工作清單().iloc[0]
+    assert (job['狀態'], job['已處理']) == ('失敗', 500)
+    assert not db.檔案已匯入('h1')   # 未完成的工作不算已匯入
+
+    # 行程中斷時工作停在 執行中：重啟後續跑
+    db.執行("UPDATE 匯入工作 SET 狀態='執行中' WHERE 工作ID=?", (jid,))
+    起始.clear()
+    assert jobs.恢復工作() == 1
+    _等待完成()
+    job = jobs.工作清單().iloc[0]
+    assert 起始 == [500, 1000, 1500]
+    assert (job['狀態'], job['已處理'], job['總筆數'], job['匯入筆數']) == ('完成', 1800, 1800, 1800)
+    assert db.檔案已匯入('h1')
+    assert db.取得連線().execute("SELECT COUNT(*) FROM 進貨").fetchone()[0] == 1800
+    assert db.核對庫存彙總().empty
+
+def test_不支援的類型(資料庫):
+    with pytest.raises(ValueError):
+        jobs.提交匯入('退貨', b'')
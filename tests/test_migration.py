@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""舊版（遷移框架之前）的資料庫升級到最新結構：金額改存整數分、重複主檔合併、日期統一，彙總與成本一致"""
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+import costing
+import db
+
+# 基準版本 app.py 建立的結構（沒有 schema_version）
+_舊版結構 = """
+CREATE TABLE 類別 (類別編號 INTEGER PRIMARY KEY AUTOINCREMENT, 類別名稱 TEXT UNIQUE);
+CREATE TABLE 品項 (品項編號 INTEGER PRIMARY KEY AUTOINCREMENT, 類別編號 INTEGER, 品項名稱 TEXT, 系列 TEXT);
+CREATE TABLE 細項 (細項編號 INTEGER PRIMARY KEY AUTOINCREMENT, 品項編號 INTEGER, 細項名稱 TEXT, 圖片 TEXT);
+CREATE TABLE 進貨 (紀錄ID INTEGER PRIMARY KEY AUTOINCREMENT, 類別編號 INTEGER, 品項編號 INTEGER, 細項編號 INTEGER,
+                   數量 INTEGER, 單價 REAL, 總價 REAL, 日期 TEXT);
+CREATE TABLE 銷售 (紀錄ID INTEGER PRIMARY KEY AUTOINCREMENT, 類別編號 INTEGER, 品項編號 INTEGER, 細項編號 INTEGER,
+                   數量 INTEGER, 單價 REAL, 總價 REAL, 日期 TEXT);
+"""
+
+def _建立舊版(path: str):
+    with closing(sqlite3.connect(path)) as con:
+        con.executescript(_舊版結構)
+        con.execute("INSERT INTO 類別 VALUES (1, '戒指')")
+        # 舊版匯入每列都新增品項/細項：同名的 品項 2、細項 3 是重複
+        con.executemany("INSERT INTO 品項 VALUES (?,?,?,?)", [(1, 1, '晨光戒', ''), (2, 1, '晨光戒', '')])
+        con.executemany("INSERT INTO 細項 VALUES (?,?,?,?)",
+                        [(1, 1, '#7', None), (2, 1, '#9', None), (3, 2, '#7', None)])
+        con.executemany("INSERT INTO 進貨 VALUES (?,1,?,?,?,?,?,?)", [
+            (1, 1, 1, 10, 0.1 + 0.2, 3.0000000000000004, '2023/1/5'),
+            (2, 2, 3, 4, 19.99, 79.96, '2023-02-01 00:00:00'),
+            (3, 1, 2, 3, None, 89.85, '2023-02-03'),   # 舊版編輯頁只留下 總價
+        ])
+        con.executemany("INSERT INTO 銷售 VALUES (?,1,?,?,?,?,?,?)", [
+            (1, 1, 1, 2, 49.5, 99.0, '2023-03-01'),
+            (2, 2, 3, 5, 35.0, 175.0, '2023/3/2'),
+        ])
+        con.commit()
+
+def test_舊版升級到最新(資料庫路徑):
+    _建立舊版(資料庫路徑)
+    assert db.初始化資料庫() == db.遷移步驟[-1][0]
+    con = db.取得連線()
+    # 重複的 品項/細項 合併到最小編號，紀錄改指過去
+    assert con.execute("SELECT COUNT(*) FROM 品項").fetchone()[0] == 1
+    assert [r[0] for r in con.execute("SELECT 細項編號 FROM 細項 ORDER BY 1")] == [1, 2]
+    assert con.execute("SELECT DISTINCT 細項編號 FROM 銷售").fetchall() == [(1,)]
+    # 金額為整數分，總價由資料庫計算；只有總價的列由 總價/數量 推回單價
+    rows = con.execute("SELECT 紀錄ID, 單價分, 總價分, 日期 FROM 進貨 ORDER BY 紀錄ID").fetchall()
+    assert rows == [(1, 30, 300, '2023-01-05'), (2, 1999, 7996, '2023-02-01'), (3, 2995, 8985, '2023-02-03')]
+    assert con.execute("SELECT typeof(單價分), typeof(總價分) FROM 銷售 LIMIT 1").fetchone() == ('integer', 'integer')
+    assert db.金額總計() == {'支出分': 17281, '收入分': 27400}
+    assert db.核對庫存彙總().empty
+    assert db.核對趨勢彙總().empty
+    assert costing.核對成本().empty
+    # 升級後可照常寫入，再次初始化不重跑遷移
+    db.批次匯入銷售(pd.DataFrame(
+        [{'類別': '戒指', '品項': '晨光戒', '細項': '#9', '賣出數量': 1, '賣出單價': 50, '日期': '2023-04-01'}]))
+    assert db.初始化資料庫() == db.遷移步驟[-1][0]
+    assert db.核對庫存彙總().empty
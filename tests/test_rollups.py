@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""日彙總/月彙總/月結存 由觸發器維護：紀錄改日期（跨月）、改數量、刪除後都與原始紀錄一致"""
+import pandas as pd
+
+import db
+
+def test_匯入後一致(紀錄):
+    assert db.核對趨勢彙總().empty
+    raw = pd.read_sql("SELECT substr(日期, 1, 7) AS 期間, SUM(數量) AS 銷售數量, SUM(總價分) / 100.0 AS 收入 "
+                      "FROM 銷售 GROUP BY 1 ORDER BY 1", db.取得連線())
+    got = db.趨勢('月')[['期間', '銷售數量', '收入']]
+    got = got[got['銷售數量'] > 0].reset_index(drop=True)
+    pd.testing.assert_frame_equal(got, raw, check_dtype=False)
+
+def test_改日期與數量後一致(紀錄):
+    ids = [r[0] for r in db.取得連線().execute("SELECT 紀錄ID FROM 銷售 WHERE 日期 < '2022-01-01' LIMIT 200")]
+    db.批次更新紀錄('銷售', {'日期': '2023-07-15'}, ids)
+    assert db.核對趨勢彙總().empty
+    db.批次更新紀錄('進貨', {'數量': 7}, 起='2022-03-01', 迄='2022-05-31')
+    assert db.核對趨勢彙總().empty
+
+def test_刪除後一致(紀錄):
+    db.批次刪除紀錄('進貨', 起='2021-06-01', 迄='2021-06-30')
+    db.批次刪除紀錄('銷售', 起='2021-01-01', 迄='2024-12-31', 類別編號=2)
+    assert db.核對趨勢彙總().empty
+    # 觸發器扣到 0 的列會留著，重建則不產生
+    sql = "SELECT * FROM 月彙總 WHERE 進貨筆數 <> 0 OR 銷售筆數 <> 0 ORDER BY 1, 2"
+    月 = db.取得連線().execute(sql).fetchall()
+    db.重建庫存彙總()
+    assert db.取得連線().execute(sql).fetchall() == 月
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""目錄搜尋：trigram 比對名稱中任意片段、多關鍵字需全部符合，主檔改名/刪除後索引同步"""
+import pandas as pd
+
+import db
+
+def _名稱(關鍵字: str) -> list:
+    return sorted(db.搜尋細項(關鍵字)['細項名稱'])
+
+def test_搜尋與同步(資料庫):
+    db.批次匯入主檔(pd.DataFrame([
+        ('戒指', '晨光玫瑰戒', 'S925 #7'), ('戒指', '晨光玫瑰戒', 'S925 #9'),
+        ('戒指', '星河戒', '18K #7'), ('項鍊', '晨光鎖骨鍊', '45cm'),
+    ], columns=['類別', '品項', '細項']))
+    assert _名稱('晨光玫') == ['S925 #7', 'S925 #9']        # 品項名稱中間的片段
+    assert _名稱('晨光') == ['45cm', 'S925 #7', 'S925 #9']   # 兩字以 LIKE 比對
+    assert _名稱('S925 #9') == ['S925 #9']                   # 多關鍵字需全部符合
+    assert _名稱('#7 戒指') == ['18K #7', 'S925 #7']
+    assert _名稱('手環') == [] and db.搜尋細項('  ').empty
+    assert _名稱('100%') == [] and _名稱('_') == []          # LIKE 萬用字元照字面比對
+    hit = db.搜尋細項('鎖骨鍊').iloc[0]
+    assert (hit['類別名稱'], hit['品項名稱']) == ('項鍊', '晨光鎖骨鍊')
+
+    con = db.取得連線()
+    iid = con.execute("SELECT 品項編號 FROM 品項 WHERE 品項名稱='星河戒'").fetchone()[0]
+    db.執行("UPDATE 品項 SET 品項名稱='銀河戒', 系列='夏季' WHERE 品項編號=?", (iid,))
+    assert _名稱('星河戒') == [] and _名稱('銀河戒') == ['18K #7'] and _名稱('夏季') == ['18K #7']
+    cid = con.execute("SELECT 類別編號 FROM 類別 WHERE 類別名稱='項鍊'").fetchone()[0]
+    db.執行("UPDATE 類別 SET 類別名稱='頸飾' WHERE 類別編號=?", (cid,))
+    assert db.搜尋細項('45cm').iloc[0]['類別名稱'] == '頸飾'
+    db.刪除('細項', '細項名稱', 'S925 #9')
+    assert _名稱('S925') == ['S925 #7']
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""庫存彙總 由觸發器維護：匯入、批次更新、批次刪除後都與原始紀錄一致"""
+import costing
+import db
+
+def _核對():
+    assert db.核對庫存彙總().empty
+    assert costing.核對成本().empty
+
+def _庫存():
+    return db.取得連線().execute("SELECT * FROM 庫存彙總 ORDER BY 細項編號").fetchall()
+
+def test_匯入後一致(紀錄):
+    con = db.取得連線()
+    raw = con.execute("SELECT (SELECT SUM(數量) FROM 進貨) - (SELECT SUM(數量) FROM 銷售)").fetchone()[0]
+    assert con.execute("SELECT SUM(進貨數量 - 銷售數量) FROM 庫存彙總").fetchone()[0] == raw
+    _核對()
+
+def test_批次更新後一致(紀錄):
+    con = db.取得連線()
+    ids = [r[0] for r in con.execute("SELECT 紀錄ID FROM 銷售 ORDER BY 紀錄ID LIMIT 300")]
+    assert db.批次更新紀錄('銷售', {'數量': 3}, ids) == 300
+    _核對()
+    assert db.批次更新紀錄('進貨', {'單價分': 12345, '日期': '2022-02-02'}, 類別編號=1,
+                          起='2021-01-01', 迄='2021-12-31') > 0
+    _核對()
+
+def test_批次刪除後一致(紀錄):
+    con = db.取得連線()
+    ids = [r[0] for r in con.execute("SELECT 紀錄ID FROM 進貨 ORDER BY 紀錄ID DESC LIMIT 200")]
+    assert db.批次刪除紀錄('進貨', ids) == 200
+    _核對()
+    assert db.批次刪除紀錄('銷售', 起='2022-01-01', 迄='2022-06-30') > 0
+    _核對()
+
+def test_重建結果與增量相同(紀錄):
+    db.批次更新紀錄('銷售', {'數量': 1}, 起='2023-01-01', 迄='2023-12-31')
+    kept = _庫存()
+    db.重建庫存彙總()
+    assert _庫存() == kept
@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""各功能頁面；每個模組提供 render()，由 app.py 依選單按需載入"""
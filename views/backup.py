@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""備份頁：建立快照、快照清單與還原"""
+import streamlit as st
+
+from backup import 備份, 快照清單, 還原, 自動保留份數
+
+def render():
+    st.header('🗄️ 備份與還原')
+    st.caption(f'備份時應用程式可照常使用；刪除、匯入、歸檔前會自動建立快照（保留最近 {自動保留份數} 份）')
+    name = st.text_input('快照名稱（留空以時間命名）', key='bk_name')
+    if st.button('立即備份', key='bk_create'):
+        with st.spinner('備份中…'):
+            st.success(f'已建立快照 {備份(name.strip() or None)}')
+
+    snaps = 快照清單()
+    st.subheader('快照')
+    if snaps.empty:
+        st.caption('尚無快照')
+        return
+    st.dataframe(snaps)
+    pick = st.selectbox('還原快照', snaps['名稱'].tolist(), key='bk_pick')
+    confirm = st.checkbox(f'確認以 {pick} 覆蓋目前的資料？', key='bk_confirm')
+    if confirm and st.button('還原', key='bk_restore'):
+        before = 還原(pick)
+        st.success(f'已還原 {pick}；還原前的資料存為快照 {before}'); st.rerun()
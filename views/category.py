@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""類別管理頁：批次匯入與單筆新增/刪除"""
+import sqlite3
+
+import streamlit as st
+import pandas as pd
+
+from db import 查詢, 新增, 刪除, 批次匯入主檔
+from reader import 讀取全部
+
+def render():
+    st.header('⚙️ 類別管理')
+    tab1, tab2 = st.tabs(['批次匯入','單筆管理'])
+
+    with tab1:
+        sample = pd.DataFrame({'類別':['示例A'],'品項':[''],'細項':['']})
+        st.download_button('下載類別批次範例',
+            sample[['類別']].to_csv(index=False,encoding='utf-8-sig'),
+            'cat_template.csv','text/csv'
+        )
+        up = st.file_uploader('上傳 CSV/Excel', type=['csv','xlsx','xls'], key='up_cat')
+        if up:
+            df = 讀取全部(up.getvalue())
+            批次匯入主檔(df); st.success('批次匯入類別完成')
+
+    with tab2:
+        df = 查詢('類別').rename(columns={'類別編號':'編號','類別名稱':'名稱'})
+        st.table(df)
+        st.download_button('下載類別 CSV',
+            df.to_csv(index=False,encoding='utf-8-sig'),
+            'categories.csv','text/csv'
+        )
+        with st.form('form_cat'):
+            newc = st.text_input('新增類別', key='cat_new')
+            delc = st.text_input('刪除編號', key='cat_del')
+            confirm = st.checkbox(f'確認刪除 類別 {delc}?') if delc.isdigit() else False
+            if st.form_submit_button('執行'):
+                ok = True
+                if newc:
+                    try:
+                        新增('類別',['類別名稱'],[newc])
+                    except sqlite3.IntegrityError:
+                        st.error(f'類別「{newc}」名稱已存在'); ok = False
+                if delc.isdigit() and confirm: 刪除('類別','類別編號',int(delc))
+                if ok:
+                    st.session_state['cat_new']=''; st.session_state['cat_del']=''
+                    st.rerun()
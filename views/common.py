@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""各頁共用的介面元件"""
+import hashlib
+import zipfile
+from datetime import date
+
+import streamlit as st
+import pandas as pd
+
+from db import (交易, 查詢紀錄, 計數紀錄, 明細頁, 取得紀錄, 批次更新紀錄, 批次刪除紀錄, 取得對映, 品項清單, 元轉分,
+                新增, 搜尋細項, 批次匯入進貨, 批次匯入銷售, 檔案已匯入, 記錄匯入檔案, 歸檔截止日)
+from archive import 查詢歷史
+from backup import 自動快照
+from export import 匯出檔, 格式 as 匯出格式
+from jobs import 提交匯入, 工作清單, 略過明細
+from reader import 估計筆數, 讀取分批
+
+背景匯入門檻 = 2000   # 超過此筆數改由背景工作匯入
+_讀檔錯誤 = (zipfile.BadZipFile, ValueError, KeyError, UnicodeDecodeError, OSError)   # 損壞或格式不符的上傳檔
+
+def _頁堆疊(key: str, sig) -> list:
+    """keyset 分頁的游標堆疊（每頁最後一列的 (日期, 紀錄ID)）；篩選條件改變時回到第一頁"""
+    if st.session_state.get(f'{key}_sig') != sig:
+        st.session_state[f'{key}_sig'] = sig
+        st.session_state[f'{key}_stack'] = [None]
+    return st.session_state[f'{key}_stack']
+
+def _翻頁(key: str, stack: list, df: pd.DataFrame, 筆數: int):
+    col1, col2 = st.columns(2)
+    if col1.button('上一頁', key=f'{key}_prev', disabled=len(stack) == 1):
+        stack.pop(); st.rerun()
+    if col2.button('下一頁', key=f'{key}_next', disabled=len(df) < 筆數):
+        stack.append((df['日期'].iloc[-1], int(df['紀錄ID'].iloc[-1]))); st.rerun()
+
+def 細項搜尋(key: str, 筆數: int = 20):
+    """輸入名稱片段搜尋細項（類別/品項/細項名稱或系列，可多個以空白分隔），回傳選中的一列或 None"""
+    q = st.text_input('搜尋細項', key=f'{key}_q', placeholder='輸入類別、品項、細項名稱或系列的任意片段')
+    if not q.strip():
+        return None
+    hits = 搜尋細項(q, 筆數)
+    if hits.empty:
+        st.warning('找不到符合的細項')
+        return None
+    if len(hits) == 筆數:
+        st.caption(f'只列出最相關的 {筆數} 筆，可再多輸入幾個字縮小範圍')
+    labels = [f'{r.類別名稱} / {r.品項名稱} / {r.細項名稱}' + (f'（{r.系列}）' if r.系列 else '')
+              for r in hits.itertuples()]
+    i = st.selectbox('細項', range(len(hits)), format_func=labels.__getitem__, key=f'{key}_hit')
+    return hits.iloc[i]
+
+def 手動記錄(table: str, key: str):
+    """搜尋細項後填寫 日期/數量/單價 一次送出（表單內調整欄位不會重跑頁面）"""
+    hit = 細項搜尋(f'{key}_find')
+    if hit is None:
+        return
+    with st.form(f'{key}_form'):
+        d = st.date_input('日期', date.today(), key=f'{key}_date')
+        qty = st.number_input('數量', min_value=1, value=1, key=f'{key}_qty')
+        price = st.number_input('單價', min_value=0.0, format='%.2f', key=f'{key}_price')
+        if st.form_submit_button(f'儲存{table}'):
+            date_str = d.strftime('%Y-%m-%d')
+            新增(table, ['類別編號','品項編號','細項編號','數量','單價分','日期'],
+                 [int(hit['類別編號']), int(hit['品項編號']), int(hit['細項編號']), qty, 元轉分(price), date_str])
+            st.success(f"{table}記錄已儲存：{hit['細項名稱']}，{date_str}")
+
+def 紀錄分頁(table: str, d1, d2, 條件: dict, key: str, 筆數: int = 100):
+    """以 keyset 分頁顯示紀錄；篩選條件改變時回到第一頁"""
+    stack = _頁堆疊(key, (str(d1), str(d2), tuple(sorted(條件.items()))))
+    df = 查詢紀錄(table, d1, d2, 之後=stack[-1], 筆數=筆數, **條件)
+    st.caption(f'共 {計數紀錄(table, d1, d2, **條件)} 筆，第 {len(stack)} 頁')
+    st.dataframe(df)
+    _翻頁(key, stack, df, 筆數)
+    歷史紀錄(table, d1, d2, 條件, key=f'{key}_hist')
+
+def 歷史紀錄(table: str, d1, d2, 條件: dict, key: str):
+    """查詢期間早於歸檔截止日時，可勾選合併已歸檔年度的紀錄一起顯示、下載"""
+    截止 = 歸檔截止日()
+    if str(d1) >= 截止:
+        return
+    if st.checkbox(f'包含已歸檔的紀錄（{截止} 以前）', key=key):
+        df = 查詢歷史(table, d1, d2, **條件)
+        st.caption(f'共 {len(df)} 筆（來源為年度者來自歸檔）')
+        st.dataframe(df)
+        st.download_button('下載 CSV', df.to_csv(index=False).encode('utf-8-sig'),
+                           f'{table}_{d1}_{d2}.csv', 'text/csv', key=f'{key}_dl')
+
+def 紀錄管理(table: str, key: str, 筆數: int = 50):
+    """編輯/刪除：依日期與類別/品項篩選、分頁瀏覽；單筆編輯，或對勾選紀錄／整個篩選結果批次修改、刪除"""
+    d1 = st.date_input('起始日期', date.today().replace(day=1), key=f'{key}_start')
+    d2 = st.date_input('結束日期', date.today(), key=f'{key}_end')
+    cond = {}
+    cmap = 取得對映('類別')
+    cat = st.selectbox('類別', ['全部'] + list(cmap.keys()), key=f'{key}_cat')
+    if cat != '全部':
+        cond['類別編號'] = cmap[cat]
+        items = 品項清單(cmap[cat])
+        imap = dict(zip(items['品項名稱'], items['品項編號']))
+        it = st.selectbox('品項', ['全部'] + list(imap.keys()), key=f'{key}_item')
+        if it != '全部':
+            cond['品項編號'] = imap[it]
+    篩選 = dict(起=d1, 迄=d2, **cond)
+
+    stack = _頁堆疊(key, (str(d1), str(d2), tuple(sorted(cond.items()))))
+    df = 明細頁(table, d1, d2, 之後=stack[-1], 筆數=筆數, **cond)
+    total = 計數紀錄(table, d1, d2, **cond)
+    st.caption(f'共 {total} 筆，第 {len(stack)} 頁')
+    st.dataframe(df)
+    _翻頁(key, stack, df, 筆數)
+    if df.empty:
+        st.info(f'無符合條件的{table}紀錄')
+        return
+    labels = {f"{i}: {c}/{it}/{sub}（{d}）": int(i) for i, c, it, sub, d in
+              zip(df['紀錄ID'], df['類別名稱'], df['品項名稱'], df['細項名稱'], df['日期'])}
+
+    # 單筆編輯（只列出本頁紀錄）
+    sel = st.selectbox('選擇紀錄', list(labels.keys()), key=f'{key}_sel'); rid = labels[sel]
+    row = 取得紀錄(table, rid)
+    date_new = st.date_input('日期', value=pd.to_datetime(row['日期']).date(), key=f'{key}_date_{rid}')
+    qty_new = st.number_input('數量', min_value=1, value=int(row['數量']), key=f'{key}_qty_{rid}')
+    price_new = st.number_input('單價', min_value=0.0, format='%.2f', value=float(row['單價']), key=f'{key}_price_{rid}')
+    if st.button(f'更新{table}', key=f'{key}_save'):
+        批次更新紀錄(table, {'數量': qty_new, '單價分': 元轉分(price_new),
+                             '日期': date_new.strftime('%Y-%m-%d')}, ids=[rid])
+        st.success(f'{table}記錄更新成功')
+
+    # 批次操作：勾選的紀錄以 ID 清單、整個篩選結果以條件，各用一個 SQL 陳述式完成
+    st.subheader('批次操作')
+    scope = st.radio('套用範圍', ['本頁勾選的紀錄', '篩選結果全部'], key=f'{key}_scope', horizontal=True)
+    if scope == '本頁勾選的紀錄':
+        picked = st.multiselect(f'選取{table}紀錄', list(labels.keys()), key=f'{key}_pick')
+        ids, n = [labels[x] for x in picked], len(picked)
+    else:
+        ids, n = None, total
+    field = st.selectbox('修改欄位', ['數量', '單價', '日期'], key=f'{key}_field')
+    if field == '數量':
+        val = st.number_input('新數量', min_value=1, value=1, key=f'{key}_bqty')
+        設定 = {'數量': int(val)}
+    elif field == '單價':
+        val = st.number_input('新單價', min_value=0.0, format='%.2f', key=f'{key}_bprice')
+        設定 = {'單價分': 元轉分(val)}
+    else:
+        val = st.date_input('新日期', date.today(), key=f'{key}_bdate')
+        設定 = {'日期': val.strftime('%Y-%m-%d')}
+    if st.button(f'套用到 {n} 筆', key=f'{key}_bupdate', disabled=n == 0):
+        cnt = 批次更新紀錄(table, 設定, ids, **篩選)
+        st.success(f'已更新 {cnt} 筆{table}'); st.rerun()
+    confirm = st.checkbox(f'確認刪除 {n} 筆{table}？', key=f'{key}_bconfirm')
+    if confirm and st.button(f'刪除 {n} 筆{table}', key=f'{key}_bdel', disabled=n == 0):
+        自動快照(f'刪除{table}')
+        cnt = 批次刪除紀錄(table, ids, **篩選)
+        st.success(f'刪除 {cnt} 筆{table}'); st.rerun()
+
+def 匯出區(label: str, sql: str, params, tables: list, 檔名: str, key: str):
+    """按下「準備匯出」才產生檔案；資料未變動時沿用快取檔"""
+    fmt = st.selectbox('匯出格式', list(匯出格式.keys()), key=f'{key}_fmt')
+    if st.button('準備匯出', key=f'{key}_prep'):
+        ext, mime = 匯出格式[fmt]
+        with open(匯出檔(sql, params, tables, fmt), 'rb') as f:
+            st.download_button(label, f.read(), f'{檔名}.{ext}', mime, key=f'{key}_dl')
+
+def 匯入上傳(table: str, up, key: str):
+    """上傳的 進貨/銷售 檔：內容雜湊已匯入過則直接略過；大檔排入背景工作，小檔分批直接匯入並顯示略過明細"""
+    data = up.getvalue()
+    雜湊 = hashlib.sha256(data).hexdigest()
+    if 檔案已匯入(雜湊):
+        st.info(f'{up.name} 已匯入過，不再重複匯入')
+        return
+    try:
+        n = 估計筆數(data)
+    except _讀檔錯誤 as e:
+        st.error(f'{up.name} 無法讀取：{e}')
+        return
+    if n >= 背景匯入門檻:
+        jid = 提交匯入(table, data, up.name, 雜湊)
+        st.info(f'已排入背景匯入（工作 {jid}，約 {n} 筆），可切換到其他頁面繼續作業')
+        return
+    匯入 = {'進貨': 批次匯入進貨, '銷售': 批次匯入銷售}[table]
+    自動快照(f'匯入{table}')
+    計數, reps, pos = {}, [], 0
+    try:
+        with 交易():
+            for chunk in 讀取分批(data):
+                reps.append(匯入(chunk, 計數=計數, 起始列=pos))
+                pos += len(chunk)
+            記錄匯入檔案(雜湊, table, up.name, pos)
+    except _讀檔錯誤 as e:   # 整批回復，不記為已匯入
+        st.error(f'{up.name} 無法讀取：{e}')
+        return
+    if not reps:
+        st.warning(f'{up.name} 沒有資料列')
+        return
+    rep = pd.concat(reps, ignore_index=True)
+    st.success(f"批次匯入 {(rep['狀態']=='匯入').sum()} 筆{table}記錄")
+    if (rep['狀態']=='略過').any():
+        st.warning(f"略過 {(rep['狀態']=='略過').sum()} 筆")
+        st.dataframe(rep[rep['狀態']=='略過'])
+
+def 匯入進度(table: str, key: str):
+    """顯示最近的背景匯入工作與進度"""
+    jobs = 工作清單(table)
+    if jobs.empty:
+        return
+    st.subheader('背景匯入')
+    st.button('重新整理進度', key=f'{key}_refresh')
+    for _, j in jobs.iterrows():
+        pct = j['已處理'] / j['總筆數'] if j['總筆數'] else 1.0
+        st.progress(pct, text=f"工作 {j['工作ID']}｜{j['檔名'] or ''}｜{j['狀態']}｜"
+                              f"{j['已處理']}/{j['總筆數']}（匯入 {j['匯入筆數']}，略過 {j['略過筆數']}）")
+        if j['錯誤']:
+            st.error(j['錯誤'])
+        if j['略過筆數'] and st.checkbox('顯示略過明細', key=f"{key}_skip_{j['工作ID']}"):
+            st.dataframe(略過明細(int(j['工作ID'])))
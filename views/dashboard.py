@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""庫存儀表板：庫存摘要、篩選、財務指標、毛利、補貨建議與趨勢"""
+from datetime import date
+
+import streamlit as st
+
+from db import 讀取庫存摘要, 庫存摘要SQL, 讀取庫存時點, 庫存時點SQL, 金額總計, 取得對映, 趨勢, 暢銷排行, 季節性
+from costing import 讀取毛利, 毛利SQL, 銷貨成本總計
+from replenish import 讀取補貨, 補貨SQL, 待算數, 服務水準, 頁面預算秒
+from views.common import 匯出區
+
+def render():
+    st.header('📊 庫存儀表板')
+
+    # 讀取庫存彙總（每個細項一列，由觸發器維護）
+    summary = 讀取庫存摘要()
+    彙總相關表 = ['類別','品項','細項','進貨','銷售']
+
+    # ==== 篩選區塊 ====
+    with st.expander('依條件篩選'):
+        # 類別
+        cats = ['全部'] + summary['類別'].unique().tolist()
+        sel_cat = st.selectbox('類別', cats)
+        # 品項
+        if sel_cat!='全部':
+            its = summary[summary['類別']==sel_cat]['品項'].unique().tolist()
+        else:
+            its = summary['品項'].unique().tolist()
+        items = ['全部'] + its
+        sel_item = st.selectbox('品項', items)
+        # 細項
+        if sel_item!='全部':
+            sus = summary[summary['品項']==sel_item]['細項'].unique().tolist()
+        else:
+            sus = summary['細項'].unique().tolist()
+        subs = ['全部'] + sus
+        sel_sub = st.selectbox('細項', subs)
+
+        if st.button('套用篩選'):
+            st.session_state['dash_filter'] = {
+                '類別': None if sel_cat=='全部' else sel_cat,
+                '品項': None if sel_item=='全部' else sel_item,
+                '細項': None if sel_sub=='全部' else sel_sub,
+            }
+        if 'dash_filter' in st.session_state:
+            sql_f, params_f = 庫存摘要SQL(**st.session_state['dash_filter'])
+            df_f = 讀取庫存摘要(**st.session_state['dash_filter'])
+            st.success(f'篩選後共有 {len(df_f)} 筆')
+            st.dataframe(df_f)
+            匯出區('下載篩選結果', sql_f, params_f, 彙總相關表, 'filtered_summary', key='dash_f_export')
+
+    # ==== 完整摘要 ====
+    st.subheader('📋 全部庫存摘要')
+    st.dataframe(summary)
+    匯出區('下載完整摘要', *庫存摘要SQL(), 彙總相關表, 'summary', key='dash_export')
+
+    # ==== 時點庫存（月結存 + 當月日彙總） ====
+    st.subheader('🗓️ 指定日期的庫存')
+    as_of = st.date_input('截至日期', date.today(), key='dash_asof')
+    snap = 讀取庫存時點(as_of)
+    c1, c2 = st.columns(2)
+    c1.metric('庫存數量', int(snap['庫存'].sum()) if not snap.empty else 0)
+    c2.metric('庫存成本（平均成本法）', f"{snap['庫存成本'].sum():.2f}" if not snap.empty else '0.00')
+    st.dataframe(snap)
+    匯出區('下載時點庫存', *庫存時點SQL(as_of), 彙總相關表, f'stock_{as_of}', key='dash_asof_export')
+
+    # ==== 財務指標（整數分在 SQLite 內加總） ====
+    tot = 金額總計()
+    exp, rev = tot['支出分'], tot['收入分']
+    st.metric('總支出', f"{exp / 100:.2f}")
+    st.metric('總收入', f"{rev / 100:.2f}")
+    # 毛利 = 收入 - 已售出品的成本；未售出的庫存不算虧損
+    cogs = 銷貨成本總計()
+    st.metric('銷貨成本（先進先出）', f"{cogs['先進先出分'] / 100:.2f}")
+    st.metric('毛利（先進先出）', f"{(cogs['收入分'] - cogs['先進先出分']) / 100:.2f}")
+
+    # ==== 各細項毛利（銷售成本 由 costing.py 增量重播） ====
+    st.subheader('💰 各細項毛利')
+    c1, c2, c3 = st.columns(3)
+    m1 = c1.date_input('起', date.today().replace(month=1, day=1), key='dash_m_start')
+    m2 = c2.date_input('迄', date.today(), key='dash_m_end')
+    method = c3.radio('成本方法', ['先進先出', '移動平均'], horizontal=True, key='dash_m_method')
+    margin = 讀取毛利(m1, m2, method)
+    st.dataframe(margin)
+    匯出區('下載毛利', *毛利SQL(m1, m2, method), 彙總相關表, f'margin_{m1}_{m2}', key='dash_m_export')
+
+    # ==== 補貨建議（補貨指標 由 replenish.py 增量重算） ====
+    st.subheader('🛒 補貨建議')
+    c1, c2, c3 = st.columns(3)
+    lead = c1.number_input('前置天數', 1, 365, 14, key='dash_r_lead')
+    cover = c2.number_input('目標天數', 1, 365, 30, key='dash_r_cover')
+    svc = c3.selectbox('服務水準', list(服務水準), index=1, key='dash_r_svc')
+    show_all = st.checkbox('顯示全部細項', key='dash_r_all')
+    reorder = 讀取補貨(lead, 服務水準[svc], cover, 只列需補貨=not show_all, 預算秒=頁面預算秒)
+    left = 待算數()
+    if left:
+        st.caption(f'尚有 {left} 個細項待重算，下次重新整理時接續')
+    st.dataframe(reorder)
+    匯出區('下載補貨清單', *補貨SQL(lead, 服務水準[svc], cover, 只列需補貨=not show_all),
+           ['類別','品項','細項','補貨指標'], 'reorder', key='dash_r_export')
+
+    # ==== 趨勢（讀 日彙總/月彙總） ====
+    st.subheader('📈 趨勢')
+    c1, c2, c3 = st.columns(3)
+    t1 = c1.date_input('起', date.today().replace(year=date.today().year - 1, day=1), key='dash_t_start')
+    t2 = c2.date_input('迄', date.today(), key='dash_t_end')
+    grain = c3.radio('粒度', ['月', '日'], horizontal=True, key='dash_t_grain')
+    cmap = 取得對映('類別')
+    t_cat = st.selectbox('類別', ['全部'] + list(cmap.keys()), key='dash_t_cat')
+    cid = cmap[t_cat] if t_cat != '全部' else None
+    trend = 趨勢(grain, t1, t2, 類別編號=cid)
+    if trend.empty:
+        st.caption('此期間沒有進貨或銷售')
+    else:
+        st.line_chart(trend.set_index('期間')[['收入', '支出']])
+        st.bar_chart(trend.set_index('期間')[['銷售數量']])
+
+    st.markdown('**期間暢銷細項**')
+    by = st.radio('排序依據', ['收入', '數量'], horizontal=True, key='dash_t_by')
+    st.dataframe(暢銷排行(t1, t2, 10, by))
+
+    st.markdown('**季節性（各月每年平均）**')
+    season = 季節性(cid)
+    if not season.empty:
+        st.bar_chart(season.set_index('月')[['平均收入']])
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""品項管理頁：批次匯入、系列編輯與單筆新增/刪除"""
+import sqlite3
+
+import streamlit as st
+import pandas as pd
+
+from db import 新增, 刪除, 執行, 取得對映, 品項清單, 批次匯入主檔
+from reader import 讀取全部
+
+def render():
+    st.header('⚙️ 品項管理')
+    tab1, tab2 = st.tabs(['批次匯入','單筆管理'])
+
+    # 批次匯入（保持不变）
+    with tab1:
+        sample = pd.DataFrame({'類別':['示例A'],'品項':['示例X'],'細項':['']})
+        st.download_button('下載品項批次範例',
+            sample[['類別','品項']].to_csv(index=False,encoding='utf-8-sig'),
+            'item_template.csv','text/csv'
+        )
+        up = st.file_uploader('上傳 CSV/Excel', type=['csv','xlsx','xls'], key='up_item')
+        if up:
+            df = 讀取全部(up.getvalue())
+            批次匯入主檔(df)
+            st.success('批次匯入品項完成')
+
+    # 單筆管理
+    with tab2:
+        cmap = 取得對映('類別')
+        if not cmap:
+            st.warning('請先新增類別')
+            st.stop()
+
+        sel = st.radio('選擇類別', list(cmap.keys()), index=0, key='item_cat_radio')
+        cid = cmap[sel]
+
+        # 舊資料庫若無 系列 欄位，品項清單 會補空白
+        df = 品項清單(cid)
+
+        df = df.rename(columns={'品項編號':'編號','品項名稱':'名稱'})
+        st.table(df)
+
+        # 系列编辑
+        series_map = dict(zip(df['名稱'], df['系列'].fillna('')))
+        sel_item = st.selectbox('編輯品項', list(series_map.keys()), key='series_sel')
+        new_series = st.text_input('主題系列', value=series_map[sel_item], key='series_new')
+        if st.button('更新系列', key='series_save'):
+            iid = df[df['名稱']==sel_item]['編號'].iloc[0]
+            執行('UPDATE 品項 SET 系列=? WHERE 品項編號=?', (new_series, int(iid)))
+            st.success('系列已更新')
+            st.rerun()
+
+        # 下載與單筆 CRUD
+        st.download_button('下載品項 CSV',
+            df.to_csv(index=False, encoding='utf-8-sig'),
+            f'items_{cid}.csv','text/csv'
+        )
+        with st.form('form_item'):
+            newi = st.text_input('新增品項', key='item_new')
+            deli = st.text_input('刪除編號', key='item_del')
+            confirm = st.checkbox(f'確認刪除 品項 {deli}?') if deli.isdigit() else False
+            if st.form_submit_button('執行'):
+                ok = True
+                if newi:
+                    try:
+                        新增('品項',['類別編號','品項名稱'],[cid,newi])
+                    except sqlite3.IntegrityError:   # 同類別下品項名稱唯一
+                        st.error(f'品項「{newi}」名稱已存在'); ok = False
+                if deli.isdigit() and confirm:
+                    刪除('品項','品項編號',int(deli))
+                if ok:
+                    st.rerun()
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""效能頁：開關量測、慢查詢排行與各頁耗時"""
+import streamlit as st
+import pandas as pd
+
+import profiling
+
+def render():
+    st.header('⏱️ 效能')
+    on = st.checkbox('開啟效能量測', value=profiling.已啟用(), key='perf_on',
+                     help='關閉時不包裝連線與頁面，沒有額外負擔；切換後下次重新整理生效')
+    if on != profiling.已啟用():
+        profiling.設定啟用(on)
+        st.info('已切換，下次重新整理起生效')
+    profiling.慢查詢門檻毫秒 = st.number_input('慢查詢門檻（毫秒）', min_value=0.0,
+                                               value=float(profiling.慢查詢門檻毫秒), key='perf_slow')
+
+    st.subheader('各頁耗時')
+    pages = profiling.頁面統計()
+    if pages.empty:
+        st.caption('尚無紀錄；開啟量測後切換到其他頁面即會記錄')
+    else:
+        st.dataframe(pages.round(1))
+
+    st.subheader('慢查詢排行')
+    n = st.number_input('顯示筆數', min_value=5, max_value=200, value=20, key='perf_n')
+    st.dataframe(profiling.慢查詢排行(int(n)).round(1))
+
+    if profiling.最近語句:
+        st.subheader('最近的 SQL')
+        recent = pd.DataFrame(list(profiling.最近語句)[-200:], columns=['時間', '頁面', '語句', '秒', '筆數'])
+        recent['毫秒'] = (recent.pop('秒') * 1000).round(2)
+        st.dataframe(recent.iloc[::-1])
+
+    if st.button('清除量測紀錄', key='perf_clear'):
+        profiling.清除紀錄(); st.rerun()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""進貨管理頁：批次匯入、查詢/匯出、手動記錄、編輯/刪除"""
+from datetime import date
+
+import streamlit as st
+import pandas as pd
+
+from backup import 自動快照
+from db import 交易, 執行, 取得對映, 紀錄SQL, 清除匯入紀錄
+from views.common import 紀錄分頁, 紀錄管理, 匯出區, 匯入上傳, 匯入進度, 手動記錄
+
+def render():
+    st.header('➕ 進貨管理')
+    tab1, tab2, tab3, tab4 = st.tabs(['批次匯入','查詢/匯出','手動記錄','編輯/刪除'])
+
+    # 批次匯入
+    with tab1:
+        sample = pd.DataFrame({
+            '類別':['示例A'], '品項':['示例X'], '細項':['示例α'],
+            '買入數量':[10], '買入單價':[100.0],
+            '日期':[date.today().strftime('%Y-%m-%d')]
+        })
+        st.download_button(
+            '下載進貨批次範例',
+            sample.to_csv(index=False, encoding='utf-8-sig'),
+            'purchase_template.csv','text/csv'
+        )
+        up = st.file_uploader('上傳 CSV/Excel', type=['csv','xlsx','xls'], key='up_p')
+        if up:
+            匯入上傳('進貨', up, key='up_p')
+        匯入進度('進貨', key='up_p')
+
+    # 查詢 / 匯出
+    with tab2:
+        d1 = st.date_input('起始日期', date.today().replace(day=1), key='p_start')
+        d2 = st.date_input('結束日期', date.today(), key='p_end')
+        cmap_f = 取得對映('類別')
+        cat_f = st.selectbox('類別', ['全部'] + list(cmap_f.keys()), key='p_f_cat')
+        cond = {'類別編號': cmap_f[cat_f]} if cat_f != '全部' else {}
+        紀錄分頁('進貨', d1, d2, cond, key='p_page')
+        匯出區('匯出進貨', *紀錄SQL('進貨', d1, d2, **cond), ['進貨'], 'purchases_filtered', key='p_export')
+
+    # 手動記錄
+    with tab3:
+        手動記錄('進貨', key='p')
+
+    # 編輯 / 刪除
+    with tab4:
+        紀錄管理('進貨', key='p_manage')
+
+        confirm_all = st.checkbox('確認刪除所有進貨？', key='del_all_p_confirm')
+        if confirm_all and st.button('刪除所有進貨', key='del_all_p'):
+            自動快照('刪除所有進貨')
+            with 交易():
+                執行('DELETE FROM 進貨'); 清除匯入紀錄('進貨')
+            st.success('已刪除所有進貨紀錄'); st.rerun()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""銷售管理頁：批次匯入、查詢/匯出、手動記錄、編輯/刪除"""
+from datetime import date
+
+import streamlit as st
+import pandas as pd
+
+from backup import 自動快照
+from db import 交易, 執行, 取得對映, 紀錄SQL, 清除匯入紀錄
+from views.common import 紀錄分頁, 紀錄管理, 匯出區, 匯入上傳, 匯入進度, 手動記錄
+
+def render():
+    st.header('➕ 銷售管理')
+    tab1, tab2, tab3, tab4 = st.tabs(['批次匯入','查詢/匯出','手動記錄','編輯/刪除'])
+
+    # — 批次匯入 —
+    with tab1:
+        sample_s = pd.DataFrame({
+            '類別': ['示例A'],
+            '品項': ['示例X'],
+            '細項': ['示例α'],
+            '賣出數量': [5],
+            '賣出單價': [150.0],
+            '日期': [date.today().strftime('%Y-%m-%d')]
+        })
+        st.download_button(
+            '下載銷售批次範例',
+            sample_s.to_csv(index=False, encoding='utf-8-sig'),
+            'sales_template.csv', 'text/csv'
+        )
+        up_s = st.file_uploader('上傳 CSV/Excel', type=['csv','xlsx','xls'], key='up_s')
+        if up_s:
+            匯入上傳('銷售', up_s, key='up_s')
+        匯入進度('銷售', key='up_s')
+
+    # — 查詢 / 匯出 —
+    with tab2:
+        d1_s = st.date_input('起始日期', date.today().replace(day=1), key='s_start')
+        d2_s = st.date_input('結束日期', date.today(), key='s_end')
+        cmap_fs = 取得對映('類別')
+        cat_fs = st.selectbox('類別', ['全部'] + list(cmap_fs.keys()), key='s_f_cat')
+        cond_s = {'類別編號': cmap_fs[cat_fs]} if cat_fs != '全部' else {}
+        紀錄分頁('銷售', d1_s, d2_s, cond_s, key='s_page')
+        匯出區('匯出銷售', *紀錄SQL('銷售', d1_s, d2_s, **cond_s), ['銷售'], 'sales_filtered', key='s_export')
+
+    # — 手動記錄 —
+    with tab3:
+        手動記錄('銷售', key='s')
+
+    # 編輯 / 刪除
+    with tab4:
+        紀錄管理('銷售', key='s_manage')
+
+        confirm_all_s = st.checkbox('確認刪除所有銷售？', key='del_all_s_confirm')
+        if confirm_all_s and st.button('刪除所有銷售', key='del_all_s'):
+            自動快照('刪除所有銷售')
+            with 交易():
+                執行('DELETE FROM 銷售'); 清除匯入紀錄('銷售')
+            st.success('已刪除所有銷售紀錄'); st.rerun()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""細項管理頁：批次匯入、圖片上傳與單筆新增/刪除"""
+import sqlite3
+
+import streamlit as st
+import pandas as pd
+
+from db import 新增, 刪除, 取得對映, 品項清單, 細項清單, 批次匯入主檔
+from images import 設定細項圖片, 縮圖對映, 顯示路徑
+from reader import 讀取全部
+
+def render():
+    st.header('⚙️ 細項管理')
+    tab1, tab2 = st.tabs(['批次匯入','單筆管理'])
+
+    with tab1:
+        sample = pd.DataFrame({'類別':['示例A'],'品項':['示例X'],'細項':['示例α']})
+        st.download_button('下載細項批次範例',
+            sample[['類別','品項','細項']].to_csv(index=False,encoding='utf-8-sig'),
+            'sub_template.csv','text/csv'
+        )
+        up = st.file_uploader('上傳 CSV/Excel', type=['csv','xlsx','xls'], key='up_sub')
+        if up:
+            df = 讀取全部(up.getvalue())
+            批次匯入主檔(df); st.success('批次匯入細項完成')
+
+    with tab2:
+        cmap = 取得對映('類別')
+        if not cmap: st.warning('請先新增類別')
+        else:
+            sel = st.selectbox('類別', list(cmap.keys())); cid = cmap[sel]
+            df_i = 品項清單(cid)
+            imap = dict(zip(df_i['品項名稱'], df_i['品項編號']))
+            if not imap: st.warning('該類別無品項')
+            else:
+                sel2 = st.selectbox('品項', list(imap.keys())); iid = imap[sel2]
+                df_s = 細項清單(iid)
+                df_s = df_s.rename(columns={'細項編號':'編號','細項名稱':'名稱'})
+                st.table(df_s.drop(columns=['圖片雜湊']))
+                # 本品項所有細項的小縮圖（一次查詢取得路徑）
+                thumbs = 縮圖對映(df_s['圖片雜湊'], 64)
+                shown = [(thumbs[h], n) for h, n in zip(df_s['圖片雜湊'], df_s['名稱']) if h in thumbs]
+                if shown:
+                    st.image([p for p, _ in shown], caption=[n for _, n in shown], width=64)
+                sid_map = dict(zip(df_s['名稱'], df_s['編號']))
+                sel_sub = st.selectbox('細項', list(sid_map.keys()), key='img_sel'); sid = sid_map[sel_sub]
+                cur = df_s[df_s['編號']==sid].iloc[0]
+                img_path = 顯示路徑(cur['圖片雜湊'], cur['圖片'], 128)
+                if img_path: st.image(img_path, width=100)
+                # 上傳元件會在 rerun 之間保留檔案：儲存後換一個 key 清空，否則每次 rerun 都重存一次
+                n = st.session_state.setdefault('img_up_n', 0)
+                img = st.file_uploader('上傳細項圖片', type=['png','jpg','jpeg','gif','webp'], key=f'img_up_{n}')
+                if img:
+                    try:
+                        設定細項圖片(sid, img.getvalue())
+                    except ValueError as e:
+                        st.error(str(e))
+                    else:
+                        st.session_state['img_up_n'] = n + 1
+                        st.rerun()
+                st.download_button('下載細項 CSV',
+                    df_s.to_csv(index=False,encoding='utf-8-sig'),
+                    f'subs_{iid}.csv','text/csv'
+                )
+                with st.form('form_sub'):
+                    new_s = st.text_input('新增細項', key='sub_new')
+                    del_s = st.text_input('刪除編號', key='sub_del')
+                    confirm = st.checkbox(f'確認刪除 細項 {del_s}?') if del_s.isdigit() else False
+                    if st.form_submit_button('執行'):
+                        ok = True
+                        if new_s:
+                            try:
+                                新增('細項',['品項編號','細項名稱'],[iid,new_s])
+                            except sqlite3.IntegrityError:   # 同品項下細項名稱唯一
+                                st.error(f'細項「{new_s}」名稱已存在'); ok = False
+                        if del_s.isdigit() and confirm: 刪除('細項','細項編號',int(del_s))
+                        if ok:
+                            st.session_state['sub_new']=''; st.session_state['sub_del']=''
+                            st.rerun()